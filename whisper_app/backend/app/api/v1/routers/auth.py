@@ -10,7 +10,8 @@ from app.core.database import get_db
 from app.crud.user import get_by_email, create, get_by_email_or_username, verify
 from app.crud.auth import create_password_reset_code, create_verification_code, delete_code, delete_reset_code, get_valid_code, get_valid_refresh_token, get_valid_reset_code, revoke_refresh_token, store_refresh_token
 from app.services.email import send_password_reset_email, send_verification_email, send_verification_email_sync
-from app.core.security import create_access_token, create_refresh_token, get_current_user, verify_password, hash_password
+from app.core.security import create_access_token, create_refresh_token, get_current_user
+from app.core.hashing import hash_password, hash_password_async, verify_and_update_password
 from app.schemas.refresh_token import RefreshTokenRequest
 from app.models.user import User
 from app.crud.system_log import log_user_activity
@@ -69,7 +70,8 @@ async def register(
     
     code = "".join(random.choices("0123456789", k=6))
     
-    new_user = create(db, user_in)
+    password_hash = await hash_password_async(user_in.password)
+    new_user = create(db, user_in, password_hash=password_hash)
     
     create_verification_code(db, new_user.id, code)
     
@@ -145,12 +147,18 @@ def login(
             detail="Invalid credentials"
         )
     
-    if not verify_password(form_data.password, user.password_hash):
+    valid, new_hash = verify_and_update_password(form_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
+    # Stored hash predates the current bcrypt cost: upgrade it transparently
+    if new_hash:
+        user.password_hash = new_hash
+        db.commit()
+    
     if not user.is_verified:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -3,15 +3,13 @@ from sqlalchemy.orm import Session
 import uuid
 from pathlib import Path
 from app.core.database import get_db
-from app.core.security import get_current_user
-from app.core.cloudinary import (
-    configure_cloudinary, 
-    upload_to_cloudinary, 
-    delete_from_cloudinary,
-    extract_public_id_from_url
-)
+from app.core.security import get_current_db_user
+from app.core.user_cache import invalidate_user
+from app.core.cloudinary import configure_cloudinary, extract_public_id_from_url
+from app.core.storage import storage
 from app.models.user import User
 from app.schemas.user import AvatarDeleteResponse, AvatarUploadResponse
+from app.services.media_ingest import IMAGE_TYPES, ingest_upload
 
 # Configure Cloudinary on startup
 configure_cloudinary()
@@ -25,7 +23,7 @@ MAX_FILE_SIZE = 2 * 1024 * 1024  # 2MB
 @router.post("/upload", response_model=AvatarUploadResponse)
 async def upload_avatar(
     avatar: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -40,21 +38,17 @@ async def upload_avatar(
                 detail="Invalid file type. Only PNG and JPG files are allowed."
             )
 
-        # Read file content
-        content = await avatar.read()
-        
-        # Validate file size
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="File too large. Maximum size is 2MB."
-            )
+        # Validate size and content while streaming
+        ingested = await ingest_upload(
+            avatar, MAX_FILE_SIZE, IMAGE_TYPES,
+            too_large_detail="File too large. Maximum size is 2MB."
+        )
 
         # Generate unique filename
         unique_filename = f"{uuid.uuid4().hex}{file_extension}"
 
         # Upload to Cloudinary
-        upload_result = upload_to_cloudinary(content, public_id=unique_filename)
+        upload_result = await storage.upload_media(ingested.file, public_id=unique_filename)
         
         if not upload_result or 'secure_url' not in upload_result:
             raise HTTPException(
@@ -66,11 +60,12 @@ async def upload_avatar(
         if current_user.avatar_url and not current_user.avatar_url.startswith('/static/'):
             public_id = extract_public_id_from_url(current_user.avatar_url)
             if public_id:
-                delete_from_cloudinary(public_id)
+                await storage.delete(public_id)
 
         # Update user's avatar URL in database
         current_user.avatar_url = upload_result['secure_url']
         db.commit()
+        invalidate_user(current_user.id)
         db.refresh(current_user)
 
         return AvatarUploadResponse(
@@ -90,7 +85,7 @@ async def upload_avatar(
 
 @router.delete("/delete", response_model=AvatarDeleteResponse)
 async def delete_avatar(
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -107,11 +102,12 @@ async def delete_avatar(
         if not current_user.avatar_url.startswith('/static/'):
             public_id = extract_public_id_from_url(current_user.avatar_url)
             if public_id:
-                delete_from_cloudinary(public_id)
+                await storage.delete(public_id)
 
         # Set avatar_url to null in database
         current_user.avatar_url = None
         db.commit()
+        invalidate_user(current_user.id)
         db.refresh(current_user)
 
         return AvatarDeleteResponse(
@@ -1,34 +1,35 @@
-import os
 import uuid
 from datetime import datetime, timezone
 from typing import List, Optional
 
-import cloudinary
-import cloudinary.uploader
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 
-from app.core.database import get_db
-from app.core.security import get_current_user
-from app.crud.chat import create_private_message, delete_message_forever, edit_private_message, get_multiple_users_online_status, mark_message_as_read
+from app.core.database import get_db, session_scope
+from app.core.security import get_current_user, get_user_snapshot
+from app.crud.chat import create_private_message, edit_private_message, get_chat_list, get_multiple_users_online_status, get_private_messages_page, mark_private_messages_read
+from app.crud.chat import get_friends_online_status as crud_get_friends_online_status, get_user_online_status as crud_get_user_online_status
 from app.crud.friend import is_blocked, is_blocked_by, is_friend
+from app.crud.reaction import get_reaction_summaries
 from app.models.message_seen_status import MessageSeenStatus
 from app.models.private_message import MessageType, PrivateMessage
 from app.models.user import User
 from app.schemas.chat import (MarkMessagesAsReadRequest, MarkMessagesAsReadResponse, ChatListItem,
                              MessageCreate, MessageOut, MessageSeenByUser, ReplyPreview)
+from app.schemas.reaction import ReactionSummary
 from app.services.websocket_manager import manager
-from app.utils.chat_helpers import _chat_id, extract_public_id_from_url
-from app.core.cloudinary import check_cloudinary_health, upload_voice_message
+from app.services.ws_outbound import encode_frame
+from app.services.media_ingest import AUDIO_TYPES, PHOTO_TYPES, ingest_upload
+from app.utils.chat_helpers import _chat_id, extract_public_id_from_url, read_up_to_event
+from app.core.cloudinary import check_cloudinary_health
+from app.core.storage import storage
 from app.core.config import settings
-from app.crud.friend import get_friends
-from sqlalchemy import or_, and_
-from app.crud.group import get_user_groups
-from app.models.group_message import GroupMessage
-from datetime import timezone
 
 router = APIRouter()
 
+MAX_CHAT_IMAGE_SIZE = 20 * 1024 * 1024  # 20MB, same as diary images
+
 def to_utc(dt):
     if dt is None:
         return None
@@ -39,72 +40,15 @@ def to_utc(dt):
 
 @router.get("/", response_model=list[ChatListItem])
 def list_chats(
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    chats = []
-
-    friends = get_friends(db, current_user.id)
-
-    for friend in friends:
-        last_msg = (
-            db.query(PrivateMessage)
-            .filter(
-                or_(
-                    and_(
-                        PrivateMessage.sender_id == current_user.id,
-                        PrivateMessage.receiver_id == friend.id
-                    ),
-                    and_(
-                        PrivateMessage.sender_id == friend.id,
-                        PrivateMessage.receiver_id == current_user.id
-                    )
-                )
-            )
-            .order_by(PrivateMessage.created_at.desc())
-            .first()
-        )
-
-        updated_at = to_utc(
-            last_msg.created_at if last_msg else friend.created_at
-        )
-
-        chats.append({
-            "id": friend.id,
-            "type": "private",
-            "name": friend.username,
-            "avatar": friend.avatar_url,
-            "last_message": last_msg.content if last_msg else None,
-            "updated_at": updated_at
-        })
-
-    groups = get_user_groups(db, current_user.id)
-
-    for group in groups:
-        last_msg = (
-            db.query(GroupMessage)
-            .filter(GroupMessage.group_id == group.id)
-            .order_by(GroupMessage.created_at.desc())
-            .first()
-        )
-
-        updated_at = to_utc(
-            last_msg.created_at if last_msg else group.created_at
-        )
-
-        chats.append({
-            "id": group.id,
-            "type": "group",
-            "name": group.name,
-            "avatar": group.images[0].url if group.images else None,
-            "last_message": last_msg.content if last_msg else None,
-            "updated_at": updated_at
-        })
+    chats = get_chat_list(db, current_user.id, limit=limit, offset=offset)
 
-    chats.sort(
-        key=lambda x: x["updated_at"] or datetime.min.replace(tzinfo=timezone.utc),
-        reverse=True
-    )
+    for chat in chats:
+        chat["updated_at"] = to_utc(chat["updated_at"]) or datetime.min.replace(tzinfo=timezone.utc)
 
     return chats
 
@@ -119,70 +63,15 @@ async def mark_messages_as_read_batch(
     Mark multiple messages as read with proper seen_by tracking
     """
     try:
-        # Get messages that belong to this user and are unread
-        messages = db.query(PrivateMessage).filter(
-            PrivateMessage.id.in_(request.message_ids),
-            PrivateMessage.receiver_id == current_user.id,
-            PrivateMessage.is_read == False
-        ).all()
-        
-        if not messages:
-            return MarkMessagesAsReadResponse(
-                status="success",
-                marked_count=0,
-                message_ids=request.message_ids
-            )
-        
-        marked_count = 0
-        for message in messages:
-            # Update message read status
-            message.is_read = True
-            message.read_at = datetime.now(timezone.utc)
-            
-            # Add seen status entry
-            existing_seen = db.query(MessageSeenStatus).filter(
-                MessageSeenStatus.message_id == message.id,
-                MessageSeenStatus.user_id == current_user.id
-            ).first()
-            
-            if not existing_seen:
-                seen_status = MessageSeenStatus(
-                    message_id=message.id,
-                    user_id=current_user.id,
-                    seen_at=datetime.now(timezone.utc)
-                )
-                db.add(seen_status)
-                marked_count += 1
-        
+        receipts = mark_private_messages_read(db, current_user.id, message_ids=request.message_ids)
         db.commit()
         
-        # Get updated messages with seen_by information
-        updated_messages = db.query(PrivateMessage).options(
-            joinedload(PrivateMessage.seen_statuses).joinedload(MessageSeenStatus.user)
-        ).filter(PrivateMessage.id.in_([m.id for m in messages])).all()
-        
-        # Prepare WebSocket notification
-        for message in updated_messages:
-            chat_id = _chat_id(message.sender_id, message.receiver_id)
-            
-            # Prepare seen information
-            seen_info = []
-            for status in message.seen_statuses:
-                seen_info.append({
-                    "user_id": status.user.id,
-                    "username": status.user.username,
-                    "avatar_url": status.user.avatar_url,
-                    "seen_at": status.seen_at.isoformat() if status.seen_at else None
-                })
-            
-            await manager.broadcast(chat_id, {
-                "type": "message_updated",
-                "message_id": message.id,
-                "is_read": True,
-                "read_at": message.read_at.isoformat() if message.read_at else None,
-                "seen_by": seen_info
-            })
+        # One "read up to" event per conversation instead of one per message
+        for receipt in receipts:
+            chat_id = _chat_id(receipt["sender_id"], current_user.id)
+            await manager.broadcast(chat_id, read_up_to_event(current_user, receipt))
         
+        marked_count = sum(receipt["count"] for receipt in receipts)
         return MarkMessagesAsReadResponse(
             status="success",
             marked_count=marked_count,
@@ -195,85 +84,74 @@ async def mark_messages_as_read_batch(
 @router.get("/private/{friend_id}", response_model=List[MessageOut])
 async def get_private_chat(
     friend_id: int,
+    response: Response,
+    before_id: Optional[int] = Query(None, description="Load messages older than this message"),
+    after_id: Optional[int] = Query(None, description="Load messages newer than this message"),
+    limit: int = Query(50, ge=1, le=200),
+    stream: bool = Query(False, description="Stream older pages as NDJSON, newest page first"),
+    max_pages: int = Query(5, ge=1, le=20, description="Pages to stream before stopping"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Keyset-paginated conversation history, oldest first within a page.
+
+    `X-Has-More` and `X-Next-Before-Id` headers describe the next "load
+    older" request. With `stream=true` the pages are written one per line,
+    starting from the cursor and walking back, each from its own bounded
+    query, so the client can render the first screen right away. The
+    stream stops after `max_pages`; its last line carries the cursor to
+    continue from.
+    """
+    if before_id and after_id:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id")
+
     if is_blocked(db, current_user.id, friend_id) or is_blocked_by(db, current_user.id, friend_id):
         return []
 
     if not is_friend(db, current_user.id, friend_id):
         raise HTTPException(status_code=403, detail="Not friends")
 
-    messages = (
-        db.query(PrivateMessage)
-        .options(
-            joinedload(PrivateMessage.sender),
-            joinedload(PrivateMessage.receiver),
-            joinedload(PrivateMessage.reply_to).joinedload(PrivateMessage.sender),
-            joinedload(PrivateMessage.seen_statuses).joinedload(MessageSeenStatus.user),
+    if stream and not after_id:
+        return StreamingResponse(
+            stream_private_history(current_user.id, friend_id, before_id, limit, max_pages),
+            media_type="application/x-ndjson"
         )
-        .filter(
-            ((PrivateMessage.sender_id == current_user.id) & (PrivateMessage.receiver_id == friend_id)) |
-            ((PrivateMessage.sender_id == friend_id) & (PrivateMessage.receiver_id == current_user.id))
-        )
-        .order_by(PrivateMessage.created_at.asc())
-        .all()
+
+    messages, has_more = get_private_messages_page(
+        db, current_user.id, friend_id,
+        before_id=before_id, after_id=after_id, limit=limit
     )
 
-    result: list[MessageOut] = []
+    response.headers["X-Has-More"] = "true" if has_more else "false"
+    if messages:
+        response.headers["X-Next-Before-Id"] = str(messages[0].id)
 
-    for msg in messages:
-        seen_by = [
-            MessageSeenByUser(
-                user_id=s.user.id,
-                username=s.user.username,
-                avatar_url=s.user.avatar_url,
-                seen_at=s.seen_at.isoformat() if s.seen_at else None
-            )
-            for s in msg.seen_statuses
-        ]
-
-        reply_to_out = None
-        reply_preview = None
+    return serialize_history_page(db, current_user.id, messages)
 
-        if msg.reply_to:
-            reply = msg.reply_to
 
-            reply_to_out = MessageOut(
-                id=reply.id,
-                sender_id=reply.sender_id,
-                receiver_id=reply.receiver_id,
-                content=reply.content,
-                message_type=serialize_message_type(reply.message_type),  # ✅ FIXED
-                is_read=reply.is_read,
-                read_at=reply.read_at.isoformat() if reply.read_at else None,
-                delivered_at=reply.delivered_at.isoformat() if reply.delivered_at else None,
-                reply_to=None,
-                reply_to_id=reply.reply_to_id,
-                is_forwarded=reply.is_forwarded,
-                forwarded_from_id=reply.forwarded_from_id,
-                original_sender=reply.original_sender,
-                original_sender_avatar=reply.original_sender_avatar,
-                created_at=reply.created_at.isoformat(),
-                sender_username=getattr(reply.sender, "username", None),
-                receiver_username=getattr(reply.receiver, "username", None),
-                voice_duration=reply.voice_duration,
-                file_size=reply.file_size,
-                seen_by=[]
+def stream_private_history(user_id: int, friend_id: int, before_id: Optional[int], limit: int, max_pages: int):
+    # The request session is gone once the response starts, so every page
+    # borrows its own short-lived session.
+    cursor = before_id
+    for _ in range(max_pages):
+        with session_scope("chat_history") as db:
+            messages, has_more = get_private_messages_page(
+                db, user_id, friend_id, before_id=cursor, limit=limit
             )
+            page = [msg_out.model_dump() for msg_out in serialize_history_page(db, user_id, messages)]
+            next_before_id = messages[0].id if messages else None
 
-            reply_preview = build_reply_preview(reply)
+        yield encode_frame({
+            "messages": page,
+            "has_more": has_more,
+            "next_before_id": next_before_id
+        }) + "\n"
 
-        result.append(
-            build_message_out(
-                msg=msg,
-                reply_to=reply_to_out,
-                reply_preview=reply_preview,
-                seen_by=seen_by
-            )
-        )
+        if not has_more or next_before_id is None:
+            break
+        cursor = next_before_id
 
-    return result
 
 # Send text message
 @router.post("/private/{friend_id}", response_model=MessageOut)
@@ -583,14 +461,12 @@ async def send_voice_message(
         if not is_friend(db, current_user.id, friend_id):
             raise HTTPException(status_code=403, detail="Not friends")
 
-        # Read and validate file
-        contents = await voice_file.read()
-        file_size = len(contents)
-
-        if file_size == 0:
-            raise HTTPException(status_code=400, detail="Empty audio file")
-        if file_size > 15 * 1024 * 1024:  # 15MB max
-            raise HTTPException(status_code=400, detail="Voice message too large (max 15MB)")
+        # Validate size and content while streaming
+        ingested = await ingest_upload(
+            voice_file, 15 * 1024 * 1024, AUDIO_TYPES,  # 15MB max
+            too_large_detail="Voice message too large (max 15MB)"
+        )
+        file_size = ingested.size
 
         # Validate duration
         if duration <= 0 or duration > 600:  # max 10 minutes
@@ -600,8 +476,8 @@ async def send_voice_message(
 
         # FIX: Better error handling for upload
         try:
-            upload_result = upload_voice_message(
-                file_content=contents,
+            upload_result = await storage.upload_voice(
+                ingested.file,
                 public_id=f"voice_{current_user.id}_{uuid.uuid4().hex[:8]}",  # shorter ID
                 folder="voice_messages"
             )
@@ -748,14 +624,14 @@ async def send_voice_message(
 async def cloudinary_health_check():
     """Check Cloudinary connectivity and configuration"""
     try:
-        is_healthy, message = check_cloudinary_health()
+        is_healthy, message = await storage.call("health", check_cloudinary_health)
         
         # Test actual upload if configuration is OK
         if is_healthy:
             try:
                 # Test with a small file
                 test_content = b"test voice message content"
-                test_result = upload_voice_message(
+                test_result = await storage.upload_voice(
                     test_content,
                     public_id=f"health_check_{uuid.uuid4().hex}",
                     folder="health_checks"
@@ -904,13 +780,15 @@ async def upload_image_to_cloudinary(
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="Only image files allowed")
 
+        ingested = await ingest_upload(file, MAX_CHAT_IMAGE_SIZE, PHOTO_TYPES)
+
         try:
             # Generate unique filename
             file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
             unique_filename = f"chat_{current_user.id}_{friend_id}_{uuid.uuid4().hex}.{file_extension}"
             
-            result = cloudinary.uploader.upload(
-                file.file,
+            result = await storage.upload(
+                ingested.file,
                 folder="chat_images",
                 public_id=unique_filename,
                 resource_type="image",
@@ -965,7 +843,7 @@ async def delete_image_message(
         # Delete from Cloudinary
         if public_id:
             try:
-                cloudinary.uploader.destroy(public_id)
+                await storage.destroy(public_id)
             except Exception as cloudinary_error:
                 print(f"Cloudinary deletion failed: {str(cloudinary_error)}")
                 # Continue with message deletion even if Cloudinary fails
@@ -1030,7 +908,7 @@ async def delete_message_forever_endpoint(
             
             if public_id:
                 try:
-                    cloudinary.uploader.destroy(public_id)
+                    await storage.destroy(public_id)
                 except Exception as e:
                     print(f"Cloudinary deletion failed: {str(e)}")
                     # Continue with message deletion even if Cloudinary fails
@@ -1066,113 +944,6 @@ async def delete_message_forever_endpoint(
         print(f"Delete error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to delete message: {str(e)}")
 
-# Get message info for deletion confirmation
-@router.get("/private/{friend_id}", response_model=List[MessageOut])
-async def get_private_chat(
-    friend_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    if is_blocked(db, current_user.id, friend_id) or is_blocked_by(db, current_user.id, friend_id):
-        return []
-
-    if not is_friend(db, current_user.id, friend_id):
-        raise HTTPException(status_code=403, detail="Not friends")
-
-    messages = (
-        db.query(PrivateMessage)
-        .options(
-            joinedload(PrivateMessage.sender),
-            joinedload(PrivateMessage.receiver),
-            joinedload(PrivateMessage.reply_to).joinedload(PrivateMessage.sender),
-            joinedload(PrivateMessage.reply_to).joinedload(PrivateMessage.receiver),
-            joinedload(PrivateMessage.seen_statuses).joinedload(MessageSeenStatus.user),
-        )
-        .filter(
-            ((PrivateMessage.sender_id == current_user.id) & (PrivateMessage.receiver_id == friend_id)) |
-            ((PrivateMessage.sender_id == friend_id) & (PrivateMessage.receiver_id == current_user.id))
-        )
-        .order_by(PrivateMessage.created_at.asc())
-        .all()
-    )
-
-    result = []
-
-    for msg in messages:
-        seen_by = [
-            MessageSeenByUser(
-                user_id=s.user.id,
-                username=s.user.username,
-                avatar_url=s.user.avatar_url,
-                seen_at=s.seen_at.isoformat() if s.seen_at else None
-            )
-            for s in msg.seen_statuses
-        ]
-
-        reply_to_out = None
-        reply_preview = None
-
-        if msg.reply_to:
-            reply_to_out = MessageOut(
-                id=msg.reply_to.id,
-                sender_id=msg.reply_to.sender_id,
-                receiver_id=msg.reply_to.receiver_id,
-                content=msg.reply_to.content,
-                message_type=serialize_message_type(msg.reply_to.message_type),
-                is_read=msg.reply_to.is_read,
-                read_at=msg.reply_to.read_at.isoformat() if msg.reply_to.read_at else None,
-                delivered_at=msg.reply_to.delivered_at.isoformat() if msg.reply_to.delivered_at else None,
-                reply_to=None,
-                reply_to_id=msg.reply_to.reply_to_id,
-                is_forwarded=msg.reply_to.is_forwarded,
-                original_sender=msg.reply_to.original_sender,
-                created_at=msg.reply_to.created_at.isoformat(),
-                sender_username=msg.reply_to.sender.username,
-                receiver_username=msg.reply_to.receiver.username,
-                voice_duration=msg.reply_to.voice_duration,
-                file_size=msg.reply_to.file_size,
-                seen_by=[]
-            )
-
-            reply_preview = build_reply_preview(msg.reply_to)
-
-        result.append(
-            build_message_out(
-                msg=msg,
-                reply_to=reply_to_out,
-                reply_preview=reply_preview,
-                seen_by=seen_by
-            )
-        )
-
-    return result
-
-    """
-    Get message information for deletion confirmation
-    """
-    try:
-        message = db.query(PrivateMessage).filter(
-            PrivateMessage.id == message_id,
-            (PrivateMessage.sender_id == current_user.id) | (PrivateMessage.receiver_id == current_user.id)
-        ).first()
-        
-        if not message:
-            raise HTTPException(status_code=404, detail="Message not found")
-        
-        return {
-            "id": message.id,
-            "sender_id": message.sender_id,
-            "content": message.content,
-            "message_type": message.message_type.value,
-            "created_at": message.created_at.isoformat(),
-            "is_own_message": message.sender_id == current_user.id
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get message info: {str(e)}")
-
 # Edit message endpoint
 @router.patch("/private/{message_id}")
 async def edit_message(
@@ -1267,7 +1038,7 @@ async def delete_cloudinary_image(
         if not public_id:
             raise HTTPException(status_code=400, detail="public_id required")
 
-        cloudinary.uploader.destroy(public_id)
+        await storage.destroy(public_id)
         return {"status": "deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Cloudinary delete failed: {str(e)}")
@@ -1284,7 +1055,20 @@ async def get_user_online_status(
         if user_id != current_user.id and not is_friend(db, current_user.id, user_id):
             raise HTTPException(status_code=403, detail="Not friends")
             
-        status_info = get_user_online_status(db, user_id)
+        # Connected users are answered from the socket manager and the user cache
+        if manager.is_user_online(user_id):
+            snapshot = get_user_snapshot(db, user_id)
+            if snapshot:
+                return {
+                    "user_id": snapshot.id,
+                    "username": snapshot.username,
+                    "is_online": True,
+                    "last_seen": None,
+                    "last_activity": manager.get_user_last_activity(user_id),
+                    "avatar_url": snapshot.avatar_url
+                }
+
+        status_info = crud_get_user_online_status(db, user_id)
         if not status_info:
             raise HTTPException(status_code=404, detail="User not found")
             
@@ -1302,7 +1086,7 @@ async def get_friends_online_status(
 ):
     """Get online status of all friends"""
     try:
-        friends_status = get_friends_online_status(db, current_user.id)
+        friends_status = crud_get_friends_online_status(db, current_user.id)
         return {"friends": friends_status}
         
     except Exception as e:
@@ -1391,3 +1175,61 @@ def build_message_out(
         seen_by=seen_by
     )
 
+
+def serialize_private_message(msg: PrivateMessage, reactions: Optional[dict] = None) -> MessageOut:
+    seen_by = [
+        MessageSeenByUser(
+            user_id=s.user.id,
+            username=s.user.username,
+            avatar_url=s.user.avatar_url,
+            seen_at=s.seen_at.isoformat() if s.seen_at else None
+        )
+        for s in msg.seen_statuses
+    ]
+
+    reply_to_out = None
+    reply_preview = None
+
+    if msg.reply_to:
+        reply = msg.reply_to
+
+        reply_to_out = MessageOut(
+            id=reply.id,
+            sender_id=reply.sender_id,
+            receiver_id=reply.receiver_id,
+            content=reply.content,
+            message_type=serialize_message_type(reply.message_type),
+            is_read=reply.is_read,
+            read_at=reply.read_at.isoformat() if reply.read_at else None,
+            delivered_at=reply.delivered_at.isoformat() if reply.delivered_at else None,
+            reply_to=None,
+            reply_to_id=reply.reply_to_id,
+            is_forwarded=reply.is_forwarded,
+            forwarded_from_id=reply.forwarded_from_id,
+            original_sender=reply.original_sender,
+            original_sender_avatar=reply.original_sender_avatar,
+            created_at=reply.created_at.isoformat(),
+            sender_username=getattr(reply.sender, "username", None),
+            receiver_username=getattr(reply.receiver, "username", None),
+            voice_duration=reply.voice_duration,
+            file_size=reply.file_size,
+            seen_by=[]
+        )
+
+        reply_preview = build_reply_preview(reply)
+
+    message_out = build_message_out(
+        msg=msg,
+        reply_to=reply_to_out,
+        reply_preview=reply_preview,
+        seen_by=seen_by
+    )
+    if reactions is not None:
+        message_out.reactions = ReactionSummary(**reactions)
+    return message_out
+
+
+def serialize_history_page(db: Session, user_id: int, messages: List[PrivateMessage]) -> List[MessageOut]:
+    """Serialize a page with the reaction summaries of all its messages from one query"""
+    summaries = get_reaction_summaries(db, [msg.id for msg in messages], user_id)
+    return [serialize_private_message(msg, summaries.get(msg.id)) for msg in messages]
@@ -1,17 +1,17 @@
 import traceback
-from fastapi import APIRouter, Depends, HTTPException, status, Query, WebSocket, WebSocketDisconnect, BackgroundTasks
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, WebSocket, WebSocketDisconnect, BackgroundTasks
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
 from datetime import datetime
 from app.core.database import get_db
 from app.core.security import get_current_user, verify_token
 from app.crud.diary import (
-    create_diary, get_comment_by_id, get_list_favorite_diaries, get_visible, get_by_id, can_view, create_comment, 
-    create_like, get_visible_users_for_diary, update_comment, delete_comment, update_diary, 
+    create_diary, get_comment_by_id, get_list_favorite_diaries, get_visible_page, get_by_id, can_view, create_comment, 
+    create_like, update_comment, delete_comment, update_diary, 
     delete_diary, create_diary_for_group, share_diary, delete_share,
     save_diary_to_favorites, remove_diary_from_favorites, 
     get_favorite_diaries, get_diary_likes_count,
-    get_diary_comments, 
+    get_diary_comments, get_first_replies, build_feed_cards,
 )
 from app.models.user import User
 from app.schemas.diary import (
@@ -25,8 +25,10 @@ from app.models.diary_like import DiaryLike
 from app.models.diary_comment import DiaryComment
 from app.models.diary_favorite import DiaryFavorite
 from app.crud.activity import create_activity
+from app.crud.media_job import processing_diary_ids
 from app.models.activity import ActivityType
 from app.services.websocket_manager import manager
+from app.services.ws_topics import diary_topic
 from app.services import image_service_sync
 from app.utils.mentions import extract_mentions
 
@@ -39,6 +41,17 @@ async def send_websocket_notification(user_room: str, message: dict):
     except Exception as e:
         print(f"WebSocket notification failed: {e}")
 
+async def publish_diary_event(diary_id: int, message: dict, author_id: Optional[int] = None):
+    """
+    Send an engagement event to the sockets that have the diary on screen
+    and, when given, to the author's feed; each socket gets it once
+    """
+    rooms = [f"feed_{author_id}"] if author_id is not None else []
+    try:
+        await manager.publish_topic(diary_topic(diary_id), message, rooms=rooms)
+    except Exception as e:
+        print(f"WebSocket topic publish failed: {e}")
+
 # ============ DIARY CRUD ENDPOINTS ============
 
 @router.post("/", response_model=DiaryOut, status_code=status.HTTP_201_CREATED)
@@ -79,6 +92,7 @@ def create_diary_endpoint(
             videos=diary.videos if diary.videos else [],
             video_thumbnails=filtered_thumbnails,
             media_type=diary.media_type,
+            media_status="processing" if processing_diary_ids(db, [diary.id]) else "ready",
             likes=[
                 DiaryLikeResponse(
                     id=like.id,
@@ -124,76 +138,15 @@ def get_feed(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     limit: int = Query(25, ge=1, le=100),
-    offset: int = Query(0, ge=0)  
+    offset: int = Query(0, ge=0),
+    before_id: Optional[int] = Query(None, description="Id of the last diary of the previous page")
 ):
-    visible_ids = [d.id for d in get_visible(db, current_user.id)]
-    diaries = (
-        db.query(Diary)
-        .options(
-            joinedload(Diary.author),
-            joinedload(Diary.groups),
-            joinedload(Diary.comments).joinedload(DiaryComment.user),
-            joinedload(Diary.likes).joinedload(DiaryLike.user),
-            joinedload(Diary.favorited_by)
-        )
-        .filter(Diary.id.in_(visible_ids))
-        .order_by(Diary.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+    diaries = get_visible_page(
+        db, current_user.id,
+        limit=limit, before_id=before_id, offset=offset,
+        options=[joinedload(Diary.author), selectinload(Diary.groups)]
     )
-    
-    result = []
-    for d in diaries:
-        diary_out = DiaryOut(
-            id=d.id,
-            author=CreatorResponse(
-                id=d.author.id,
-                username=d.author.username,
-                avatar_url=d.author.avatar_url
-            ),
-            title=d.title,
-            content=d.content,
-            share_type=d.share_type.value,
-            groups=[GroupResponse(id=g.id, name=g.name) for g in d.groups or []],
-            images=d.images or [],
-            videos=d.videos or [],
-            video_thumbnails=[thumb for thumb in (d.video_thumbnails or []) if thumb],
-            media_type=d.media_type,
-            likes=[
-                DiaryLikeResponse(
-                    id=l.id,
-                    user=CreatorResponse(
-                        id=l.user.id if l.user else -1,
-                        username=l.user.username if l.user else "Deleted User",
-                        avatar_url=l.user.avatar_url if l.user else None
-                    )
-                )
-                for l in d.likes or []
-            ],
-            is_deleted=d.is_deleted,
-            created_at=d.created_at,
-            updated_at=d.updated_at,
-            favorited_user_ids=[f.user_id for f in d.favorited_by or []],
-            comments=[
-                CommentResponse(
-                    content=c.content,
-                    created_at=c.created_at,
-                    user=CreatorResponse(
-                        id=c.user.id if c.user else -1,
-                        username=c.user.username if c.user else "Deleted User",
-                        avatar_url=c.user.avatar_url if c.user else None
-                    ),
-                    images=c.images or [],
-                    parent_id=c.parent_id,
-                    replies=[]
-                )
-                for c in d.comments or []
-            ]
-        )
-        result.append(diary_out)
-
-    return result
+    return build_feed_cards(db, diaries, current_user)
 
 @router.get("/{diary_id}", response_model=DiaryOut)
 def get_diary_by_id(
@@ -455,19 +408,11 @@ def create_diary_comment(
             "is_reply": parent_id is not None  # Use the corrected parent_id
         }
         
-        # Broadcast to all users who can view this diary
-        visible_user_ids = get_visible_users_for_diary(db, diary_id)
-        unique_user_ids = set(visible_user_ids)
-        
-        for user_id in unique_user_ids:
-            if user_id == current_user.id:
-                continue  # Don't send to self
-                
-            background_tasks.add_task(
-                send_websocket_notification,
-                f"feed_{user_id}",
-                notification_data
-            )
+        # Viewers subscribed to the diary, plus the author wherever they are
+        background_tasks.add_task(
+            publish_diary_event, diary_id, notification_data,
+            diary.user_id if diary.user_id != current_user.id else None
+        )
         
         return response
         
@@ -485,11 +430,19 @@ def create_diary_comment(
 @router.get("/{diary_id}/comments", response_model=List[DiaryCommentOut])
 def get_diary_comments_endpoint(
     diary_id: int,
+    response: Response,
+    parent_id: Optional[int] = Query(None, description="List replies of this comment instead of root comments"),
+    after_id: Optional[int] = Query(None, description="Id of the last comment of the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    replies: int = Query(3, ge=0, le=20, description="Replies to inline under each root comment"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get all comments for a diary with nested replies and mentions
+    One page of comments, oldest first. Root comments carry their first
+    few replies and every comment its reply_count; further replies are
+    fetched with parent_id (and after_id for the next page of a thread).
+    X-Has-More / X-Next-After-Id describe the next page.
     """
     diary = db.query(Diary).filter(Diary.id == diary_id).first()
     if not diary:
@@ -499,29 +452,17 @@ def get_diary_comments_endpoint(
         if not can_view(db, diary, current_user.id):
             raise HTTPException(status_code=403, detail="No permission to view comments")
     
-    comments = get_diary_comments(db, diary_id)
-    
-    comment_map = {}
-    root_comments = []
-    
-    for comment in comments:
-        comment_map[comment.id] = {
-            'comment': comment,
-            'children': []
-        }
-    
-    for comment in comments:
-        node = comment_map[comment.id]
-        if comment.parent_id is None:
-            root_comments.append(node)
-        else:
-            parent_node = comment_map.get(comment.parent_id)
-            if parent_node:
-                parent_node['children'].append(node)
-    
-    def build_nested(node):
-        comment = node['comment']
-        
+    rows, has_more = get_diary_comments(db, diary_id, parent_id=parent_id, after_id=after_id, limit=limit)
+
+    inline = {}
+    if parent_id is None:
+        inline = get_first_replies(db, [comment.id for comment, _ in rows], per_thread=replies)
+
+    response.headers["X-Has-More"] = "true" if has_more else "false"
+    if rows:
+        response.headers["X-Next-After-Id"] = str(rows[-1][0].id)
+
+    def build_comment(comment, reply_count, children):
         # Build reply_to_user info if exists
         reply_to_user_response = None
         if comment.reply_to_user:
@@ -544,13 +485,14 @@ def get_diary_comments_endpoint(
             parent_id=comment.parent_id,
             reply_to_user_id=comment.reply_to_user_id,
             reply_to_user=reply_to_user_response,
-            replies=[build_nested(child) for child in node['children']],
+            replies=[build_comment(child, count, []) for child, count in children],
+            reply_count=reply_count or 0,
             created_at=comment.created_at,
             is_edited=comment.is_edited,
             updated_at=comment.updated_at
         )
     
-    return [build_nested(node) for node in root_comments]
+    return [build_comment(comment, count, inline.get(comment.id, [])) for comment, count in rows]
 
 @router.put("/comments/{comment_id}", response_model=DiaryCommentOut)
 def update_comment_by_id(
@@ -676,16 +618,7 @@ def update_comment_by_id(
             "action": "updated"
         }
         
-        # Broadcast to all users who can view this diary
-        visible_user_ids = get_visible_users_for_diary(db, comment.diary_id)
-        unique_user_ids = set(visible_user_ids)
-        
-        for user_id in unique_user_ids:
-            background_tasks.add_task(
-                send_websocket_notification,
-                f"feed_{user_id}",
-                notification_data
-            )
+        background_tasks.add_task(publish_diary_event, comment.diary_id, notification_data)
         
         return response
         
@@ -757,15 +690,7 @@ def delete_comment_by_id(
             "diary_title": diary.title  
         }
         
-        visible_user_ids = get_visible_users_for_diary(db, diary_id)
-        unique_user_ids = set(visible_user_ids)
-        
-        for user_id in unique_user_ids:
-            background_tasks.add_task(
-                send_websocket_notification,
-                f"feed_{user_id}",
-                notification_data
-            )
+        background_tasks.add_task(publish_diary_event, diary_id, notification_data)
         
         return {
             "detail": "Comment deleted successfully",
@@ -851,22 +776,19 @@ def like_diary_endpoint(
             DiaryLike.user_id == current_user.id
         ).first() is not None
         
-        # Send WebSocket notification
-        background_tasks.add_task(
-            send_websocket_notification,
-            f"feed_{diary.user_id}",
-            {
-                "type": "like_updated",
-                "diary_id": diary_id,
-                "user_id": current_user.id,
-                "username": current_user.username,
-                "avatar_url": current_user.avatar_url,
-                "action": action,
-                "likes_count": likes_count,
-                "current_user_likes": current_user_likes,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
+        # Send WebSocket notification to the author and to current viewers
+        like_event = {
+            "type": "like_updated",
+            "diary_id": diary_id,
+            "user_id": current_user.id,
+            "username": current_user.username,
+            "avatar_url": current_user.avatar_url,
+            "action": action,
+            "likes_count": likes_count,
+            "current_user_likes": current_user_likes,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        background_tasks.add_task(publish_diary_event, diary_id, like_event, diary.user_id)
         
         return {
             "message": f"Like {action} successfully", 
@@ -1041,62 +963,11 @@ def get_favorite_diaries_list_endpoint(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get list of favorited diaries with full details
+    Get list of favorited diaries as feed cards
     """
     try:
         diaries = get_list_favorite_diaries(db, current_user.id)  # Use correct function name
-        
-        result = []
-        for d in diaries:
-            diary_out = DiaryOut(
-                id=d.id,
-                author=CreatorResponse(
-                    id=d.author.id,
-                    username=d.author.username,
-                    avatar_url=d.author.avatar_url
-                ),
-                title=d.title,
-                content=d.content,
-                share_type=d.share_type.value,
-                groups=[GroupResponse(id=g.id, name=g.name) for g in d.groups or []],
-                images=d.images or [],
-                videos=d.videos or [],
-                video_thumbnails=[thumb for thumb in (d.video_thumbnails or []) if thumb],
-                media_type=d.media_type,
-                likes=[
-                    DiaryLikeResponse(
-                        id=l.id,
-                        user=CreatorResponse(
-                            id=l.user.id if l.user else -1,
-                            username=l.user.username if l.user else "Deleted User",
-                            avatar_url=l.user.avatar_url if l.user else None
-                        )
-                    )
-                    for l in d.likes or []
-                ],
-                is_deleted=d.is_deleted,
-                created_at=d.created_at,
-                updated_at=d.updated_at,
-                favorited_user_ids=[f.user_id for f in d.favorited_by or []],
-                comments=[
-                    CommentResponse(
-                        content=c.content,
-                        created_at=c.created_at,
-                        user=CreatorResponse(
-                            id=c.user.id if c.user else -1,
-                            username=c.user.username if c.user else "Deleted User",
-                            avatar_url=c.user.avatar_url if c.user else None
-                        ),
-                        images=c.images or [],
-                        parent_id=c.parent_id,
-                        replies=[]
-                    )
-                    for c in d.comments or []
-                ]
-            )
-            result.append(diary_out)
-
-        return result
+        return build_feed_cards(db, diaries, current_user)
         
     except Exception as e:
         print(f"Error getting favorite diaries: {str(e)}")
@@ -1177,15 +1048,12 @@ def update_diary_by_id(
         )
         
         # Notify via WebSocket
-        background_tasks.add_task(
-            send_websocket_notification,
-            f"feed_{current_user.id}",
-            {
-                "type": "diary_updated",
-                "diary": response.dict(),
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
+        update_event = {
+            "type": "diary_updated",
+            "diary": response.dict(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        background_tasks.add_task(publish_diary_event, diary_id, update_event, current_user.id)
         
         return response
     except HTTPException:
@@ -1213,15 +1081,12 @@ def delete_diary_by_id(
         result = delete_diary(db, diary_id, current_user.id)
         
         # Notify via WebSocket
-        background_tasks.add_task(
-            send_websocket_notification,
-            f"feed_{current_user.id}",
-            {
-                "type": "diary_deleted",
-                "diary_id": diary_id,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
+        delete_event = {
+            "type": "diary_deleted",
+            "diary_id": diary_id,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        background_tasks.add_task(publish_diary_event, diary_id, delete_event, current_user.id)
         
         return result
         
@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import text
 from sqlalchemy import or_, and_
 from app.crud.activity import create_activity
+from app.crud.conversation import open_conversation
 from app.models.activity import Activity, ActivityType
 from app.schemas.friend import FriendResponse
 
@@ -194,6 +195,8 @@ async def accept_friend_request(
         now = datetime.utcnow()
         friend_request.status = FriendshipStatus.accepted
         friend_request.updated_at = now
+        open_conversation(db, current_user.id, "private", requester_id)
+        open_conversation(db, requester_id, "private", current_user.id)
         db.commit()
 
         requester = db.query(User).filter(User.id == requester_id).first()
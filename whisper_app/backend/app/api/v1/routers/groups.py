@@ -1,8 +1,9 @@
 # app/api/v1/routers/groups.py
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, Query
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.core.security import get_current_user
 from app.models.user import User
 from app.schemas.group import GroupCreate, GroupInviteOut, GroupMessageCreate, GroupOut, GroupUpdate, GroupInviteResponse, GroupImageResponse, GroupDetailsOut
@@ -15,9 +16,13 @@ from app.crud.group import (
 )
 from app.schemas.diary import DiaryOut
 from app.schemas.user import UserOut
-from app.crud.chat import get_group_messages
+from app.crud.chat import get_group_messages_async
+from app.crud.group_read import get_group_watermarks_async, merge_seen_by
+from app.crud.diary import build_feed_cards
+from app.utils.chat_helpers import is_group_member_async
 from app.models.group_message import GroupMessage
-from app.schemas.chat import GroupMessageOut
+from app.crud.conversation import add_group_message
+from app.schemas.chat import GroupMessageOut, GroupMessageSeen
 from app.models.group_invite import GroupInvite
 
 router = APIRouter()
@@ -85,7 +90,7 @@ async def send_group_message(
         content=msg_in.content,
         message_type=msg_in.message_type,
     )
-    db.add(message)
+    add_group_message(db, message)
     db.commit()
     db.refresh(message)
 
@@ -105,18 +110,28 @@ async def send_group_message(
     return message
    
 @router.get("/{group_id}/message", response_model=List[GroupMessageOut])
-def get_group_messages_(
+async def get_group_messages_(
     group_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
     current_user: User = Depends(get_current_user),
 ):
-    if not exists_member(db, group_id, current_user.id):
+    if not await is_group_member_async(db, group_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    messages = get_group_messages(db, group_id, limit, offset)
-    return messages or []
+    messages = await get_group_messages_async(db, group_id, limit, offset)
+    if not messages:
+        return []
+
+    # Seen-by lists are derived from the members' read watermarks, loaded once per page
+    watermarks = await get_group_watermarks_async(db, group_id)
+    page = []
+    for message in messages:
+        message_out = GroupMessageOut.model_validate(message)
+        message_out.seen_by = [GroupMessageSeen(**entry) for entry in merge_seen_by(message, watermarks)]
+        page.append(message_out)
+    return page
 
 @router.post("/{token}/accept")
 def accept_invite(token: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -156,7 +171,8 @@ def get_group_diaries_endpoint(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return get_group_diaries(db, group_id, current_user.id, search)
+    diaries = get_group_diaries(db, group_id, current_user.id, search)
+    return build_feed_cards(db, diaries, current_user)
 
 @router.get("/invites/pending", response_model=List[GroupInviteResponse])
 def get_pending_invites_(
@@ -9,6 +9,7 @@ from app.crud.reaction import (
     create_reaction, 
     delete_reaction, 
     get_message_reactions,
+    get_reaction_summaries,
     get_reaction_summary
 )
 from app.schemas.reaction import (
@@ -20,6 +21,8 @@ from app.schemas.reaction import (
 
 router = APIRouter()
 
+MAX_BATCH_MESSAGE_IDS = 500
+
 @router.post(
     "/messages/{message_id}/reactions", 
     response_model=ReactionOut,
@@ -225,22 +228,14 @@ async def get_batch_reactions_summary(
     """
     try:
         # Limit the number of messages to prevent abuse
-        if len(message_ids) > 50:
+        if len(message_ids) > MAX_BATCH_MESSAGE_IDS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Too many messages requested (max 50)"
+                detail=f"Too many messages requested (max {MAX_BATCH_MESSAGE_IDS})"
             )
         
-        summaries = {}
-        for msg_id in message_ids:
-            try:
-                summary = get_reaction_summary(db, msg_id, current_user.id)
-                summaries[msg_id] = summary
-            except HTTPException:
-                # Skip messages user doesn't have access to
-                continue
-            except Exception:
-                continue
+        # Messages the user doesn't have access to are simply absent
+        summaries = get_reaction_summaries(db, message_ids, current_user.id)
         
         return {
             "summaries": summaries,
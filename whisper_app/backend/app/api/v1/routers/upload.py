@@ -5,10 +5,67 @@ from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User
 from app.services.image_service_sync import image_service_sync
+from app.core.cloudinary import (
+    create_upload_ticket,
+    direct_upload_url,
+    generate_video_thumbnail,
+    upload_folder,
+    verify_direct_upload,
+)
+from app.schemas.upload import UploadComplete, UploadCompleteOut, UploadTicketCreate, UploadTicketOut
 import base64
+import uuid
 
 router = APIRouter(tags=["uploads"])
 
+def _ticket_prefix(user_id: int, media_type: str, is_diary: bool) -> str:
+    base_folder = "diaries" if is_diary else "comments"
+    return f"{upload_folder(f'{base_folder}/{media_type}s')}/u{user_id}_"
+
+@router.post("/tickets", response_model=UploadTicketOut)
+async def create_media_upload_ticket(
+    ticket_in: UploadTicketCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Signed ticket for uploading one image or video directly to storage.
+    Post the file with `fields` to `upload_url`, then send the response's
+    public_id, version and signature to /tickets/complete.
+    """
+    public_id = _ticket_prefix(current_user.id, ticket_in.media_type, ticket_in.is_diary) + uuid.uuid4().hex[:16]
+    ticket = create_upload_ticket(public_id, resource_type=ticket_in.media_type)
+    return UploadTicketOut(
+        public_id=public_id,
+        resource_type=ticket_in.media_type,
+        **ticket
+    )
+
+@router.post("/tickets/complete", response_model=UploadCompleteOut)
+async def complete_media_upload(
+    upload: UploadComplete,
+    current_user: User = Depends(get_current_user)
+):
+    """Record a direct upload; returns the same shape as /media"""
+    # Tickets are only issued under the user's own prefix
+    own_prefixes = tuple(
+        _ticket_prefix(current_user.id, upload.resource_type, is_diary) for is_diary in (True, False)
+    )
+    if not upload.public_id.startswith(own_prefixes):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Upload was not made with your ticket"
+        )
+
+    if not verify_direct_upload(upload.public_id, upload.version, upload.signature):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid upload signature"
+        )
+
+    url = direct_upload_url(upload.public_id, upload.version, upload.resource_type)
+    thumbnail = generate_video_thumbnail(url) if upload.resource_type == "video" else None
+    return UploadCompleteOut(url=url, type=upload.resource_type, thumbnail=thumbnail)
+
 @router.post("/media")
 async def upload_media(
     data_url: str = Body(...),
@@ -19,7 +76,8 @@ async def upload_media(
 ):
     """
     Upload media from Flutter app (images or videos)
-    Accepts base64 data URL and returns Cloudinary URL
+    Accepts base64 data URL and returns Cloudinary URL.
+    Fallback for clients without direct uploads, see /tickets.
     """
     print(f"📤 Upload media request from user {current_user.id}")
     print(f"📁 Filename: {filename}")
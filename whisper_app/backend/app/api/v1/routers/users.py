@@ -3,7 +3,7 @@ from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.security import get_current_db_user, get_current_user
 from app.crud.user import search, update, get_friend_suggestions
 from app.models.user import User
 from app.schemas.user import UserOut, UserUpdate
@@ -24,7 +24,7 @@ def get_me(current_user: User = Depends(get_current_user)):
 def update_me(
     user_in: UserUpdate, 
     db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_db_user)
 ):
     updated = update(db, current_user, user_in)
     return UserOut.from_orm(updated)
@@ -1,18 +1,30 @@
 # app/api/endpoints/websocket_feed.py
 import asyncio
 import json
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
-from app.core.database import get_db
-from app.core.security import verify_token
-from app.models.user import User
+from app.core.database import session_scope
+from app.core.security import get_user_snapshot, verify_token
+from app.crud.diary import visible_diary_filter
+from app.models.diary import Diary
 from app.services.websocket_manager import manager
+from app.services.ws_topics import diary_topic
 
 router = APIRouter()
 
+MAX_DIARY_IDS_PER_FRAME = 100
+
+def _diary_ids(data: dict) -> list:
+    ids = []
+    for raw in (data.get("diary_ids") or [])[:MAX_DIARY_IDS_PER_FRAME]:
+        try:
+            ids.append(int(raw))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
 @router.websocket("/ws/feed")
-async def websocket_feed(websocket: WebSocket, db: Session = Depends(get_db)):
+async def websocket_feed(websocket: WebSocket):
     """
     WebSocket endpoint for real-time feed updates
     """
@@ -87,7 +99,8 @@ async def websocket_feed(websocket: WebSocket, db: Session = Depends(get_db)):
         
         # 5. Load user from DB
         print(f"👤 Loading user with ID: {user_id}")
-        current_user = db.query(User).filter(User.id == user_id).first()
+        with session_scope("ws_feed") as db:
+            current_user = get_user_snapshot(db, user_id)
         if not current_user:
             print(f"❌ User not found with ID: {user_id}")
             await websocket.send_json({
@@ -149,18 +162,34 @@ async def websocket_feed(websocket: WebSocket, db: Session = Depends(get_db)):
                     })
                     
                 elif message_type == "subscribe":
-                    # Subscribe to specific feed types
+                    # Subscribe to specific feed types and to engagement
+                    # events of the diaries currently on screen
                     feed_types = data.get("feed_types", ["global", "friends"])
+                    diary_ids = _diary_ids(data)
+                    if diary_ids:
+                        with session_scope("ws_feed") as db:
+                            diary_ids = [
+                                row[0] for row in db.query(Diary.id).filter(
+                                    Diary.id.in_(diary_ids),
+                                    visible_diary_filter(current_user.id)
+                                ).all()
+                            ]
+                    dropped = manager.subscribe(websocket, [diary_topic(d) for d in diary_ids])
                     await websocket.send_json({
                         "type": "subscription_confirmed",
                         "feed_types": feed_types,
+                        "diary_ids": diary_ids,
+                        "dropped": dropped,
                         "timestamp": asyncio.get_event_loop().time()
                     })
                     
                 elif message_type == "unsubscribe":
-                    # Unsubscribe from feed types
+                    # Unsubscribe from feed types / diaries scrolled away
+                    diary_ids = _diary_ids(data)
+                    manager.unsubscribe(websocket, [diary_topic(d) for d in diary_ids])
                     await websocket.send_json({
                         "type": "unsubscribed",
+                        "diary_ids": diary_ids,
                         "timestamp": asyncio.get_event_loop().time()
                     })
                     
@@ -209,5 +238,5 @@ async def websocket_feed(websocket: WebSocket, db: Session = Depends(get_db)):
         # Clean up connection
         if current_user:
             user_room = f"feed_{current_user.id}"
-            await manager.disconnect(user_room, websocket)
+            manager.disconnect(user_room, websocket)
             print(f"📰 User {current_user.id} disconnected from feed")
\ No newline at end of file
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.models.private_message import PrivateMessage
+from app.crud.conversation import add_private_message
 from app.models.user import User
 
 
@@ -128,7 +129,7 @@ async def handle_private_message(sender_id: int, receiver_id: int, message_data:
             created_at=datetime.utcnow()
         )
         
-        db.add(message)
+        add_private_message(db, message)
         db.commit()
         db.refresh(message)
         
@@ -2,10 +2,12 @@ import traceback
 from typing import Any, Dict
 import cloudinary
 from cloudinary import uploader, api
-from cloudinary.utils import cloudinary_url
+from cloudinary.utils import api_sign_request, cloudinary_api_url, cloudinary_url, verify_api_response_signature
 import uuid
 import os
+import re
 import tempfile
+import time
 
 # Remove the direct settings import to avoid circular imports
 # from app.core.config import settings  # ← Remove this
@@ -20,6 +22,9 @@ def configure_cloudinary():
             api_secret=os.getenv('CLOUDINARY_API_SECRET'),
             secure=True
         )
+        # API host override, e.g. a local fake server in tests
+        if os.getenv('CLOUDINARY_UPLOAD_PREFIX'):
+            cloudinary.config(upload_prefix=os.getenv('CLOUDINARY_UPLOAD_PREFIX'))
         print("✅ Cloudinary configured successfully")
     except Exception as e:
         print(f"❌ Cloudinary configuration failed: {str(e)}")
@@ -28,6 +33,33 @@ def configure_cloudinary():
 # Call configuration
 configure_cloudinary()
 
+STREAM_CHUNK_SIZE = 6000000  # Chunked uploads need at least 5MB per chunk
+
+class _LeaveOpen:
+    """File proxy for upload_large, which closes what it is given; the caller owns the file"""
+    def __init__(self, file):
+        self._file = file
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def upload_file(file, **options):
+    """
+    uploader.upload for bytes, paths and URLs. File objects are sent with
+    upload_large, which reads one chunk at a time instead of the whole file,
+    and stay open so a failed upload can be retried.
+    """
+    if hasattr(file, "read"):
+        options.setdefault("chunk_size", STREAM_CHUNK_SIZE)
+        return uploader.upload_large(_LeaveOpen(file), **options)
+    return uploader.upload(file, **options)
+
 def upload_to_cloudinary(file_content, public_id=None, folder=None, resource_type="image", **kwargs):
     """
     Upload file to Cloudinary with support for different resource types
@@ -80,13 +112,30 @@ def upload_to_cloudinary(file_content, public_id=None, folder=None, resource_typ
             if folder:
                 upload_kwargs["folder"] = f"{base_folder}/{folder}"
         
-        upload_result = uploader.upload(**upload_kwargs)
+        upload_result = upload_file(upload_kwargs.pop("file"), **upload_kwargs)
         return upload_result
     except Exception as e:
         raise Exception(f"Cloudinary upload failed: {str(e)}")
 
-def upload_video_to_cloudinary(video_data: bytes, folder: str = "videos") -> Dict[str, Any]:
-    """Upload video to Cloudinary with GUARANTEED thumbnail"""
+VIDEO_THUMBNAIL = {"width": 320, "height": 180, "crop": "fill", "quality": "auto", "format": "jpg"}
+VIDEO_RENDITIONS = [
+    {"width": 640, "height": 360, "crop": "limit", "quality": "auto:eco", "format": "mp4"},
+    {"width": 1280, "height": 720, "crop": "limit", "quality": "auto:eco", "format": "mp4"},
+]
+# Rendition diaries link to when derivatives are generated in the background
+VIDEO_PLAYBACK = VIDEO_RENDITIONS[-1]
+
+def upload_video_to_cloudinary(video_data: bytes, folder: str = "videos",
+                               wait_for_derivatives: bool = True) -> Dict[str, Any]:
+    """
+    Upload video to Cloudinary with GUARANTEED thumbnail.
+    With wait_for_derivatives=False the upload returns as soon as the bytes
+    are stored: thumbnail and renditions render asynchronously (see
+    generate_video_derivatives), thumbnail_url is None and secure_url is the
+    playback rendition's URL.
+    """
+    if not wait_for_derivatives:
+        return _upload_video_deferred(video_data, folder)
     try:
         base_folder = os.getenv('CLOUDINARY_UPLOAD_FOLDER', 'whisper_space')
         full_folder = f"{base_folder}/{folder}"
@@ -179,7 +228,66 @@ def upload_video_to_cloudinary(video_data: bytes, folder: str = "videos") -> Dic
         traceback.print_exc()
         raise Exception(f"Video upload failed: {str(e)}")
 
-def upload_voice_message(file_content: bytes, public_id: str = None, folder: str = "voice_messages"):
+def _upload_video_deferred(video_data: bytes, folder: str) -> Dict[str, Any]:
+    try:
+        public_id = f"video_{uuid.uuid4().hex[:12]}"
+        print(f"📤 Uploading video to {upload_folder(folder)}/{public_id}, derivatives deferred")
+
+        with tempfile.NamedTemporaryFile(suffix='.mp4') as tmp_file:
+            tmp_file.write(video_data)
+            tmp_file.flush()
+            upload_result = uploader.upload_large(
+                tmp_file.name,
+                resource_type="video",
+                public_id=public_id,
+                folder=upload_folder(folder),
+                overwrite=True,
+                eager=[VIDEO_THUMBNAIL, *VIDEO_RENDITIONS],
+                eager_async=True,
+                chunk_size=STREAM_CHUNK_SIZE,
+                timeout=120
+            )
+
+        playback_url, _ = cloudinary_url(
+            upload_result["public_id"],
+            resource_type="video",
+            transformation=[VIDEO_PLAYBACK],
+            version=upload_result.get("version"),
+            secure=True
+        )
+        return {
+            "secure_url": playback_url,
+            "public_id": upload_result["public_id"],
+            "thumbnail_url": None,
+            "duration": upload_result.get("duration"),
+            "bytes": upload_result.get("bytes"),
+            "format": "mp4"
+        }
+    except Exception as e:
+        print(f"❌ Video upload failed: {str(e)}")
+        traceback.print_exc()
+        raise Exception(f"Video upload failed: {str(e)}")
+
+def generate_video_derivatives(public_id: str) -> Dict[str, Any]:
+    """
+    Thumbnail and renditions of an uploaded video. Blocks until Cloudinary
+    has rendered them (or returns them if the upload's eager transforms
+    already finished), so call it off the request path.
+    """
+    result = uploader.explicit(
+        public_id,
+        type="upload",
+        resource_type="video",
+        eager=[VIDEO_THUMBNAIL, *VIDEO_RENDITIONS],
+        eager_async=False,
+        timeout=600
+    )
+    eager = result.get("eager") or []
+    thumbnail_url = next((item.get("secure_url") for item in eager if item.get("format") == "jpg"), None)
+    renditions = [item.get("secure_url") for item in eager if item.get("format") != "jpg" and item.get("secure_url")]
+    return {"thumbnail_url": thumbnail_url, "renditions": renditions}
+
+def upload_voice_message(file_content, public_id: str = None, folder: str = "voice_messages"):
     """
     FIXED: Consistent folder handling for audio files
     """
@@ -192,7 +300,7 @@ def upload_voice_message(file_content: bytes, public_id: str = None, folder: str
 
         print(f"📤 Uploading voice → {full_folder}/{public_id}")
 
-        upload_result = uploader.upload(
+        upload_result = upload_file(
             file_content,
             resource_type="video",  # Use "video" for audio files in Cloudinary
             public_id=public_id,
@@ -218,6 +326,61 @@ def upload_voice_message(file_content: bytes, public_id: str = None, folder: str
         traceback.print_exc()
         raise Exception(f"Cloudinary upload failed: {str(e)}")
 
+# Direct uploads: the client sends bytes straight to Cloudinary with a
+# signed ticket, and the API only records the reference afterwards
+DIRECT_UPLOAD_FORMATS = {
+    "image": "jpg,jpeg,png,gif,webp,bmp,tiff,heic",
+    "video": "mp4,mov,avi,webm,ogv,wmv,flv,mkv,mpeg,3gp",
+}
+DIRECT_UPLOAD_TTL = 3600  # Cloudinary rejects signatures older than an hour
+VIDEO_THUMBNAIL_EAGER = "c_fill,h_180,w_320/q_auto/f_jpg"
+
+def upload_folder(folder: str) -> str:
+    base_folder = os.getenv('CLOUDINARY_UPLOAD_FOLDER', 'whisper_space')
+    return f"{base_folder}/{folder}"
+
+def create_upload_ticket(public_id: str, resource_type: str = "image") -> Dict[str, Any]:
+    """
+    Signed form fields for uploading one file directly to Cloudinary under
+    `public_id`. Only the signed parameters are accepted with it, so the
+    client cannot choose another name, overwrite an asset or change types.
+    """
+    config = cloudinary.config()
+    timestamp = int(time.time())
+    params = {
+        "timestamp": timestamp,
+        "public_id": public_id,
+        "overwrite": "false",
+        "allowed_formats": DIRECT_UPLOAD_FORMATS[resource_type],
+    }
+    if resource_type == "image":
+        params["transformation"] = "c_limit,h_1200,w_1200/q_auto"
+    else:
+        # Thumbnail is rendered after the upload returns; its URL is known up front
+        params["eager"] = VIDEO_THUMBNAIL_EAGER
+        params["eager_async"] = "true"
+
+    params["signature"] = api_sign_request(params, config.api_secret)
+    params["api_key"] = config.api_key
+    return {
+        # Follows CLOUDINARY_UPLOAD_PREFIX like the SDK's own uploads
+        "upload_url": cloudinary_api_url("upload", resource_type=resource_type),
+        "fields": params,
+        "expires_at": timestamp + DIRECT_UPLOAD_TTL,
+    }
+
+def verify_direct_upload(public_id: str, version: int, signature: str) -> bool:
+    """True when (public_id, version, signature) came from a real Cloudinary upload response"""
+    try:
+        return verify_api_response_signature(public_id, version, signature)
+    except Exception as e:
+        print(f"Failed to verify upload signature: {str(e)}")
+        return False
+
+def direct_upload_url(public_id: str, version: int, resource_type: str = "image") -> str:
+    url, _ = cloudinary_url(public_id, version=version, resource_type=resource_type, secure=True)
+    return url
+
 def generate_thumbnail_url(video_url, width=320, height=180, crop="fill"):
     """
     Generate a thumbnail URL for a video
@@ -270,7 +433,10 @@ def extract_public_id_from_url(url):
         if upload_index >= len(parts) - 1:
             return None
         
-        public_id_parts = parts[upload_index + 2:]
+        # Everything after the version; transformation segments may precede it
+        rest = parts[upload_index + 1:]
+        versions = [i for i, part in enumerate(rest) if re.fullmatch(r"v\d+", part)]
+        public_id_parts = rest[versions[0] + 1:] if versions else rest[1:]
         public_id = '/'.join(public_id_parts)
         
         if '.' in public_id:
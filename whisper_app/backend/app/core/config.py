@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
+from typing import Optional
 import os
 
 load_dotenv()
@@ -30,6 +31,60 @@ class Settings(BaseSettings):
     CLOUDINARY_API_SECRET: str
     CLOUDINARY_UPLOAD_FOLDER: str = "whisper_space"
     
+    # Multipart uploads are validated in chunks of this size
+    UPLOAD_READ_CHUNK_SIZE: int = 1024 * 1024
+    
+    # Storage calls from async routes: threads, retries of transient errors, first backoff (s)
+    STORAGE_MAX_CONCURRENCY: int = 16
+    STORAGE_RETRIES: int = 2
+    STORAGE_RETRY_BACKOFF: float = 0.5
+    
+    # WebSocket fan-out across workers: "memory" (single worker) or "redis"
+    WS_BACKPLANE: str = "memory"
+    REDIS_URL: Optional[str] = None
+    
+    # Backplane heartbeat period (s); a worker silent for WS_NODE_TTL is dropped from presence
+    WS_NODE_HEARTBEAT_INTERVAL: float = 10.0
+    WS_NODE_TTL: float = 30.0
+    
+    # WebSocket outbound buffering; policy is "drop_oldest", "drop_newest" or "evict"
+    WS_SEND_TIMEOUT: float = 5.0
+    WS_OUTBOUND_QUEUE_SIZE: int = 256
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"
+    
+    # Topic subscriptions (e.g. diary:{id}) held per socket before the oldest is dropped
+    WS_MAX_TOPICS_PER_SOCKET: int = 200
+    
+    # bcrypt cost (older hashes are upgraded on login) and hashes run at once
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_CONCURRENCY: int = os.cpu_count() or 2
+    
+    # Authenticated-user snapshots cached per process (0 disables the cache)
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_SIZE: int = 10000
+    
+    # Presence (online flag, last activity/seen) is buffered and written in bulk this often
+    PRESENCE_FLUSH_INTERVAL: float = 5.0
+    
+    # Group "seen up to" marks are coalesced per group for this long before broadcasting
+    GROUP_SEEN_DEBOUNCE_MS: int = 300
+    
+    # Media items of one diary uploaded at the same time
+    DIARY_MEDIA_PARALLELISM: int = 4
+    
+    # Background media jobs (video thumbnails/renditions); 0 workers renders them in the request.
+    # Running jobs not finished after MEDIA_JOB_STALE_AFTER seconds are picked up again.
+    MEDIA_JOB_WORKERS: int = 2
+    MEDIA_JOB_POLL_INTERVAL: float = 5.0
+    MEDIA_JOB_MAX_ATTEMPTS: int = 5
+    MEDIA_JOB_STALE_AFTER: float = 900.0
+    
+    # Diary home timeline (fan-out on write). Diaries whose audience exceeds
+    # the fan-out limit, and public diaries, are resolved at read time.
+    DIARY_TIMELINE_ENABLED: bool = False
+    DIARY_TIMELINE_SIZE: int = 800
+    DIARY_TIMELINE_FANOUT_LIMIT: int = 2000
+    
     # Environment
     ENVIRONMENT: str = "production"
     
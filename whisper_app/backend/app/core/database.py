@@ -1,6 +1,9 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
-from contextlib import contextmanager
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from contextlib import contextmanager, asynccontextmanager
+from collections import defaultdict
+import threading
 from app.core.config import settings
 
 engine = create_engine(
@@ -13,6 +16,66 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url: str) -> str:
+    """Point a sync postgres URL at the asyncpg driver"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+# Async twin of `engine` for WebSocket handlers and hot async routes, so a
+# slow query awaits instead of blocking the event loop.
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20,
+    pool_timeout=30,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+class PoolCheckoutGauge:
+    """Tracks how many pooled sessions each endpoint currently holds."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.in_use = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.total = defaultdict(int)
+
+    def acquire(self, endpoint: str) -> None:
+        with self._lock:
+            self.in_use[endpoint] += 1
+            self.total[endpoint] += 1
+            if self.in_use[endpoint] > self.peak[endpoint]:
+                self.peak[endpoint] = self.in_use[endpoint]
+
+    def release(self, endpoint: str) -> None:
+        with self._lock:
+            self.in_use[endpoint] = max(0, self.in_use[endpoint] - 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {
+                    "in_use": self.in_use[endpoint],
+                    "peak": self.peak[endpoint],
+                    "total": self.total[endpoint],
+                }
+                for endpoint in self.total
+            }
+
+
+pool_gauge = PoolCheckoutGauge()
+
 def get_db() -> Session:
     db = SessionLocal()
     try:
@@ -27,3 +90,53 @@ def get_session():
         yield db
     finally:
         db.close()
+
+@contextmanager
+def session_scope(endpoint: str = "default"):
+    """
+    Short-lived unit of work: borrow a pooled session, commit on success,
+    roll back on error and always hand the connection back to the pool.
+    Long-lived handlers (WebSockets) should open one of these per frame
+    instead of holding a session for the whole connection.
+    """
+    db = SessionLocal()
+    pool_gauge.acquire(endpoint)
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        pool_gauge.release(endpoint)
+
+async def get_async_db() -> AsyncSession:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@asynccontextmanager
+async def async_session_scope(endpoint: str = "default"):
+    """Async counterpart of session_scope()"""
+    pool_gauge.acquire(endpoint)
+    try:
+        async with AsyncSessionLocal() as db:
+            try:
+                yield db
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+    finally:
+        pool_gauge.release(endpoint)
+
+def get_pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin(),
+        "async_checked_out": async_engine.pool.checkedout(),
+        "endpoints": pool_gauge.snapshot(),
+    }
@@ -0,0 +1,95 @@
+# app/core/hashing.py
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+# One context for the process. min_rounds makes hashes below the current
+# cost "need update", so they are rehashed the next time the user logs in.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+class HashingPool:
+    """
+    Bounded thread pool for bcrypt. bcrypt releases the GIL while hashing,
+    so threads scale with cores without pickling hashes to a process pool.
+    At most `max_workers` hashes run at once; the rest wait in the queue,
+    which is what the metrics report.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+        return self._executor.submit(self._run, enqueued_at, fn, *args)
+
+    def _run(self, enqueued_at: float, fn: Callable, *args):
+        started_at = time.perf_counter()
+        waited = started_at - enqueued_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.run_total += time.perf_counter() - started_at
+
+    async def run(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "avg_wait_ms": round(self.wait_total / completed * 1000, 2),
+                "max_wait_ms": round(self.wait_max * 1000, 2),
+                "avg_run_ms": round(self.run_total / completed * 1000, 2),
+            }
+
+
+hashing_pool = HashingPool(settings.PASSWORD_HASH_CONCURRENCY)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password; blocks the calling thread, never more than the pool allows at once"""
+    return hashing_pool.submit(pwd_context.hash, password).result()
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is set when the stored hash uses outdated parameters"""
+    return hashing_pool.submit(pwd_context.verify_and_update, plain_password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    """Event-loop friendly variant for async routes"""
+    return await hashing_pool.run(pwd_context.hash, password)
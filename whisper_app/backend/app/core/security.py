@@ -5,16 +5,14 @@ from typing import Optional
 from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.user_cache import UserSnapshot, user_cache
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def verify_token(token: str) -> Optional[dict]:
     """
     Verify JWT token and return payload
@@ -81,12 +79,23 @@ def create_refresh_token(user_id: int) -> str:
     }
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+def get_user_snapshot(db: Session, user_id: int) -> Optional[UserSnapshot]:
     """
-    Get current user from JWT token
+    Cached lookup of a user by id. A cache hit never touches the session,
+    so no connection is checked out for it.
+    """
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        user_cache.put(snapshot)
+    return snapshot
+
+def _access_token_user_id(token: str) -> int:
+    """
+    User id of a valid access token
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -114,42 +123,48 @@ def get_current_user(
     
     # Convert to integer
     try:
-        user_id = int(user_id_str)
+        return int(user_id_str)
     except (ValueError, TypeError):
         raise credentials_exception
-    
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise credentials_exception
-    
-    return user
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> UserSnapshot:
     """
-    Verify a plain password against a hashed password
+    Get current user from JWT token, as a cached read-only snapshot
     """
-    # You should use a proper password hashing library like passlib
-    # For now, using a simple comparison (replace with actual hashing)
-    from passlib.context import CryptContext
-    
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    return pwd_context.verify(plain_password, hashed_password)
+    user = get_user_snapshot(db, _access_token_user_id(token))
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
 
-def hash_password(password: str) -> str:
+def get_current_db_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
     """
-    Hash a password
+    Get current user from JWT token as a session-bound row, for endpoints
+    that modify the user
     """
-    from passlib.context import CryptContext
-    
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    return pwd_context.hash(password)
+    user = db.query(User).filter(User.id == _access_token_user_id(token)).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
 
 # WebSocket-specific authentication
 async def get_current_user_ws(
     websocket: WebSocket,
     db: Session = Depends(get_db)
-) -> Optional[User]:
+) -> Optional[UserSnapshot]:
     """
     Get current user from WebSocket connection
     """
@@ -193,9 +208,7 @@ async def get_current_user_ws(
         except (ValueError, TypeError):
             return None
         
-        # Get user from database
-        user = db.query(User).filter(User.id == user_id).first()
-        return user
+        return get_user_snapshot(db, user_id)
         
     except Exception as e:
         print(f"WebSocket auth error: {e}")
@@ -0,0 +1,123 @@
+# app/core/storage.py
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from cloudinary import uploader
+from cloudinary.exceptions import GeneralError, RateLimited
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+from app.core.cloudinary import upload_file, upload_to_cloudinary, upload_voice_message
+from app.core.config import settings
+
+# Network errors, 5xx (surfaced as GeneralError) and rate limiting
+RETRYABLE_ERRORS = (GeneralError, RateLimited, Urllib3HTTPError, OSError)
+
+
+def _retryable(error: BaseException) -> bool:
+    # core.cloudinary re-raises SDK errors as plain Exceptions; look through the chain
+    while error is not None:
+        if isinstance(error, RETRYABLE_ERRORS):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _rewind(args: tuple, kwargs: dict) -> bool:
+    """Seek file arguments back to the start; False when one can no longer be read"""
+    for value in (*args, *kwargs.values()):
+        if hasattr(value, "read"):
+            if getattr(value, "closed", False) or not hasattr(value, "seek"):
+                return False
+            value.seek(0)
+    return True
+
+
+class StorageClient:
+    """
+    Async front for the Cloudinary SDK. The SDK is blocking, so calls run
+    on a bounded thread pool instead of the event loop; its urllib3 pool is
+    shared by those threads, which keeps connections alive between calls.
+    Transient failures are retried with exponential backoff and every
+    operation records call counts and latency.
+
+    CLOUDINARY_UPLOAD_PREFIX points the SDK at another API host, e.g. a
+    local fake storage server.
+    """
+
+    def __init__(self, max_workers: int, retries: int, backoff: float) -> None:
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage")
+        self.in_flight = 0
+        self.ops: Dict[str, dict] = {}
+
+    async def call(self, op: str, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        metrics = self.ops.setdefault(op, {"calls": 0, "errors": 0, "retries": 0, "total": 0.0, "max": 0.0})
+        started_at = time.perf_counter()
+        self.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                try:
+                    return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+                except Exception as e:
+                    if attempt >= self.retries or not _retryable(e) or not _rewind(args, kwargs):
+                        metrics["errors"] += 1
+                        raise
+                    attempt += 1
+                    metrics["retries"] += 1
+                    print(f"[Storage] {op} failed ({e}), retry {attempt}/{self.retries}")
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - started_at
+            metrics["calls"] += 1
+            metrics["total"] += elapsed
+            metrics["max"] = max(metrics["max"], elapsed)
+
+    async def upload(self, file, **options) -> dict:
+        """Raw SDK upload (core.cloudinary.upload_file)"""
+        return await self.call("upload", upload_file, file, **options)
+
+    async def upload_media(self, file, **kwargs) -> dict:
+        """core.cloudinary.upload_to_cloudinary: base folder and default transformations"""
+        return await self.call("upload_media", upload_to_cloudinary, file, **kwargs)
+
+    async def upload_voice(self, file, **kwargs) -> dict:
+        return await self.call("upload_voice", upload_voice_message, file, **kwargs)
+
+    async def destroy(self, public_id: str, resource_type: str = "image") -> dict:
+        return await self.call("destroy", uploader.destroy, public_id, resource_type=resource_type)
+
+    async def delete(self, public_id: str, resource_type: str = "image") -> bool:
+        """Like core.cloudinary.delete_from_cloudinary: False instead of raising"""
+        try:
+            result = await self.destroy(public_id, resource_type=resource_type)
+            return result.get("result") == "ok"
+        except Exception as e:
+            print(f"Failed to delete from Cloudinary: {str(e)}")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "ops": {
+                op: {
+                    "calls": m["calls"],
+                    "errors": m["errors"],
+                    "retries": m["retries"],
+                    "avg_ms": round(m["total"] / (m["calls"] or 1) * 1000, 2),
+                    "max_ms": round(m["max"] * 1000, 2),
+                }
+                for op, m in self.ops.items()
+            },
+        }
+
+
+storage = StorageClient(settings.STORAGE_MAX_CONCURRENCY, settings.STORAGE_RETRIES, settings.STORAGE_RETRY_BACKOFF)
@@ -4,19 +4,26 @@ from app.models.private_message import MessageType, PrivateMessage
 from app.models.group_message import GroupMessage
 from app.models.group_message_reply import GroupMessageReply
 from app.models.group_member import GroupMember
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 from datetime import datetime, timezone
 from fastapi import HTTPException,status
 from app.models.user_message_status import UserMessageStatus
-from sqlalchemy.orm import joinedload
+from sqlalchemy import DateTime, exists, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
 from app.schemas.chat import MessageCreate
 
 from app.models.user_message_status import UserMessageStatus
 from app.models.message_seen_status import MessageSeenStatus
-from app.utils.chat_helpers import validate_reply_message
+from app.models.group_message_seen import GroupMessageSeen
+from app.utils.chat_helpers import validate_reply_message, validate_reply_message_async
 from app.models.user import User
+from app.services.presence import presence_buffer
+from app.crud.conversation import (add_group_message, add_private_message, add_private_message_async,
+                                   get_conversations, is_seeded, refresh_private_unread, seed_conversations)
 
 
 def create_private_message(
@@ -65,7 +72,7 @@ def create_private_message(
             is_read=False,
             forwarded_from_id=forwarded_from_id
         )
-        db.add(msg)
+        add_private_message(db, msg)
         db.commit()
         db.refresh(msg)
         
@@ -88,6 +95,73 @@ def create_private_message(
         )
 
 
+async def create_private_message_async(
+    db: AsyncSession,
+    sender_id: int,
+    receiver_id: int,
+    content: str,
+    message_type: str = "text",
+    reply_to_id: Optional[int] = None,
+    is_forwarded: bool = False,
+    original_sender: Optional[str] = None,
+    original_sender_avatar: Optional[str] = None,
+    voice_duration: Optional[float] = None,
+    file_size: Optional[int] = None,
+    forwarded_from_id=None
+) -> PrivateMessage:
+    """
+    Async variant of create_private_message. The returned message has every
+    relationship the WebSocket payload reads already loaded, since lazy
+    loads are not available on an AsyncSession.
+    """
+    try:
+        if reply_to_id:
+            await validate_reply_message_async(db, reply_to_id, sender_id, receiver_id)
+
+        try:
+            msg_type_enum = MessageType(message_type)
+        except ValueError:
+            msg_type_enum = MessageType.text
+
+        msg = PrivateMessage(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            content=content,
+            message_type=msg_type_enum,
+            reply_to_id=reply_to_id,
+            is_forwarded=is_forwarded,
+            original_sender=original_sender,
+            original_sender_avatar=original_sender_avatar,
+            voice_duration=voice_duration if msg_type_enum == MessageType.voice else None,
+            file_size=file_size if msg_type_enum in [MessageType.voice, MessageType.file] else None,
+            created_at=datetime.now(timezone.utc),
+            delivered_at=datetime.now(timezone.utc),
+            is_read=False,
+            forwarded_from_id=forwarded_from_id
+        )
+        await add_private_message_async(db, msg)
+        await db.commit()
+
+        result = await db.execute(
+            select(PrivateMessage).options(
+                joinedload(PrivateMessage.sender),
+                joinedload(PrivateMessage.receiver),
+                selectinload(PrivateMessage.seen_statuses).joinedload(MessageSeenStatus.user),
+                joinedload(PrivateMessage.reply_to).joinedload(PrivateMessage.sender),
+                joinedload(PrivateMessage.reply_to).selectinload(PrivateMessage.seen_statuses).joinedload(MessageSeenStatus.user)
+            ).filter(PrivateMessage.id == msg.id)
+        )
+        return result.unique().scalars().first()
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create message: {str(e)}"
+        )
+
+
 def get_private_messages(db: Session, user_id: int, friend_id: int, limit: int = 50, offset: int = 0) -> List[PrivateMessage]:
     """Get private messages between two users"""
     return db.query(PrivateMessage).options(
@@ -99,6 +173,62 @@ def get_private_messages(db: Session, user_id: int, friend_id: int, limit: int =
         ((PrivateMessage.sender_id == friend_id) & (PrivateMessage.receiver_id == user_id))
     ).order_by(PrivateMessage.created_at.desc()).offset(offset).limit(limit).all()
 
+def get_private_messages_page(
+    db: Session,
+    user_id: int,
+    friend_id: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: int = 50
+) -> Tuple[List[PrivateMessage], bool]:
+    """
+    Keyset page of a private conversation, oldest first.
+
+    Without a cursor the newest `limit` messages are returned; `before_id`
+    walks towards older messages and `after_id` towards newer ones. The
+    second value tells whether more messages exist past the page in the
+    direction being walked.
+    """
+    conversation = (
+        ((PrivateMessage.sender_id == user_id) & (PrivateMessage.receiver_id == friend_id)) |
+        ((PrivateMessage.sender_id == friend_id) & (PrivateMessage.receiver_id == user_id))
+    )
+    key = tuple_(PrivateMessage.created_at, PrivateMessage.id)
+
+    query = db.query(PrivateMessage).options(
+        joinedload(PrivateMessage.sender),
+        joinedload(PrivateMessage.receiver),
+        joinedload(PrivateMessage.reply_to).joinedload(PrivateMessage.sender),
+        joinedload(PrivateMessage.reply_to).joinedload(PrivateMessage.receiver),
+        selectinload(PrivateMessage.seen_statuses).joinedload(MessageSeenStatus.user),
+    ).filter(conversation)
+
+    cursor_id = before_id or after_id
+    if cursor_id:
+        cursor = db.query(PrivateMessage.created_at, PrivateMessage.id).filter(
+            PrivateMessage.id == cursor_id,
+            conversation
+        ).first()
+        if not cursor:
+            return [], False
+        cursor_key = tuple_(cursor.created_at, cursor.id)
+
+    if after_id:
+        rows = query.filter(key > cursor_key).order_by(
+            PrivateMessage.created_at.asc(), PrivateMessage.id.asc()
+        ).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    if before_id:
+        query = query.filter(key < cursor_key)
+    rows = query.order_by(
+        PrivateMessage.created_at.desc(), PrivateMessage.id.desc()
+    ).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, has_more
+
 def mark_message_as_read(db: Session, message_id: int, user_id: int) -> bool:
     # Check if already exists
     existing = db.query(MessageSeenStatus).filter_by(message_id=message_id, user_id=user_id).first()
@@ -147,7 +277,7 @@ def create_group_message(
         created_at=datetime.utcnow()
     )
     try:
-        db.add(msg)
+        add_group_message(db, msg)
         db.commit()
         db.refresh(msg)
         
@@ -171,6 +301,23 @@ def get_group_messages(db: Session, group_id: int, limit=50, offset=0):
         .all()
     )
         
+async def get_group_messages_async(db: AsyncSession, group_id: int, limit=50, offset=0):
+    result = await db.execute(
+        select(GroupMessage)
+        .filter(GroupMessage.group_id == group_id)
+        .options(
+            joinedload(GroupMessage.sender),
+            joinedload(GroupMessage.forwarded_by),
+            selectinload(GroupMessage.seen_by).joinedload(GroupMessageSeen.user),
+            selectinload(GroupMessage.replies).joinedload(GroupMessageReply.sender),
+            joinedload(GroupMessage.parent_message).joinedload(GroupMessage.sender)
+        )
+        .order_by(GroupMessage.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    return result.unique().scalars().all()
+        
 def edit_private_message(db: Session, message_id: int, user_id: int, new_content: str) -> PrivateMessage:
     """Edit a private message"""
     try:
@@ -255,6 +402,72 @@ def delete_message_forever(db: Session, message_id: int, user_id: int) -> dict:
 
     return {"message_id": message_id, "receiver_id": receiver_id}
 
+
+def mark_private_messages_read(
+    db: Session,
+    reader_id: int,
+    sender_id: Optional[int] = None,
+    message_ids: Optional[Iterable[int]] = None
+) -> List[dict]:
+    """
+    Bulk read receipts: one UPDATE ... RETURNING for is_read/read_at, one
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING for the seen rows, and one
+    unread recount per sender, however many messages are unread.
+
+    Returns one {"sender_id", "up_to_id", "count", "read_at"} entry per
+    sender whose messages were newly read. The caller commits.
+    """
+    read_at = datetime.now(timezone.utc)
+    conditions = [
+        PrivateMessage.receiver_id == reader_id,
+        PrivateMessage.is_read == False
+    ]
+    if sender_id is not None:
+        conditions.append(PrivateMessage.sender_id == sender_id)
+    if message_ids is not None:
+        conditions.append(PrivateMessage.id.in_(list(message_ids)))
+
+    rows = db.execute(
+        update(PrivateMessage)
+        .where(*conditions)
+        .values(is_read=True, read_at=read_at)
+        .returning(PrivateMessage.id, PrivateMessage.sender_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not rows:
+        return []
+
+    read_ids = [row.id for row in rows]
+    db.execute(
+        pg_insert(MessageSeenStatus).from_select(
+            ["message_id", "user_id", "seen_at"],
+            select(
+                PrivateMessage.id,
+                literal(reader_id),
+                literal(read_at, DateTime(timezone=True))
+            ).where(
+                PrivateMessage.id.in_(read_ids),
+                ~exists().where(
+                    MessageSeenStatus.message_id == PrivateMessage.id,
+                    MessageSeenStatus.user_id == reader_id
+                )
+            )
+        ).on_conflict_do_nothing()
+    )
+
+    by_sender = {}
+    for row in rows:
+        up_to_id, count = by_sender.get(row.sender_id, (0, 0))
+        by_sender[row.sender_id] = (max(up_to_id, row.id), count + 1)
+
+    for peer_id in by_sender:
+        refresh_private_unread(db, reader_id, peer_id)
+
+    return [
+        {"sender_id": peer_id, "up_to_id": up_to_id, "count": count, "read_at": read_at}
+        for peer_id, (up_to_id, count) in by_sender.items()
+    ]
+
 def mark_message_as_read(db: Session, message_id: int, user_id: int) -> Optional[PrivateMessage]:
     try:
         message = db.query(PrivateMessage).filter(
@@ -283,6 +496,8 @@ def mark_message_as_read(db: Session, message_id: int, user_id: int) -> Optional
         if not message.is_read:
             message.is_read = True
             message.read_at = current_time
+            db.flush()
+            refresh_private_unread(db, user_id, message.sender_id)
 
         db.commit()
         db.refresh(message)
@@ -294,27 +509,22 @@ def mark_message_as_read(db: Session, message_id: int, user_id: int) -> Optional
         return None
 
 
+def _presence_status(user: User) -> dict:
+    """Status from the users row with presence writes that are not flushed yet applied"""
+    return presence_buffer.overlay(user.id, {
+        "user_id": user.id,
+        "username": user.username,
+        "is_online": user.is_online,
+        "last_seen": user.last_seen,
+        "last_activity": user.last_activity,
+        "avatar_url": user.avatar_url
+    })
 
-def update_user_online_status(db: Session, user_id: int, is_online: bool) -> bool:
-    """Update user's online status"""
-    try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return False
-            
-        user.is_online = is_online
-        user.last_activity = datetime.now(timezone.utc)
-        
-        if not is_online:
-            user.last_seen = datetime.now(timezone.utc)
-            
-        db.commit()
-        return True
-        
-    except Exception as e:
-        db.rollback()
-        print(f"Error updating user online status: {e}")
-        return False
+def _presence_status_iso(user: User) -> dict:
+    status = _presence_status(user)
+    for key in ("last_seen", "last_activity"):
+        status[key] = status[key].isoformat() if status[key] else None
+    return status
 
 def get_user_online_status(db: Session, user_id: int) -> dict:
     """Get user's online status and last activity"""
@@ -322,14 +532,7 @@ def get_user_online_status(db: Session, user_id: int) -> dict:
     if not user:
         return None
         
-    return {
-        "user_id": user.id,
-        "username": user.username,
-        "is_online": user.is_online,
-        "last_seen": user.last_seen,
-        "last_activity": user.last_activity,
-        "avatar_url": user.avatar_url
-    }
+    return _presence_status(user)
 
 def get_friends_online_status(db: Session, user_id: int) -> List[dict]:
     """Get online status of all friends"""
@@ -337,33 +540,21 @@ def get_friends_online_status(db: Session, user_id: int) -> List[dict]:
     
     friends = get_user_friends(db, user_id)
     
-    status_list = []
-    for friend in friends:
-        status_list.append({
-            "user_id": friend.id,
-            "username": friend.username,
-            "avatar_url": friend.avatar_url,
-            "is_online": friend.is_online,
-            "last_seen": friend.last_seen.isoformat() if friend.last_seen else None,
-            "last_activity": friend.last_activity.isoformat() if friend.last_activity else None
-        })
-    
-    return status_list
+    return [_presence_status_iso(friend) for friend in friends]
 
 def get_multiple_users_online_status(db: Session, user_ids: List[int]) -> List[dict]:
     """Get online status for multiple users"""
     users = db.query(User).filter(User.id.in_(user_ids)).all()
     
-    status_list = []
-    for user in users:
-        status_list.append({
-            "user_id": user.id,
-            "username": user.username,
-            "avatar_url": user.avatar_url,
-            "is_online": user.is_online,
-            "last_seen": user.last_seen.isoformat() if user.last_seen else None,
-            "last_activity": user.last_activity.isoformat() if user.last_activity else None
-        })
-    
-    return status_list
+    return [_presence_status_iso(user) for user in users]
 
+
+def get_chat_list(db: Session, user_id: int, limit: int = 100, offset: int = 0) -> List[dict]:
+    """
+    Chat list page from the materialized conversations table. Each user is
+    seeded once from the message tables; send paths may have created some
+    rows before that, so the seed marker is checked rather than any row.
+    """
+    if offset == 0 and not is_seeded(db, user_id):
+        seed_conversations(db, user_id)
+    return get_conversations(db, user_id, limit=limit, offset=offset)
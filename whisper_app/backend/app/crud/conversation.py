@@ -0,0 +1,385 @@
+# app/crud/conversation.py
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import DateTime, String, and_, case, cast, exists, func, literal, or_, select, true, update, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.conversation import Conversation, ConversationSeed
+from app.models.friend import Friend, FriendshipStatus
+from app.models.group import Group
+from app.models.group_image import GroupImage
+from app.models.group_member import GroupMember
+from app.models.group_message import GroupMessage
+from app.models.group_message_seen import GroupMessageSeen
+from app.models.group_read_watermark import GroupReadWatermark
+from app.models.private_message import PrivateMessage
+from app.models.user import User
+
+PREVIEW_LENGTH = 255
+
+PREVIEW_LABELS = {
+    "voice": "🎤 Voice message",
+    "image": "🖼️ Photo",
+    "file": "📎 File",
+}
+
+
+def message_preview(content: Optional[str], message_type=None) -> Optional[str]:
+    kind = getattr(message_type, "value", message_type)
+    if kind in PREVIEW_LABELS:
+        return PREVIEW_LABELS[kind]
+    if content is None:
+        return None
+    return content[:PREVIEW_LENGTH]
+
+
+def _upsert(stmt):
+    """
+    Apply a new message to existing rows. unread_count always accumulates;
+    the last-message fields only move forward, so two sends committing out
+    of order cannot leave an older preview on top.
+    """
+    newer = stmt.excluded.last_message_id > func.coalesce(Conversation.last_message_id, 0)
+    return stmt.on_conflict_do_update(
+        constraint="uq_conversation_user_peer",
+        set_={
+            "last_message_id": case((newer, stmt.excluded.last_message_id), else_=Conversation.last_message_id),
+            "last_sender_id": case((newer, stmt.excluded.last_sender_id), else_=Conversation.last_sender_id),
+            "last_message_preview": case((newer, stmt.excluded.last_message_preview), else_=Conversation.last_message_preview),
+            "updated_at": func.greatest(Conversation.updated_at, stmt.excluded.updated_at),
+            "unread_count": Conversation.unread_count + stmt.excluded.unread_count,
+        }
+    )
+
+
+def private_message_statements(msg: PrivateMessage) -> list:
+    preview = message_preview(msg.content, msg.message_type)
+    created_at = msg.created_at or datetime.now(timezone.utc)
+    rows = [
+        (msg.sender_id, msg.receiver_id, 0),
+        (msg.receiver_id, msg.sender_id, 1),
+    ]
+    return [
+        _upsert(pg_insert(Conversation).values(
+            user_id=user_id,
+            kind="private",
+            peer_id=peer_id,
+            last_message_id=msg.id,
+            last_sender_id=msg.sender_id,
+            last_message_preview=preview,
+            unread_count=unread,
+            updated_at=created_at
+        ))
+        for user_id, peer_id, unread in rows
+    ]
+
+
+def group_message_statement(msg: GroupMessage):
+    """One INSERT ... SELECT over the group's members."""
+    created_at = msg.created_at or datetime.now(timezone.utc)
+    members = select(
+        GroupMember.user_id,
+        literal("group"),
+        literal(msg.group_id),
+        literal(msg.id),
+        literal(msg.sender_id),
+        literal(message_preview(msg.content, msg.message_type)),
+        case((GroupMember.user_id == msg.sender_id, 0), else_=1),
+        literal(created_at, DateTime(timezone=True)),
+    ).where(GroupMember.group_id == msg.group_id)
+
+    return _upsert(pg_insert(Conversation).from_select(
+        ["user_id", "kind", "peer_id", "last_message_id", "last_sender_id",
+         "last_message_preview", "unread_count", "updated_at"],
+        members
+    ))
+
+
+def private_unread_statement(user_id: int, peer_id: int):
+    """Recount what `user_id` has not read from `peer_id` (served by the pair index)."""
+    unread = select(func.count(PrivateMessage.id)).where(
+        PrivateMessage.sender_id == peer_id,
+        PrivateMessage.receiver_id == user_id,
+        PrivateMessage.is_read == False
+    ).scalar_subquery()
+    return update(Conversation).where(
+        Conversation.user_id == user_id,
+        Conversation.kind == "private",
+        Conversation.peer_id == peer_id
+    ).values(unread_count=unread)
+
+
+def _group_watermark(user_id: int, group_id):
+    return select(GroupReadWatermark.last_read_message_id).where(
+        GroupReadWatermark.group_id == group_id,
+        GroupReadWatermark.user_id == user_id
+    ).correlate_except(GroupReadWatermark).scalar_subquery()
+
+
+def group_seen_statement(user_id: int, group_id: int):
+    """Recount what `user_id` has not read in the group past their watermark."""
+    unread = select(func.count(GroupMessage.id)).where(
+        GroupMessage.group_id == group_id,
+        GroupMessage.sender_id != user_id,
+        GroupMessage.id > func.coalesce(_group_watermark(user_id, group_id), 0)
+    ).scalar_subquery()
+    return update(Conversation).where(
+        Conversation.user_id == user_id,
+        Conversation.kind == "group",
+        Conversation.peer_id == group_id
+    ).values(unread_count=unread)
+
+
+def record_private_message(db: Session, msg: PrivateMessage) -> None:
+    """Must run in the transaction that inserts `msg` (after a flush)."""
+    for stmt in private_message_statements(msg):
+        db.execute(stmt)
+
+
+async def record_private_message_async(db: AsyncSession, msg: PrivateMessage) -> None:
+    for stmt in private_message_statements(msg):
+        await db.execute(stmt)
+
+
+def record_group_message(db: Session, msg: GroupMessage) -> None:
+    db.execute(group_message_statement(msg))
+
+
+def add_private_message(db: Session, msg: PrivateMessage) -> None:
+    """
+    Insert a new private message together with its conversation rows.
+    Every writer of private_messages goes through this (or the async
+    variant), so the chat list never misses one; the caller commits.
+    """
+    db.add(msg)
+    db.flush()
+    record_private_message(db, msg)
+
+
+async def add_private_message_async(db: AsyncSession, msg: PrivateMessage) -> None:
+    db.add(msg)
+    await db.flush()
+    await record_private_message_async(db, msg)
+
+
+def add_group_message(db: Session, msg: GroupMessage) -> None:
+    """Group counterpart of add_private_message"""
+    db.add(msg)
+    db.flush()
+    record_group_message(db, msg)
+
+
+def refresh_private_unread(db: Session, user_id: int, peer_id: int) -> None:
+    db.execute(private_unread_statement(user_id, peer_id))
+
+
+def record_group_seen(db: Session, user_id: int, group_id: int) -> None:
+    db.execute(group_seen_statement(user_id, group_id))
+
+
+async def record_group_seen_async(db: AsyncSession, user_id: int, group_id: int) -> None:
+    await db.execute(group_seen_statement(user_id, group_id))
+
+
+def open_conversation(db: Session, user_id: int, kind: str, peer_id: int) -> None:
+    """Make a chat with no messages yet (new friend, new group) show up in the list."""
+    db.execute(pg_insert(Conversation).values(
+        user_id=user_id,
+        kind=kind,
+        peer_id=peer_id,
+        unread_count=0,
+        updated_at=datetime.now(timezone.utc)
+    ).on_conflict_do_nothing(constraint="uq_conversation_user_peer"))
+
+
+def chat_summaries(user_id: int):
+    """
+    Conversations of a user computed from the message tables: a LATERAL
+    last-message subquery and an unread count per private and group chat,
+    combined with UNION ALL. Used to seed the conversations table.
+    """
+    friend_ids = select(
+        case((Friend.user_id == user_id, Friend.friend_id), else_=Friend.user_id).label("friend_id")
+    ).where(
+        Friend.status == FriendshipStatus.accepted,
+        or_(Friend.user_id == user_id, Friend.friend_id == user_id)
+    ).subquery("friend_ids")
+
+    last_private = (
+        select(PrivateMessage.id, PrivateMessage.sender_id, PrivateMessage.content,
+               PrivateMessage.message_type, PrivateMessage.created_at)
+        .where(or_(
+            and_(PrivateMessage.sender_id == user_id, PrivateMessage.receiver_id == friend_ids.c.friend_id),
+            and_(PrivateMessage.sender_id == friend_ids.c.friend_id, PrivateMessage.receiver_id == user_id)
+        ))
+        .order_by(PrivateMessage.created_at.desc())
+        .limit(1)
+        .lateral("last_private")
+    )
+    private_unread = (
+        select(func.count(PrivateMessage.id))
+        .where(
+            PrivateMessage.sender_id == friend_ids.c.friend_id,
+            PrivateMessage.receiver_id == user_id,
+            PrivateMessage.is_read == False
+        )
+        .scalar_subquery()
+    )
+    private_chats = (
+        select(
+            literal("private").label("kind"),
+            friend_ids.c.friend_id.label("peer_id"),
+            last_private.c.id.label("last_message_id"),
+            last_private.c.sender_id.label("last_sender_id"),
+            last_private.c.content.label("last_message"),
+            cast(last_private.c.message_type, String).label("message_type"),
+            private_unread.label("unread_count"),
+            func.coalesce(
+                last_private.c.created_at,
+                cast(User.created_at, DateTime(timezone=True))
+            ).label("updated_at"),
+        )
+        .select_from(friend_ids)
+        .join(User, User.id == friend_ids.c.friend_id)
+        .outerjoin(last_private, true())
+    )
+
+    last_group = (
+        select(GroupMessage.id, GroupMessage.sender_id, GroupMessage.content,
+               GroupMessage.message_type, GroupMessage.created_at)
+        .where(GroupMessage.group_id == Group.id)
+        .order_by(GroupMessage.created_at.desc())
+        .limit(1)
+        .lateral("last_group")
+    )
+    group_unread = (
+        select(func.count(GroupMessage.id))
+        .where(
+            GroupMessage.group_id == Group.id,
+            GroupMessage.sender_id != user_id,
+            GroupMessage.id > func.coalesce(_group_watermark(user_id, Group.id), 0),
+            ~exists().where(
+                GroupMessageSeen.message_id == GroupMessage.id,
+                GroupMessageSeen.user_id == user_id
+            )
+        )
+        .correlate(Group)
+        .scalar_subquery()
+    )
+    group_chats = (
+        select(
+            literal("group").label("kind"),
+            Group.id.label("peer_id"),
+            last_group.c.id.label("last_message_id"),
+            last_group.c.sender_id.label("last_sender_id"),
+            last_group.c.content.label("last_message"),
+            cast(last_group.c.message_type, String).label("message_type"),
+            group_unread.label("unread_count"),
+            func.coalesce(last_group.c.created_at, Group.created_at).label("updated_at"),
+        )
+        .select_from(Group)
+        .join(GroupMember, GroupMember.group_id == Group.id)
+        .outerjoin(last_group, true())
+        .where(GroupMember.user_id == user_id)
+    )
+
+    return union_all(private_chats, group_chats).subquery("chats")
+
+
+def is_seeded(db: Session, user_id: int) -> bool:
+    return db.get(ConversationSeed, user_id) is not None
+
+
+def seed_conversations(db: Session, user_id: int) -> int:
+    """
+    Build a user's conversation rows from the message tables, once. Rows
+    the send paths already created are overwritten: the message tables are
+    the complete record at this point, those rows only saw recent activity.
+    """
+    claimed = db.execute(
+        pg_insert(ConversationSeed).values(user_id=user_id)
+        .on_conflict_do_nothing()
+        .returning(ConversationSeed.user_id)
+    ).first()
+    if claimed is None:
+        return 0
+
+    rows = db.execute(select(chat_summaries(user_id))).mappings().all()
+    for row in rows:
+        stmt = pg_insert(Conversation).values(
+            user_id=user_id,
+            kind=row["kind"],
+            peer_id=row["peer_id"],
+            last_message_id=row["last_message_id"],
+            last_sender_id=row["last_sender_id"],
+            last_message_preview=message_preview(row["last_message"], row["message_type"]),
+            unread_count=row["unread_count"],
+            updated_at=row["updated_at"]
+        )
+        db.execute(stmt.on_conflict_do_update(
+            constraint="uq_conversation_user_peer",
+            set_={
+                "last_message_id": stmt.excluded.last_message_id,
+                "last_sender_id": stmt.excluded.last_sender_id,
+                "last_message_preview": stmt.excluded.last_message_preview,
+                "unread_count": stmt.excluded.unread_count,
+                "updated_at": func.greatest(Conversation.updated_at, stmt.excluded.updated_at),
+            }
+        ))
+    db.commit()
+    return len(rows)
+
+
+def get_conversations(db: Session, user_id: int, limit: int = 100, offset: int = 0) -> List[dict]:
+    """
+    One page of the chat list, read from the conversations table through
+    the (user_id, updated_at) index. Rows for chats the user has left are
+    filtered out here rather than deleted eagerly.
+    """
+    group_avatar = (
+        select(GroupImage.url)
+        .where(GroupImage.group_id == Group.id)
+        .order_by(GroupImage.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    is_friend = exists().where(
+        Friend.status == FriendshipStatus.accepted,
+        or_(
+            and_(Friend.user_id == user_id, Friend.friend_id == Conversation.peer_id),
+            and_(Friend.friend_id == user_id, Friend.user_id == Conversation.peer_id)
+        )
+    )
+    is_member = exists().where(
+        GroupMember.group_id == Conversation.peer_id,
+        GroupMember.user_id == user_id
+    )
+
+    query = (
+        select(
+            Conversation.peer_id.label("id"),
+            Conversation.kind.label("type"),
+            func.coalesce(User.username, Group.name).label("name"),
+            case((Conversation.kind == "private", User.avatar_url), else_=group_avatar).label("avatar"),
+            Conversation.last_message_preview.label("last_message"),
+            Conversation.unread_count.label("unread_count"),
+            Conversation.updated_at.label("updated_at"),
+        )
+        .select_from(Conversation)
+        .outerjoin(User, and_(Conversation.kind == "private", User.id == Conversation.peer_id))
+        .outerjoin(Group, and_(Conversation.kind == "group", Group.id == Conversation.peer_id))
+        .where(
+            Conversation.user_id == user_id,
+            or_(
+                and_(Conversation.kind == "private", is_friend),
+                and_(Conversation.kind == "group", is_member)
+            )
+        )
+        .order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    return [dict(row) for row in db.execute(query).mappings().all()]
@@ -1,6 +1,6 @@
 import traceback
 from sqlalchemy import select
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 from app.models.diary import Diary, ShareType
 from app.models.diary_favorite import DiaryFavorite
 from app.models.user import User
@@ -8,16 +8,21 @@ from app.models.activity import ActivityType
 from app.models.diary_comment import DiaryComment
 from app.models.diary_like import DiaryLike
 from app.models.diary_group import DiaryGroup
-from app.schemas.diary import DiaryCreate, DiaryUpdate, CreateDiaryForGroup, CommentUpdate, DiaryShare
-from typing import List, Optional
+from app.schemas.diary import (DiaryCreate, DiaryUpdate, CreateDiaryForGroup, CommentUpdate, DiaryShare,
+                               CommentResponse, CreatorResponse, DiaryLikeResponse, DiaryOut, GroupResponse)
+from typing import List, Optional, Tuple
 from app.models.friend import Friend, FriendshipStatus
 from app.models.group_member import GroupMember
-from sqlalchemy import or_, and_, select
+from sqlalchemy import or_, and_, exists, func, tuple_
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
 from app.models.group import Group
 from app.services.image_service_sync import image_service_sync
+from app.services.media_jobs import media_job_queue
+from app.crud.media_job import enqueue_video_jobs, processing_diary_ids
 from app.crud.activity import create_activity
+from app.crud.timeline import fan_out_diary, has_timeline, seed_timeline, timeline_filter
+from app.core.config import settings
 
 def create_diary(db: Session, user_id: int, diary_in: DiaryCreate) -> Diary:
     
@@ -27,69 +32,29 @@ def create_diary(db: Session, user_id: int, diary_in: DiaryCreate) -> Diary:
         share_type_value = "personal"
         print(f"Converting 'private' to 'personal' for ShareType enum")
     
-    # Handle images
-    image_urls = []
-    if diary_in.images:
-        print(f"📷 Uploading {len(diary_in.images)} images")
-        try:
-            image_urls = image_service_sync.save_multiple_images(diary_in.images, is_diary=True)
-            print(f"✅ {len(image_urls)} images uploaded successfully")
-        except Exception as e:
-            print(f"❌ Image upload failed: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Failed to upload images: {str(e)}"
-            )
-    
-    # Handle videos - PROCESS INDIVIDUALLY FOR THUMBNAIL GUARANTEE
-    video_urls = []
-    video_thumbnails = []
-    if diary_in.videos:
-        
-        try:
-            # Process each video individually
-            for idx, video_data in enumerate(diary_in.videos):
-                print(f"  Processing video {idx+1}/{len(diary_in.videos)}")
-                
-                try:
-                    # This method GUARANTEES a thumbnail for videos
-                    video_url, video_thumbnail = image_service_sync.save_single_media(video_data, is_diary=True)
-                    
-                    if video_url:
-                        video_urls.append(video_url)
-                        video_thumbnails.append(video_thumbnail)  # Could be None, but array position preserved
-                        print(f"  ✅ Video {idx+1} - URL: {video_url[:50]}...")
-                        print(f"  📸 Thumbnail: {'PRESENT' if video_thumbnail else 'NONE'}")
-                    else:
-                        print(f"  ⚠️ Video {idx+1} returned no URL")
-                        
-                except Exception as video_error:
-                    print(f"  ❌ Video {idx+1} error: {str(video_error)}")
-                    # Don't fail entire diary if one video fails
-                    continue
-            
-            # CRITICAL: Ensure arrays are the same length
-            if len(video_thumbnails) != len(video_urls):
-                print(f"⚠️ Array mismatch: videos={len(video_urls)}, thumbnails={len(video_thumbnails)}")
-                # Fix by adding None for missing thumbnails
-                while len(video_thumbnails) < len(video_urls):
-                    video_thumbnails.append(None)
-            
-            # Debug output
-            for i in range(len(video_urls)):
-                thumb_status = "✅" if video_thumbnails[i] else "❌"
-                print(f"  Video {i}: {thumb_status} {video_urls[i][:50]}...")
-                
-        except Exception as e:
-            # Clean up any uploaded images
-            if image_urls:
-                image_service_sync.cleanup_media(image_urls)
-            print(f"❌ Video upload failed: {str(e)}")
-            traceback.print_exc()
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Failed to upload videos: {str(e)}"
-            )
+    # Images and videos upload side by side; the diary waits for the slowest one
+    images = [item for item in diary_in.images or [] if item]
+    videos = [item for item in diary_in.videos or [] if item]
+    if images or videos:
+        print(f"📤 Uploading {len(images)} images and {len(videos)} videos")
+    try:
+        # With media workers running, videos are stored without waiting for transcoding
+        saved = image_service_sync.save_media_concurrently(
+            images + videos, is_diary=True, defer_video_derivatives=media_job_queue.enabled
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to upload media: {str(e)}"
+        )
+
+    image_urls = [url for url, _ in saved[:len(images)]]
+    # One thumbnail slot per video, None when there is none
+    video_urls = [url for url, _ in saved[len(images):]]
+    video_thumbnails = [thumbnail for _, thumbnail in saved[len(images):]]
     
     # Determine media type
     if image_urls and video_urls:
@@ -116,19 +81,33 @@ def create_diary(db: Session, user_id: int, diary_in: DiaryCreate) -> Diary:
         media_type=media_type
     )
     
-    db.add(diary)
-    db.flush()
-
-    # Handle group sharing - Check the original share_type from request
-    if diary_in.share_type.lower() == "group" and diary_in.group_ids:
-        diary_groups = [
-            DiaryGroup(diary_id=diary.id, group_id=group_id)
-            for group_id in diary_in.group_ids
-        ]
-        db.add_all(diary_groups)
-
-    db.commit()
+    try:
+        db.add(diary)
+        db.flush()
+
+        # Handle group sharing - Check the original share_type from request
+        if diary_in.share_type.lower() == "group" and diary_in.group_ids:
+            diary_groups = [
+                DiaryGroup(diary_id=diary.id, group_id=group_id)
+                for group_id in diary_in.group_ids
+            ]
+            db.add_all(diary_groups)
+
+        jobs = enqueue_video_jobs(db, diary)
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Don't leave uploads behind for a diary that was never saved
+        image_service_sync.cleanup_media([
+            url for url, item in zip(image_urls + video_urls, images + videos)
+            if not item.startswith(('http://', 'https://'))
+        ])
+        raise
     db.refresh(diary)
+    if jobs:
+        media_job_queue.wake()
+
+    fan_out_diary(db, diary)
     
     return diary
 
@@ -168,88 +147,95 @@ def create_diary_for_group(db: Session, group_id: int, diary_data: CreateDiaryFo
 
     db.commit()
     db.refresh(new_diary)
+
+    fan_out_diary(db, new_diary)
     return new_diary
 
 def get_by_id(db: Session, diary_id: int) -> Optional[Diary]:
     return db.query(Diary).filter(Diary.id == diary_id, Diary.is_deleted == False).first()
 
-def get_visible(db: Session, user_id: int) -> List[Diary]:
-    # Get IDs of friends (people I added as friends)
-    my_friends = (
-        db.query(Friend.friend_id)
-        .filter(
-            Friend.user_id == user_id,
-            Friend.status == FriendshipStatus.accepted
-        )
-        .subquery()
-    )
-    
-    # Get IDs of people who added me as friend
-    friends_of_me = (
-        db.query(Friend.user_id)
-        .filter(
-            Friend.friend_id == user_id,
-            Friend.status == FriendshipStatus.accepted
-        )
-        .subquery()
-    )
-    
-    all_friends_union = (
-        db.query(Friend.friend_id.label('friend_id'))
-        .filter(Friend.user_id == user_id, Friend.status == FriendshipStatus.accepted)
-        .union(
-            db.query(Friend.user_id.label('friend_id'))
-            .filter(Friend.friend_id == user_id, Friend.status == FriendshipStatus.accepted)
+def visible_diary_filter(user_id: int):
+    """
+    SQL predicate for "diaries user_id may see": own, public, friends-only
+    from a friend in either direction, or shared to one of their groups.
+    Meant to be composed into a paginated query rather than materialized.
+    """
+    is_friend = exists().where(
+        Friend.status == FriendshipStatus.accepted,
+        or_(
+            and_(Friend.user_id == user_id, Friend.friend_id == Diary.user_id),
+            and_(Friend.friend_id == user_id, Friend.user_id == Diary.user_id)
         )
-        .subquery()
     )
-    
-    user_groups = (
-        db.query(GroupMember.group_id)
-        .filter(GroupMember.user_id == user_id)
-        .subquery()
+    in_my_group = exists().where(
+        DiaryGroup.diary_id == Diary.id,
+        DiaryGroup.group_id == GroupMember.group_id,
+        GroupMember.user_id == user_id
     )
 
-    group_diaries = (
-        db.query(DiaryGroup.diary_id)
-        .filter(DiaryGroup.group_id.in_(select(user_groups.c.group_id)))
-        .subquery()
+    return and_(
+        Diary.is_deleted.is_(False),
+        or_(
+            Diary.user_id == user_id,
+            Diary.share_type == ShareType.public,
+            and_(Diary.share_type == ShareType.friends, is_friend),
+            and_(Diary.share_type == ShareType.group, in_my_group)
+        )
     )
 
-    diaries = (
+def get_visible(db: Session, user_id: int) -> List[Diary]:
+    return (
         db.query(Diary)
-        .filter(
-            Diary.is_deleted.is_(False),
-            or_(
-                Diary.share_type == ShareType.public,
-                
-                and_(
-                    Diary.share_type == ShareType.friends,
-                    or_(
-                        and_(
-                            Diary.user_id.in_(select(my_friends.c.friend_id)),
-                            Diary.user_id != user_id
-                        ),
-                        and_(
-                            Diary.user_id.in_(select(friends_of_me.c.user_id)),
-                            Diary.user_id != user_id
-                        )
-                    )
-                ),
-                
-                and_(
-                    Diary.share_type == ShareType.group,
-                    Diary.id.in_(select(group_diaries.c.diary_id))
-                ),
-                
-                Diary.user_id == user_id
-            )
-        )
-        .order_by(Diary.created_at.desc())
+        .filter(visible_diary_filter(user_id))
+        .order_by(Diary.created_at.desc(), Diary.id.desc())
         .all()
     )
 
-    return diaries
+def get_visible_page(
+    db: Session,
+    user_id: int,
+    limit: int = 25,
+    before_id: Optional[int] = None,
+    offset: int = 0,
+    options: Optional[list] = None
+) -> List[Diary]:
+    """
+    One feed page, newest first, keyset-paginated on (created_at, id).
+    `before_id` is the last diary of the previous page; `offset` is only
+    honoured without a cursor, for older clients.
+
+    With the home timeline enabled the page is sliced from the reader's
+    precomputed timeline (visibility is still rechecked, so deletes and
+    unfriends apply immediately). Past the end of the capped timeline it
+    falls back to the fan-out-on-read query.
+    """
+    if settings.DIARY_TIMELINE_ENABLED and not (offset and not before_id):
+        if not has_timeline(db, user_id):
+            seed_timeline(db, user_id, visible_diary_filter(user_id))
+        page = _visible_page(db, user_id, limit, before_id, 0, options, timeline=True)
+        if len(page) == limit:
+            return page
+
+    return _visible_page(db, user_id, limit, before_id, offset, options)
+
+def _visible_page(db, user_id, limit, before_id, offset, options, timeline=False) -> List[Diary]:
+    query = db.query(Diary).filter(visible_diary_filter(user_id))
+    if timeline:
+        query = query.filter(timeline_filter(db, user_id))
+    if options:
+        query = query.options(*options)
+
+    if before_id:
+        cursor = db.query(Diary.created_at, Diary.id).filter(Diary.id == before_id).first()
+        if not cursor:
+            return []
+        query = query.filter(
+            tuple_(Diary.created_at, Diary.id) < tuple_(cursor.created_at, cursor.id)
+        )
+    elif offset:
+        query = query.offset(offset)
+
+    return query.order_by(Diary.created_at.desc(), Diary.id.desc()).limit(limit).all()
 
 def can_view(db: Session, diary: Diary, user_id: int) -> bool:
     if diary.is_deleted:
@@ -479,6 +465,8 @@ def share_diary(db: Session, diary_id: int, diary_data: DiaryShare, current_user
     
     db.commit()
     db.refresh(diary)
+
+    fan_out_diary(db, diary, group_ids=shared_groups)
     return diary
 
 def delete_share(db: Session, share_id: int, current_user_id: int):
@@ -578,26 +566,87 @@ def create_like(db: Session, diary_id: int, current_user: User) -> None:
     
     db.commit()
 
-def get_diary_comments(db: Session, diary_id: int) -> List[DiaryComment]:
+def _reply_count():
+    replies = aliased(DiaryComment)
+    return (
+        select(func.count(replies.id))
+        .where(replies.parent_id == DiaryComment.id)
+        .correlate(DiaryComment)
+        .scalar_subquery()
+        .label("reply_count")
+    )
+
+def get_diary_comments(
+    db: Session,
+    diary_id: int,
+    parent_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: int = 20
+) -> Tuple[List[Tuple[DiaryComment, int]], bool]:
     """
-    Get all comments for a diary with proper relationships loaded
+    One page of a comment level, oldest first: root comments, or the direct
+    replies of `parent_id`. Each row comes with its own reply count, so the
+    client can offer "load more replies" without fetching the thread.
+    Returns ([(comment, reply_count)], has_more).
     """
     diary = db.query(Diary).filter(Diary.id == diary_id, Diary.is_deleted == False).first()
     if not diary:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                           detail="Diary not found")
-    
-    return (
-        db.query(DiaryComment)
+
+    query = (
+        db.query(DiaryComment, _reply_count())
         .options(
             joinedload(DiaryComment.user),
             joinedload(DiaryComment.reply_to_user)
         )
-        .filter(DiaryComment.diary_id == diary_id)
-        .order_by(DiaryComment.created_at.asc())
+        .filter(
+            DiaryComment.diary_id == diary_id,
+            DiaryComment.parent_id == parent_id if parent_id else DiaryComment.parent_id.is_(None)
+        )
+    )
+
+    if after_id:
+        cursor = db.query(DiaryComment.created_at, DiaryComment.id).filter(DiaryComment.id == after_id).first()
+        if not cursor:
+            return [], False
+        query = query.filter(
+            tuple_(DiaryComment.created_at, DiaryComment.id) > tuple_(cursor.created_at, cursor.id)
+        )
+
+    rows = query.order_by(DiaryComment.created_at.asc(), DiaryComment.id.asc()).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+def get_first_replies(db: Session, parent_ids: List[int], per_thread: int = 3) -> dict:
+    """The oldest `per_thread` direct replies of each parent, via one window query."""
+    if not parent_ids or per_thread <= 0:
+        return {}
+
+    ranked = select(
+        DiaryComment.id,
+        func.row_number().over(
+            partition_by=DiaryComment.parent_id,
+            order_by=(DiaryComment.created_at.asc(), DiaryComment.id.asc())
+        ).label("rank")
+    ).where(DiaryComment.parent_id.in_(parent_ids)).subquery()
+
+    rows = (
+        db.query(DiaryComment, _reply_count())
+        .options(
+            joinedload(DiaryComment.user),
+            joinedload(DiaryComment.reply_to_user)
+        )
+        .join(ranked, ranked.c.id == DiaryComment.id)
+        .filter(ranked.c.rank <= per_thread)
+        .order_by(DiaryComment.created_at.asc(), DiaryComment.id.asc())
         .all()
     )
 
+    replies = {}
+    for comment, reply_count in rows:
+        replies.setdefault(comment.parent_id, []).append((comment, reply_count))
+    return replies
+
 def get_diary_likes_count(db: Session, diary_id: int) -> int:
     diary = db.query(Diary).filter(Diary.id == diary_id, Diary.is_deleted == False).first()
     if not diary:
@@ -744,10 +793,7 @@ def get_list_favorite_diaries(db: Session, user_id: int) -> List[Diary]:
         .join(DiaryFavorite)
         .options(
             joinedload(Diary.author),
-            joinedload(Diary.groups),
-            joinedload(Diary.likes).joinedload(DiaryLike.user),
-            joinedload(Diary.comments).joinedload(DiaryComment.user),
-            joinedload(Diary.favorited_by)
+            selectinload(Diary.groups)
         )
         .filter(DiaryFavorite.user_id == user_id)
         .order_by(DiaryFavorite.created_at.desc())
@@ -755,53 +801,122 @@ def get_list_favorite_diaries(db: Session, user_id: int) -> List[Diary]:
     )
     
     return favorites
-def get_visible_users_for_diary(db: Session, diary_id: int) -> List[int]:
+
+
+FEED_COMMENT_PREVIEW = 3
+
+def get_feed_card_stats(db: Session, diary_ids: List[int], user_id: int) -> dict:
     """
-    Get all user IDs who can view a specific diary
+    Like/comment counts and the viewer's own like/favorite for a page of
+    diaries, in one query of correlated aggregates.
     """
-    from sqlalchemy import or_, and_
-    from app.models.friend import Friend, FriendshipStatus
-    from app.models.group_member import GroupMember
-    
-    diary = db.query(Diary).filter(Diary.id == diary_id).first()
-    if not diary:
-        return []
-    
-    # Start with diary owner
-    visible_users = {diary.user_id}
-    
-    if diary.share_type == ShareType.public:
-        # For public diaries, all users
-        all_users = db.query(User.id).all()
-        visible_users.update([user.id for user in all_users])
-    
-    elif diary.share_type == ShareType.friends:
-        # Get mutual friends
-        # Friends where diary owner added them
-        friends_added = db.query(Friend.friend_id).filter(
-            Friend.user_id == diary.user_id,
-            Friend.status == FriendshipStatus.accepted
-        ).all()
-        
-        # Friends who added diary owner
-        friends_of_owner = db.query(Friend.user_id).filter(
-            Friend.friend_id == diary.user_id,
-            Friend.status == FriendshipStatus.accepted
-        ).all()
-        
-        visible_users.update([f[0] for f in friends_added + friends_of_owner])
-    
-    elif diary.share_type == ShareType.group:
-        # Get group members
-        group_ids = [dg.group_id for dg in diary.diary_groups]
-        if group_ids:
-            members = db.query(GroupMember.user_id).filter(
-                GroupMember.group_id.in_(group_ids)
-            ).all()
-            visible_users.update([m[0] for m in members])
-    
-    elif diary.share_type == ShareType.personal:
-        # Only diary owner can see personal diaries
-        pass  # Already has owner
-    
-    return list(visible_users)
+    if not diary_ids:
+        return {}
+
+    like_count = select(func.count(DiaryLike.id)).where(DiaryLike.diary_id == Diary.id).scalar_subquery()
+    comment_count = select(func.count(DiaryComment.id)).where(DiaryComment.diary_id == Diary.id).scalar_subquery()
+    my_like_id = select(DiaryLike.id).where(
+        DiaryLike.diary_id == Diary.id, DiaryLike.user_id == user_id
+    ).limit(1).scalar_subquery()
+    favorited = exists().where(DiaryFavorite.diary_id == Diary.id, DiaryFavorite.user_id == user_id)
+
+    rows = db.query(
+        Diary.id, like_count, comment_count, my_like_id, favorited
+    ).filter(Diary.id.in_(diary_ids)).all()
+
+    return {
+        diary_id: {
+            "like_count": likes or 0,
+            "comment_count": comments or 0,
+            "my_like_id": like_id,
+            "favorited_by_me": bool(fav)
+        }
+        for diary_id, likes, comments, like_id, fav in rows
+    }
+
+def get_latest_comments(db: Session, diary_ids: List[int], per_diary: int = FEED_COMMENT_PREVIEW) -> dict:
+    """The newest `per_diary` comments of each diary, via one window query."""
+    if not diary_ids:
+        return {}
+
+    ranked = select(
+        DiaryComment.id,
+        func.row_number().over(
+            partition_by=DiaryComment.diary_id,
+            order_by=(DiaryComment.created_at.desc(), DiaryComment.id.desc())
+        ).label("rank")
+    ).where(DiaryComment.diary_id.in_(diary_ids)).subquery()
+
+    comments = (
+        db.query(DiaryComment)
+        .options(joinedload(DiaryComment.user))
+        .join(ranked, ranked.c.id == DiaryComment.id)
+        .filter(ranked.c.rank <= per_diary)
+        .order_by(DiaryComment.created_at.asc())
+        .all()
+    )
+
+    preview = {}
+    for c in comments:
+        preview.setdefault(c.diary_id, []).append(c)
+    return preview
+
+def build_feed_cards(db: Session, diaries: List[Diary], current_user: User) -> List[DiaryOut]:
+    """
+    Compact feed projection: counts and the viewer's own like/favorite
+    instead of every like, comment and favorite row. `likes` only carries
+    the viewer's like and `favorited_user_ids` only the viewer, so clients
+    checking "is mine in the list" keep working. Full comment threads load
+    through the comments endpoint.
+    """
+    diary_ids = [d.id for d in diaries]
+    stats = get_feed_card_stats(db, diary_ids, current_user.id)
+    previews = get_latest_comments(db, diary_ids)
+    processing = processing_diary_ids(db, diary_ids)
+    me = CreatorResponse(id=current_user.id, username=current_user.username, avatar_url=current_user.avatar_url)
+
+    cards = []
+    for d in diaries:
+        st = stats.get(d.id, {})
+        cards.append(DiaryOut(
+            id=d.id,
+            author=CreatorResponse(
+                id=d.author.id,
+                username=d.author.username,
+                avatar_url=d.author.avatar_url
+            ),
+            title=d.title,
+            content=d.content,
+            share_type=d.share_type.value,
+            groups=[GroupResponse(id=g.id, name=g.name) for g in d.groups or []],
+            images=d.images or [],
+            videos=d.videos or [],
+            video_thumbnails=[thumb for thumb in (d.video_thumbnails or []) if thumb],
+            media_type=d.media_type,
+            media_status="processing" if d.id in processing else "ready",
+            likes=[DiaryLikeResponse(id=st["my_like_id"], user=me)] if st.get("my_like_id") else [],
+            is_deleted=d.is_deleted,
+            created_at=d.created_at,
+            updated_at=d.updated_at,
+            favorited_user_ids=[current_user.id] if st.get("favorited_by_me") else [],
+            comments=[
+                CommentResponse(
+                    content=c.content,
+                    created_at=c.created_at,
+                    user=CreatorResponse(
+                        id=c.user.id if c.user else -1,
+                        username=c.user.username if c.user else "Deleted User",
+                        avatar_url=c.user.avatar_url if c.user else None
+                    ),
+                    images=c.images or [],
+                    parent_id=c.parent_id,
+                    replies=[]
+                )
+                for c in previews.get(d.id, [])
+            ],
+            like_count=st.get("like_count", 0),
+            comment_count=st.get("comment_count", 0),
+            liked_by_me=bool(st.get("my_like_id")),
+            favorited_by_me=st.get("favorited_by_me", False)
+        ))
+    return cards
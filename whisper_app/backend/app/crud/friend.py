@@ -78,6 +78,14 @@ def get_friends(db: Session, user_id: int) -> List[User]:
     ).filter(Friend.status == FriendshipStatus.accepted).all()
 
 
+def get_friend_ids(db: Session, user_id: int) -> List[int]:
+    rows = db.query(Friend.user_id, Friend.friend_id).filter(
+        (Friend.user_id == user_id) | (Friend.friend_id == user_id),
+        Friend.status == FriendshipStatus.accepted
+    ).all()
+    return [f if u == user_id else u for u, f in rows]
+
+
 def get_pending_requests(db: Session, user_id: int) -> List[User]:
     return db.query(User).join(Friend, Friend.user_id == User.id)\
         .filter(Friend.friend_id == user_id, Friend.status == FriendshipStatus.pending).all()
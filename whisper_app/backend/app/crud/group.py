@@ -21,12 +21,15 @@ from app.models.diary_group import DiaryGroup
 from app.models.group_invite import GroupInvite, InviteStatus
 from app.models.group_image import GroupImage
 import string
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 
 from app.models.group_invite_link import GroupInviteLink
-from app.core.cloudinary import upload_to_cloudinary, delete_from_cloudinary, configure_cloudinary, extract_public_id_from_url
+from app.core.cloudinary import configure_cloudinary, extract_public_id_from_url
+from app.core.storage import storage
+from app.services.media_ingest import IMAGE_TYPES, ingest_upload
 
 from app.crud.activity import create_activity
+from app.crud.conversation import open_conversation
 from app.models.activity import ActivityType
 
 configure_cloudinary()
@@ -163,6 +166,7 @@ def accept_group_invite(db: Session, invite_id: int, user_id: int) -> Group:
     # Add user to group
     member = GroupMember(user_id=user_id, group_id=invite.group_id)
     db.add(member)
+    open_conversation(db, user_id, "group", invite.group_id)
 
     # Mark invite as accepted
     invite.status = "accepted"
@@ -209,10 +213,9 @@ def get_group_diaries(db: Session, group_id: int, user_id: int, search: Optional
         .join(DiaryGroup, Diary.id == DiaryGroup.diary_id)
         .filter(DiaryGroup.group_id == group_id)
         .options(
-            joinedload(Diary.groups),
+            selectinload(Diary.groups),
             joinedload(Diary.author),
-            joinedload(Diary.likes),
-            joinedload(Diary.comments)
+            selectinload(Diary.diary_groups).joinedload(DiaryGroup.shared_user)
         )
     )
 
@@ -250,6 +253,7 @@ def create_group(db: Session, name: str, creator_id: int, description: str = Non
 def add_member(db: Session, group_id: int, user_id: int, is_admin: bool = False):
     member = GroupMember(group_id=group_id, user_id=user_id, is_admin=is_admin)
     db.merge(member)
+    open_conversation(db, user_id, "group", group_id)
     db.commit()
 
 def create_group_with_invites(
@@ -270,6 +274,7 @@ def create_group_with_invites(
     # 2. Creator is automatically a member
     db_member = GroupMember(user_id=creator_id, group_id=db_group.id)
     db.add(db_member)
+    open_conversation(db, creator_id, "group", db_group.id)
 
     # 3. Invite friends (if any) - FIXED: Actually create invitations
     if group_in.invite_user_ids:
@@ -351,6 +356,7 @@ def create_group_with_invites(db: Session, group_in: GroupCreate, creator_id: in
     # Add creator as member
     db_member = GroupMember(user_id=creator_id, group_id=db_group.id)
     db.add(db_member)
+    open_conversation(db, creator_id, "group", db_group.id)
 
     db.commit()
     db.refresh(db_group)
@@ -444,12 +450,8 @@ async def upload_group_cover(group_id: int, db: Session, cover: UploadFile, curr
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail="Only png and JPG are allowed")
         
-        content = await cover.read()
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="File is too large, max size is 3MB"
-            )
+        ingested = await ingest_upload(cover, MAX_FILE_SIZE, IMAGE_TYPES,
+                                       too_large_detail="File is too large, max size is 3MB")
         
         group = db.query(Group).filter(Group.id == group_id).first()
         if not group:
@@ -462,7 +464,7 @@ async def upload_group_cover(group_id: int, db: Session, cover: UploadFile, curr
             
         unique_filename = f"groups/{group_id}/cover/{uuid.uuid4().hex}{file_extension}"
             
-        upload_result = upload_to_cloudinary(content, public_id=unique_filename)
+        upload_result = await storage.upload_media(ingested.file, public_id=unique_filename)
         if not upload_result or "secure_url" not in upload_result:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                                 detail="Failed to upload cover")
@@ -502,7 +504,7 @@ async def delete_cover(cover_id: int, db: Session, current_user_id: int):
         
         public_id = extract_public_id_from_url(cover.url)
         if public_id:
-            delete_from_cloudinary(public_id)
+            await storage.delete(public_id)
             
         db.delete(cover)
         db.commit()
@@ -0,0 +1,113 @@
+# app/crud/group_read.py
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from app.crud.conversation import record_group_seen, record_group_seen_async
+from app.models.group_message import GroupMessage
+from app.models.group_message_seen import GroupMessageSeen
+from app.models.group_read_watermark import GroupReadWatermark
+from app.models.user import User
+
+
+def watermark_statement(group_id: int, user_id: int, message_id: int, seen_at: datetime):
+    """
+    Upsert the member's watermark to `message_id`. Only a message of this
+    group is accepted and the watermark only moves forward; RETURNING is
+    empty when nothing changed.
+    """
+    stmt = pg_insert(GroupReadWatermark).from_select(
+        ["group_id", "user_id", "last_read_message_id", "updated_at"],
+        select(
+            literal(group_id),
+            literal(user_id),
+            GroupMessage.id,
+            literal(seen_at, DateTime(timezone=True))
+        ).where(GroupMessage.id == message_id, GroupMessage.group_id == group_id)
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["group_id", "user_id"],
+        set_={
+            "last_read_message_id": stmt.excluded.last_read_message_id,
+            "updated_at": stmt.excluded.updated_at,
+        },
+        where=GroupReadWatermark.last_read_message_id < stmt.excluded.last_read_message_id
+    ).returning(GroupReadWatermark.last_read_message_id)
+
+
+def advance_watermark(db: Session, user_id: int, group_id: int, message_id: int) -> Optional[datetime]:
+    """Returns the seen time when the watermark moved, else None. The caller commits."""
+    seen_at = datetime.now(timezone.utc)
+    if db.execute(watermark_statement(group_id, user_id, message_id, seen_at)).first() is None:
+        return None
+    record_group_seen(db, user_id, group_id)
+    return seen_at
+
+
+async def advance_watermark_async(db: AsyncSession, user_id: int, group_id: int, message_id: int) -> Optional[datetime]:
+    seen_at = datetime.now(timezone.utc)
+    result = await db.execute(watermark_statement(group_id, user_id, message_id, seen_at))
+    if result.first() is None:
+        return None
+    await record_group_seen_async(db, user_id, group_id)
+    return seen_at
+
+
+def _watermarks_query(group_id: int):
+    return select(
+        GroupReadWatermark.user_id,
+        GroupReadWatermark.last_read_message_id,
+        GroupReadWatermark.updated_at,
+        User.username,
+        User.avatar_url
+    ).join(User, User.id == GroupReadWatermark.user_id).where(GroupReadWatermark.group_id == group_id)
+
+
+async def get_group_watermarks_async(db: AsyncSession, group_id: int) -> list:
+    return (await db.execute(_watermarks_query(group_id))).all()
+
+
+def _seen_entry(entry_id: int, user_id: int, username: str, avatar_url: Optional[str], seen_at) -> dict:
+    return {
+        "id": entry_id,
+        "user": {"id": user_id, "username": username, "avatar_url": avatar_url},
+        "seen_at": seen_at,
+    }
+
+
+def merge_seen_by(message: GroupMessage, watermarks: list) -> List[dict]:
+    """
+    Seen-by list of one message: per-message rows written before watermarks
+    existed, plus every member whose watermark reached the message. A
+    watermark entry uses the member's id as its id and the time the
+    watermark last moved as its seen time.
+    """
+    seen: Dict[int, dict] = {}
+    for row in message.seen_by or []:
+        if row.user is not None:
+            seen[row.user_id] = _seen_entry(row.id, row.user_id, row.user.username, row.user.avatar_url, row.seen_at)
+    for mark in watermarks:
+        if mark.last_read_message_id >= message.id and mark.user_id != message.sender_id:
+            seen.setdefault(mark.user_id, _seen_entry(
+                mark.user_id, mark.user_id, mark.username, mark.avatar_url, mark.updated_at
+            ))
+    return list(seen.values())
+
+
+def get_seen_by(db: Session, message_id: int) -> List[dict]:
+    message = db.query(GroupMessage).options(
+        joinedload(GroupMessage.seen_by).joinedload(GroupMessageSeen.user)
+    ).filter(GroupMessage.id == message_id).first()
+    if not message:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Message not found")
+
+    watermarks = db.execute(
+        _watermarks_query(message.group_id).where(GroupReadWatermark.last_read_message_id >= message.id)
+    ).all()
+    return merge_seen_by(message, watermarks)
@@ -0,0 +1,138 @@
+# app/crud/media_job.py
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.diary import Diary
+from app.models.media_job import MediaJob, MediaJobStatus
+
+VIDEO_DERIVATIVES = "video_derivatives"
+OPEN_STATUSES = (MediaJobStatus.pending, MediaJobStatus.running)
+
+
+def enqueue_video_jobs(db: Session, diary: Diary) -> int:
+    """
+    One job per video of `diary` that has no thumbnail yet. Runs in the
+    diary's transaction, so the jobs exist exactly when the diary does;
+    the caller commits.
+    """
+    thumbnails = diary.video_thumbnails or []
+    jobs = [
+        MediaJob(diary_id=diary.id, kind=VIDEO_DERIVATIVES, payload={"index": index, "video_url": url})
+        for index, url in enumerate(diary.videos or [])
+        if index >= len(thumbnails) or not thumbnails[index]
+    ]
+    db.add_all(jobs)
+    return len(jobs)
+
+
+def processing_diary_ids(db: Session, diary_ids: Iterable[int]) -> Set[int]:
+    """Diaries among `diary_ids` whose media is still being processed"""
+    diary_ids = list(diary_ids)
+    if not diary_ids:
+        return set()
+    rows = db.execute(
+        select(MediaJob.diary_id).where(
+            MediaJob.diary_id.in_(diary_ids),
+            MediaJob.status.in_(OPEN_STATUSES)
+        ).distinct()
+    ).scalars()
+    return set(rows)
+
+
+def claim_statement(stale_after: float):
+    """
+    Take the oldest runnable job: pending and due, or running for longer
+    than `stale_after` seconds (its worker died). SKIP LOCKED lets workers
+    of every process claim concurrently without taking the same row.
+    """
+    now = func.now()
+    candidate = (
+        select(MediaJob.id)
+        .where(
+            ((MediaJob.status == MediaJobStatus.pending) & (MediaJob.run_after <= now))
+            | ((MediaJob.status == MediaJobStatus.running)
+               & (MediaJob.updated_at < now - timedelta(seconds=stale_after)))
+        )
+        .order_by(MediaJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    return (
+        update(MediaJob)
+        .where(MediaJob.id == candidate)
+        .values(status=MediaJobStatus.running, attempts=MediaJob.attempts + 1, updated_at=now)
+        .returning(MediaJob.id, MediaJob.diary_id, MediaJob.kind, MediaJob.payload, MediaJob.attempts)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def claim_job(db: AsyncSession, stale_after: float):
+    return (await db.execute(claim_statement(stale_after))).first()
+
+
+async def finish_job(db: AsyncSession, job_id: int, status: MediaJobStatus,
+                     result: Optional[dict] = None, error: Optional[str] = None) -> None:
+    await db.execute(
+        update(MediaJob).where(MediaJob.id == job_id)
+        .values(status=status, result=result, error=error, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def retry_job(db: AsyncSession, job_id: int, delay: float, error: str) -> None:
+    await db.execute(
+        update(MediaJob).where(MediaJob.id == job_id)
+        .values(
+            status=MediaJobStatus.pending,
+            error=error,
+            run_after=datetime.now(timezone.utc) + timedelta(seconds=delay),
+            updated_at=func.now()
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def attach_video_thumbnail(db: AsyncSession, diary_id: int, index: int,
+                                 video_url: str, thumbnail_url: str) -> bool:
+    """
+    Set one thumbnail slot in place, so jobs of the same diary finishing
+    together don't overwrite each other's slot. Skipped when the video at
+    that position was replaced in the meantime.
+    """
+    # Postgres arrays are 1-based
+    result = await db.execute(
+        update(Diary)
+        .where(Diary.id == diary_id, Diary.videos[index + 1] == video_url)
+        # updated_at set server-side: the model's aware onupdate value is rejected by asyncpg
+        .values({Diary.video_thumbnails[index + 1]: thumbnail_url, Diary.updated_at: func.now()})
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+async def has_open_jobs(db: AsyncSession, diary_id: int) -> bool:
+    row = await db.execute(
+        select(MediaJob.id).where(MediaJob.diary_id == diary_id, MediaJob.status.in_(OPEN_STATUSES)).limit(1)
+    )
+    return row.first() is not None
+
+
+async def get_renditions(db: AsyncSession, diary_id: int) -> Dict[int, List[str]]:
+    """Video index -> rendition URLs produced by the diary's finished jobs"""
+    rows = await db.execute(
+        select(MediaJob.result).where(
+            MediaJob.diary_id == diary_id,
+            MediaJob.kind == VIDEO_DERIVATIVES,
+            MediaJob.status == MediaJobStatus.done
+        )
+    )
+    renditions = {}
+    for result in rows.scalars():
+        if result:
+            renditions[result["index"]] = result.get("renditions") or []
+    return renditions
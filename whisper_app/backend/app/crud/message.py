@@ -1,19 +1,20 @@
 from app.models.group_message import GroupMessage, MessageType
 from app.models.group_member import GroupMember
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status, UploadFile
-from app.schemas.group import GroupMessageUpdate
-from app.schemas.chat import ParentMessageResponse, AuthorResponse, GroupMessageOut
 from datetime import datetime, timezone
-from app.core.cloudinary import extract_public_id_from_url, upload_to_cloudinary, delete_from_cloudinary, configure_cloudinary
+from app.core.cloudinary import extract_public_id_from_url, configure_cloudinary
+from app.core.storage import storage
 from pathlib import Path
 import uuid
 from app.models.group_message_seen import GroupMessageSeen
+from app.crud.group_read import advance_watermark, advance_watermark_async, get_seen_by
 from app.services.websocket_manager import manager
 from app.helpers.to_utc_iso import to_local_iso
+from app.services.media_ingest import IMAGE_TYPES, ingest_upload
 from app.models.user import User
-import cloudinary
-import cloudinary.uploader
+from app.crud.conversation import add_group_message
 
 configure_cloudinary()
 
@@ -49,7 +50,7 @@ async def delete_message(db: Session, message_id: int, current_user_id: int):
     if message.file_url:
         public_id = extract_public_id_from_url(message.file_url)
         if public_id:
-            delete_from_cloudinary(public_id)
+            await storage.delete(public_id)
 
     if message.voice_url:
         await delete_voice_message(message)
@@ -76,14 +77,12 @@ async def upload_file_message(db: Session, group_id: int, file: UploadFile, curr
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Only png and JPG are allowed")
         
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="File is too large, Max size is 3MB")
+    ingested = await ingest_upload(file, MAX_FILE_SIZE, IMAGE_TYPES,
+                                   too_large_detail="File is too large, Max size is 3MB")
         
     unique_filename = f"groups/{group_id}/messages/{uuid.uuid4().hex}{file_extension}"
     
-    upload_result = upload_to_cloudinary(content, public_id=unique_filename)
+    upload_result = await storage.upload_media(ingested.file, public_id=unique_filename)
     if not upload_result or "secure_url" not in upload_result:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="Failed to upload file")
@@ -97,7 +96,7 @@ async def upload_file_message(db: Session, group_id: int, file: UploadFile, curr
         content = None
     )
     
-    db.add(save_message)
+    add_group_message(db, save_message)
     db.commit()
     db.refresh(save_message)
     return save_message
@@ -115,21 +114,19 @@ async def update_file_message(db: Session, message_id: int, file: UploadFile, cu
     
     if message.file_url:    
         public_id = extract_public_id_from_url(message.file_url)
-        delete_from_cloudinary(public_id)
+        await storage.delete(public_id)
     
     file_extension = Path(file.filename).suffix.lower()
     if file_extension not in ALLOWED_EXTENSIONS:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Only png and JPG are allowed")
         
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="File is too large, Max size is 3MB")
+    ingested = await ingest_upload(file, MAX_FILE_SIZE, IMAGE_TYPES,
+                                   too_large_detail="File is too large, Max size is 3MB")
         
     unique_filename = f"groups/{message.group_id}/messages/{uuid.uuid4().hex}{file_extension}"
     
-    upload_result = upload_to_cloudinary(content, public_id=unique_filename)
+    upload_result = await storage.upload_media(ingested.file, public_id=unique_filename)
     if not upload_result or "secure_url" not in upload_result:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="Failed to upload file")
@@ -144,35 +141,10 @@ async def update_file_message(db: Session, message_id: int, file: UploadFile, cu
 
 async def handle_seen_message(db, current_user_id, group_id, message_id, chat_id):
     try:
-    
-        msg = db.query(GroupMessage).filter(
-            GroupMessage.id == message_id,
-            GroupMessage.group_id == group_id
-        ).first()
-        if not msg:
-            return 
+        now = advance_watermark(db, current_user_id, group_id, message_id)
+        if now is None:
+            return
 
-        seen_record = db.query(GroupMessageSeen).filter_by(
-            message_id = message_id,
-            user_id=current_user_id
-        ).first()
-        if seen_record and seen_record.seen:
-            return 
-        
-        now = datetime.utcnow()
-        
-        if not seen_record:
-            seen_record = GroupMessageSeen(
-                message_id=message_id,
-                user_id=current_user_id,
-                seen=True,
-                seen_at=now
-            )
-            db.add(seen_record)
-        else:
-            seen_record.seen = True
-            seen_record.seen_at = now
-            
         db.commit()
 
         await manager.broadcast(chat_id, {
@@ -186,6 +158,26 @@ async def handle_seen_message(db, current_user_id, group_id, message_id, chat_id
         db.rollback()
         print(f"[Seen Error] {e}")
         
+async def handle_seen_message_async(db: AsyncSession, current_user_id: int, group_id: int, message_id: int):
+    """
+    Non-blocking variant of handle_seen_message for WebSocket handlers.
+    Moves the member's read watermark forward and returns the seen time, or
+    None when the message is not in the group or was already covered by the
+    watermark; broadcasting is left to the caller so it can coalesce marks.
+    """
+    try:
+        now = await advance_watermark_async(db, current_user_id, group_id, message_id)
+        if now is None:
+            return None
+
+        await db.commit()
+        return now
+
+    except Exception as e:
+        await db.rollback()
+        print(f"[Seen Error] {e}")
+        return None
+        
 async def handle_forward_message(
     db: Session,
     current_user_id: int,
@@ -224,7 +216,7 @@ async def handle_forward_message(
             message_type=original.message_type
         )
 
-        db.add(new_msg)
+        add_group_message(db, new_msg)
         db.commit()
         db.refresh(new_msg)
 
@@ -266,9 +258,7 @@ async def handle_forward_message(
     return forwarded_messages
         
 def get_seen_messages(db: Session, message_id):
-    seen_messages = db.query(GroupMessageSeen).filter(
-        GroupMessageSeen.message_id == message_id
-    ).all()
+    seen_messages = get_seen_by(db, message_id)
     if not seen_messages:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Seen message not found")
@@ -288,14 +278,10 @@ async def upload_voice_message(group_id: int,
     
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     
-    content = await file.read()
-    file_size = len(content)
-    
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB")
+    ingested = await ingest_upload(file, MAX_FILE_SIZE, allowed_types)
     
-    upload_result = cloudinary.uploader.upload(
-        content,
+    upload_result = await storage.upload(
+        ingested.file,
         resource_type="video",
         folder="whisper_space/group/voice_messages",
         public_id=f"user_{current_user_id}_{uuid.uuid4().hex}",
@@ -312,7 +298,7 @@ async def upload_voice_message(group_id: int,
         voice_public_id=voice_public_id
     )
     
-    db.add(new_message)
+    add_group_message(db, new_message)
     db.commit()
     db.refresh(new_message)
     
@@ -323,7 +309,7 @@ async def delete_voice_message(message: GroupMessage):
         return
 
     try:
-        result = cloudinary.uploader.destroy(
+        result = await storage.destroy(
             message.voice_public_id,
             resource_type="video"
         )
@@ -1,5 +1,6 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
 
@@ -117,6 +118,62 @@ def get_message_reactions(
     
     return reactions
 
+def get_reaction_summaries(
+    db: Session,
+    message_ids: Iterable[int],
+    user_id: int
+) -> Dict[int, dict]:
+    """
+    Reaction summaries for many messages in one grouped query: counts per
+    (message, emoji) plus whether the current user used that emoji.
+    Messages the user cannot access are left out; accessible messages
+    without reactions get an empty summary.
+    """
+    message_ids = list(set(message_ids))
+    if not message_ids:
+        return {}
+
+    rows = db.query(
+        PrivateMessage.id.label("message_id"),
+        MessageReaction.emoji,
+        func.count(MessageReaction.id).label("count"),
+        func.max(MessageReaction.created_at).label("latest"),
+        func.bool_or(MessageReaction.user_id == user_id).label("user_reacted")
+    ).outerjoin(
+        MessageReaction, MessageReaction.message_id == PrivateMessage.id
+    ).filter(
+        PrivateMessage.id.in_(message_ids),
+        (PrivateMessage.sender_id == user_id) | (PrivateMessage.receiver_id == user_id)
+    ).group_by(
+        PrivateMessage.id,
+        MessageReaction.emoji
+    ).order_by(
+        PrivateMessage.id,
+        func.count(MessageReaction.id).desc(),
+        func.max(MessageReaction.created_at).desc()
+    ).all()
+
+    summaries = {}
+    for row in rows:
+        summary = summaries.setdefault(row.message_id, {
+            "message_id": row.message_id,
+            "reactions": [],
+            "total_reactions": 0,
+            "user_has_reacted": False
+        })
+        if row.emoji is None:
+            continue
+        summary["reactions"].append({
+            "emoji": row.emoji,
+            "count": row.count,
+            "latest": row.latest,
+            "user_reacted": bool(row.user_reacted)
+        })
+        summary["total_reactions"] += row.count
+        summary["user_has_reacted"] = summary["user_has_reacted"] or bool(row.user_reacted)
+
+    return summaries
+
 def get_reaction_summary(
     db: Session, 
     message_id: int, 
@@ -125,53 +182,10 @@ def get_reaction_summary(
     """
     Get reaction summary (count by emoji) for a message
     """
-    # Verify user has access to the message
-    message = db.query(PrivateMessage).filter(
-        PrivateMessage.id == message_id,
-        (PrivateMessage.sender_id == user_id) | (PrivateMessage.receiver_id == user_id)
-    ).first()
-    
-    if not message:
+    summary = get_reaction_summaries(db, [message_id], user_id).get(message_id)
+    if summary is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Message not found or access denied"
         )
-    
-    # Get reaction counts grouped by emoji
-    from sqlalchemy import func
-    
-    reaction_counts = db.query(
-        MessageReaction.emoji,
-        func.count(MessageReaction.id).label('count'),
-        func.max(MessageReaction.created_at).label('latest')
-    ).filter(
-        MessageReaction.message_id == message_id
-    ).group_by(
-        MessageReaction.emoji
-    ).order_by(
-        func.count(MessageReaction.id).desc(),
-        func.max(MessageReaction.created_at).desc()
-    ).all()
-    
-    # Check which emojis the current user has reacted with
-    user_reactions = db.query(MessageReaction.emoji).filter(
-        MessageReaction.message_id == message_id,
-        MessageReaction.user_id == user_id
-    ).all()
-    
-    user_reacted_emojis = {r.emoji for r in user_reactions}
-    
-    return {
-        "message_id": message_id,
-        "reactions": [
-            {
-                "emoji": rc.emoji,
-                "count": rc.count,
-                "latest": rc.latest,
-                "user_reacted": rc.emoji in user_reacted_emojis
-            }
-            for rc in reaction_counts
-        ],
-        "total_reactions": sum(rc.count for rc in reaction_counts),
-        "user_has_reacted": len(user_reacted_emojis) > 0
-    }
\ No newline at end of file
+    return summary
@@ -0,0 +1,185 @@
+# app/crud/timeline.py
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import and_, delete, exists, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.diary import Diary, ShareType
+from app.models.diary_group import DiaryGroup
+from app.models.diary_timeline import DiaryTimelineEntry
+from app.models.friend import Friend, FriendshipStatus
+from app.models.group_member import GroupMember
+
+
+def _friend_ids(db: Session, user_id: int) -> Set[int]:
+    rows = db.query(Friend.user_id, Friend.friend_id).filter(
+        Friend.status == FriendshipStatus.accepted,
+        or_(Friend.user_id == user_id, Friend.friend_id == user_id)
+    ).all()
+    return {f if u == user_id else u for u, f in rows}
+
+
+def _group_member_ids(db: Session, group_ids: Iterable[int]) -> Set[int]:
+    group_ids = list(set(group_ids))
+    if not group_ids:
+        return set()
+    rows = db.query(GroupMember.user_id).filter(GroupMember.group_id.in_(group_ids)).all()
+    return {r[0] for r in rows}
+
+
+def _diary_group_ids(db: Session, diary: Diary) -> List[int]:
+    group_ids = [r[0] for r in db.query(DiaryGroup.group_id).filter(DiaryGroup.diary_id == diary.id).all()]
+    if diary.group_id:
+        group_ids.append(diary.group_id)
+    return group_ids
+
+
+def _push(db: Session, diary: Diary, user_ids: Iterable[int]) -> None:
+    rows = [
+        {"user_id": uid, "diary_id": diary.id, "created_at": diary.created_at, "pull": False}
+        for uid in set(user_ids)
+    ]
+    if rows:
+        db.execute(pg_insert(DiaryTimelineEntry).values(rows).on_conflict_do_nothing())
+
+
+def _mark_pull(db: Session, diary: Diary) -> None:
+    stmt = pg_insert(DiaryTimelineEntry).values(
+        user_id=diary.user_id,
+        diary_id=diary.id,
+        created_at=diary.created_at,
+        pull=True
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id", "diary_id"],
+        set_={"pull": True}
+    ))
+
+
+def _trim(db: Session, user_ids: Iterable[int]) -> None:
+    """Keep only the newest DIARY_TIMELINE_SIZE pushed rows per reader."""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return
+    ranked = select(
+        DiaryTimelineEntry.user_id,
+        DiaryTimelineEntry.diary_id,
+        func.row_number().over(
+            partition_by=DiaryTimelineEntry.user_id,
+            order_by=(DiaryTimelineEntry.created_at.desc(), DiaryTimelineEntry.diary_id.desc())
+        ).label("rank")
+    ).where(
+        DiaryTimelineEntry.user_id.in_(user_ids),
+        DiaryTimelineEntry.pull.is_(False)
+    ).subquery()
+    overflow = select(ranked.c.user_id, ranked.c.diary_id).where(ranked.c.rank > settings.DIARY_TIMELINE_SIZE)
+    db.execute(delete(DiaryTimelineEntry).where(
+        DiaryTimelineEntry.pull.is_(False),
+        tuple_(DiaryTimelineEntry.user_id, DiaryTimelineEntry.diary_id).in_(overflow)
+    ))
+
+
+def fan_out_diary(db: Session, diary: Diary, group_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Push a new (or newly shared) diary into its readers' timelines.
+    `group_ids` limits the audience to those groups, for share_diary.
+    Commits on its own; a failure here never fails the write that caused it.
+    """
+    if not settings.DIARY_TIMELINE_ENABLED:
+        return
+    try:
+        if diary.share_type == ShareType.public:
+            # Merged into every timeline at read time (timeline_filter)
+            return
+
+        if group_ids is not None:
+            readers = _group_member_ids(db, group_ids)
+        elif diary.share_type == ShareType.friends:
+            readers = _friend_ids(db, diary.user_id)
+        elif diary.share_type == ShareType.group:
+            readers = _group_member_ids(db, _diary_group_ids(db, diary))
+        else:
+            readers = set()
+
+        if len(readers) > settings.DIARY_TIMELINE_FANOUT_LIMIT:
+            _mark_pull(db, diary)
+        else:
+            readers.add(diary.user_id)
+            _push(db, diary, readers)
+            _trim(db, readers)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[Timeline] Fan-out failed for diary {diary.id}: {e}")
+
+
+def has_timeline(db: Session, user_id: int) -> bool:
+    # Only pushed rows count: the reader's own pull rows say nothing about their timeline
+    return db.query(DiaryTimelineEntry.diary_id).filter(
+        DiaryTimelineEntry.user_id == user_id,
+        DiaryTimelineEntry.pull.is_(False)
+    ).first() is not None
+
+
+def seed_timeline(db: Session, user_id: int, visible_filter) -> None:
+    """Fill an empty timeline from the fan-out-on-read query, once."""
+    recent = db.query(Diary.id, Diary.created_at).filter(visible_filter).order_by(
+        Diary.created_at.desc(), Diary.id.desc()
+    ).limit(settings.DIARY_TIMELINE_SIZE).all()
+    if recent:
+        db.execute(pg_insert(DiaryTimelineEntry).values([
+            {"user_id": user_id, "diary_id": diary_id, "created_at": created_at, "pull": False}
+            for diary_id, created_at in recent
+        ]).on_conflict_do_nothing())
+        db.commit()
+
+
+def _trim_boundary(db: Session, user_id: int):
+    """(created_at, diary_id) of the oldest pushed row once the timeline is full, else None"""
+    return db.query(DiaryTimelineEntry.created_at, DiaryTimelineEntry.diary_id).filter(
+        DiaryTimelineEntry.user_id == user_id,
+        DiaryTimelineEntry.pull.is_(False)
+    ).order_by(
+        DiaryTimelineEntry.created_at.desc(), DiaryTimelineEntry.diary_id.desc()
+    ).offset(settings.DIARY_TIMELINE_SIZE - 1).first()
+
+
+def _followed_author(user_id: int):
+    """Pull rows whose author is the reader, a friend or a fellow group member"""
+    author = DiaryTimelineEntry.user_id
+    is_friend = exists().where(
+        Friend.status == FriendshipStatus.accepted,
+        or_(
+            and_(Friend.user_id == user_id, Friend.friend_id == author),
+            and_(Friend.friend_id == user_id, Friend.user_id == author)
+        )
+    )
+    mine = aliased(GroupMember)
+    theirs = aliased(GroupMember)
+    shares_group = exists().where(
+        mine.user_id == user_id,
+        theirs.group_id == mine.group_id,
+        theirs.user_id == author
+    )
+    return or_(author == user_id, is_friend, shares_group)
+
+
+def timeline_filter(db: Session, user_id: int):
+    """
+    Predicate on Diary for a reader's timeline: their pushed rows, the pull
+    rows of authors they follow and every public diary, so a page matches
+    the fan-out-on-read query. Pushed rows are trimmed, so once the
+    timeline is full it only reaches down to its oldest pushed row; older
+    pages come from the fan-out-on-read query (see get_visible_page).
+    """
+    entries = select(DiaryTimelineEntry.diary_id).where(or_(
+        and_(DiaryTimelineEntry.user_id == user_id, DiaryTimelineEntry.pull.is_(False)),
+        and_(DiaryTimelineEntry.pull.is_(True), _followed_author(user_id))
+    ))
+    predicate = or_(Diary.id.in_(entries), Diary.share_type == ShareType.public)
+    boundary = _trim_boundary(db, user_id)
+    if boundary is not None:
+        predicate = and_(predicate, tuple_(Diary.created_at, Diary.id) >= tuple_(*boundary))
+    return predicate
@@ -3,8 +3,9 @@ from app.schemas.auth import UserCreate
 from app.models.user import User
 from app.models.friend import Friend, FriendshipStatus
 from app.schemas.user import UserUpdate
-from app.core.security import hash_password
-from typing import List
+from app.core.hashing import hash_password
+from app.core.user_cache import invalidate_user
+from typing import List, Optional
 from sqlalchemy import select, or_, and_, func, case, union, union_all
 
 def get_by_id(db: Session, user_id: int) -> User:
@@ -15,8 +16,8 @@ def get_by_email(db: Session, email: str) -> User:
     return db.query(User).filter(User.email == email).first()
 
 
-def create(db: Session, user_in: UserCreate) -> User:
-    hashed = hash_password(user_in.password)
+def create(db: Session, user_in: UserCreate, password_hash: Optional[str] = None) -> User:
+    hashed = password_hash or hash_password(user_in.password)
     user = User(
         username=user_in.username, 
         email=user_in.email, 
@@ -34,6 +35,7 @@ def update(db: Session, user: User, user_in: UserUpdate) -> User:
     for key, value in update_data.items():
         setattr(user, key, value)
     db.commit()
+    invalidate_user(user.id)
     db.refresh(user)
     return user
 
@@ -50,6 +52,7 @@ def verify(db: Session, user_id: int) -> User:
     if user:
         user.is_verified = True
         db.commit()
+        invalidate_user(user.id)
         db.refresh(user)  # ✅ Refresh to get updated data
     return user  # ✅ Return the user object
 
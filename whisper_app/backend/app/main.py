@@ -5,8 +5,13 @@ from fastapi.responses import FileResponse
 from app.api.v1.routers import auth, users, chats, diaries, websockets, friends, groups, avatar, notes, message, activity
 from app.models import base
 from app.core.database import engine
+from app.core.hashing import hashing_pool
+from app.core.storage import storage
 import os
 from app.services.websocket_manager import manager
+from app.services.ws_manager_group import manager as group_manager
+from app.services.presence import presence_buffer
+from app.services.media_jobs import media_job_queue
 from app.api.v1.routers import upload
 
 from app.core.cloudinary import configure_cloudinary
@@ -36,8 +41,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], 
     allow_headers=["*"], 
+    # Pagination cursors travel in headers; browsers hide them unless exposed
+    expose_headers=["X-Has-More", "X-Next-Before-Id", "X-Next-After-Id"],
 )
 
+@app.on_event("startup")
+async def start_websocket_backplane():
+    await manager.start_backplane()
+    await group_manager.start_backplane()
+    await media_job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_websocket_backplane():
+    await manager.stop_backplane()
+    await group_manager.stop_backplane()
+    await media_job_queue.stop()
+    await presence_buffer.flush()
+
 # Include API routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
@@ -77,7 +97,13 @@ def root():
 
 @app.get("/api/v1/health")
 def health_check():
-    return {"status": "healthy", "message": "Whisper Space API is running"}
+    return {
+        "status": "healthy",
+        "message": "Whisper Space API is running",
+        "password_hashing": hashing_pool.stats(),
+        "storage": storage.stats(),
+        "media_jobs": media_job_queue.stats(),
+    }
 
 @app.get("/api/v1/test-email")
 async def test_email_endpoint():
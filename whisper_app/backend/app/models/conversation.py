@@ -0,0 +1,43 @@
+# app/models/conversation.py
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint
+from app.models.base import Base
+from datetime import datetime, timezone
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class Conversation(Base):
+    """
+    One row per (user, private peer or group) summarising the chat for the
+    chat list. Maintained incrementally by the send and read paths.
+    """
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(10), nullable=False)  # "private" or "group"
+    peer_id = Column(Integer, nullable=False)  # friend id or group id
+    last_message_id = Column(Integer, nullable=True)
+    last_sender_id = Column(Integer, nullable=True)
+    last_message_preview = Column(String(255), nullable=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "kind", "peer_id", name="uq_conversation_user_peer"),
+        Index("ix_conversations_user_updated", "user_id", "updated_at"),
+    )
+
+
+class ConversationSeed(Base):
+    """
+    Marks a user whose conversation rows were built from the message
+    tables. Rows written by the send paths before that happened don't
+    count as seeded: they only cover chats active since.
+    """
+    __tablename__ = "conversation_seeds"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    seeded_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
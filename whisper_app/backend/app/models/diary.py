@@ -1,4 +1,4 @@
-from sqlalchemy import ARRAY, Column, Enum, String, Text, Boolean, DateTime, ForeignKey, Integer
+from sqlalchemy import ARRAY, Column, Enum, String, Text, Boolean, DateTime, ForeignKey, Index, Integer
 from app.models.base import Base
 from datetime import datetime, timezone  
 import enum
@@ -14,6 +14,10 @@ class ShareType(enum.Enum):
 
 class Diary(Base):
     __tablename__ = "diaries"
+    __table_args__ = (
+        # Keyset order of the feed
+        Index("ix_diaries_created_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
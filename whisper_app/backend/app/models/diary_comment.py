@@ -1,10 +1,14 @@
-from sqlalchemy import ARRAY, Column, String, Text, DateTime, ForeignKey, Integer, Boolean
+from sqlalchemy import ARRAY, Column, String, Text, DateTime, ForeignKey, Index, Integer, Boolean
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.models.base import Base
 
 class DiaryComment(Base):
     __tablename__ = "diary_comments"
+    __table_args__ = (
+        # One page of roots or of one thread's replies, in order
+        Index("ix_diary_comments_thread", "diary_id", "parent_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     diary_id = Column(Integer, ForeignKey("diaries.id", ondelete="CASCADE"), nullable=False)
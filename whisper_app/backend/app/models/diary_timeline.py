@@ -0,0 +1,24 @@
+# app/models/diary_timeline.py
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer
+from app.models.base import Base
+
+
+class DiaryTimelineEntry(Base):
+    """
+    Fan-out-on-write home timeline: one row per (reader, diary) pushed when
+    the diary is created or shared. A row with `pull` set belongs to the
+    author and marks a diary that readers resolve at read time instead
+    (authors with too many readers to push to). Public diaries have no
+    rows; the read query merges them in.
+    """
+    __tablename__ = "diary_timeline"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    diary_id = Column(Integer, ForeignKey("diaries.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    pull = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("ix_diary_timeline_user_created", "user_id", "created_at", "diary_id"),
+        Index("ix_diary_timeline_pull_created", "pull", "created_at"),
+    )
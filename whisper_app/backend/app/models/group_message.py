@@ -1,5 +1,5 @@
 # app/models/group_message.py
-from sqlalchemy import Column, Enum, Boolean, DateTime, ForeignKey, Text, Integer, String
+from sqlalchemy import Column, Enum, Boolean, DateTime, ForeignKey, Index, Text, Integer, String
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 from datetime import datetime, timezone
@@ -38,6 +38,11 @@ class GroupMessage(Base):
     parent_message_id = Column(Integer, ForeignKey("group_messages.id", ondelete="SET NULL"), nullable=True)
     forwarded_at = Column(DateTime(timezone=True), nullable=True)
 
+    __table_args__ = (
+        # Unread counts and seen-by lists compare ids against read watermarks
+        Index("ix_group_messages_group_id_id", "group_id", "id"),
+    )
+
     # Relationships
     group = relationship("Group", back_populates="messages")
     sender = relationship("User", foreign_keys=[sender_id])
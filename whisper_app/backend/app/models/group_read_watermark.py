@@ -0,0 +1,26 @@
+# app/models/group_read_watermark.py
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+from app.models.base import Base
+from datetime import datetime, timezone
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class GroupReadWatermark(Base):
+    """
+    Last group message a member has seen. Every message of the group up to
+    `last_read_message_id` counts as seen by that member, so seen state is
+    one row per (group, member) instead of one per (message, member).
+    """
+    __tablename__ = "group_read_watermarks"
+
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_read_message_id = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_group_read_watermarks_group_last_read", "group_id", "last_read_message_id"),
+    )
@@ -0,0 +1,42 @@
+# app/models/media_job.py
+from sqlalchemy import JSON, Column, DateTime, Enum, ForeignKey, Index, Integer, String, Text
+from app.models.base import Base
+from datetime import datetime, timezone
+import enum
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class MediaJobStatus(enum.Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class MediaJob(Base):
+    """
+    Media work deferred out of the request that created a diary, e.g.
+    generating a video's thumbnail and renditions. Rows are claimed by the
+    media job workers of any process; `result` keeps what the job produced.
+    """
+    __tablename__ = "media_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    diary_id = Column(Integer, ForeignKey("diaries.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(32), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(Enum(MediaJobStatus), nullable=False, default=MediaJobStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    run_after = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+
+    __table_args__ = (
+        Index("ix_media_jobs_status_run_after", "status", "run_after"),
+        Index("ix_media_jobs_diary_id", "diary_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 from datetime import datetime
@@ -11,6 +11,10 @@ class MessageSeenStatus(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     seen_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     
+    __table_args__ = (
+        UniqueConstraint("message_id", "user_id", name="uq_message_seen_status_message_user"),
+    )
+    
     # Relationships with back_populates
     message = relationship("PrivateMessage", back_populates="seen_statuses")
     user = relationship("User", back_populates="seen_message_statuses")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Enum, Boolean, DateTime, Float, ForeignKey, Text, Integer, String
+from sqlalchemy import Column, Enum, Boolean, DateTime, Float, ForeignKey, Index, Text, Integer, String
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 from datetime import datetime
@@ -13,6 +13,10 @@ class MessageType(enum.Enum):
 
 class PrivateMessage(Base):
     __tablename__ = "private_messages"
+    __table_args__ = (
+        # Serves the keyset-paginated history of one direction of a conversation
+        Index("ix_private_messages_pair_created", "sender_id", "receiver_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
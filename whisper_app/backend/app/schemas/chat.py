@@ -7,6 +7,7 @@ from pydantic import validator, field_validator
 from pydantic import Field
 
 from app.models.private_message import MessageType
+from app.schemas.reaction import ReactionSummary
 
 MessageTypeInput = Literal["text", "image", "file", "voice", "system"]
 
@@ -84,6 +85,7 @@ class MessageOut(TimestampMixin):
     voice_duration: Optional[float] = None  # ADDED
     file_size: Optional[int] = None  # ADDED
     seen_by: List[MessageSeenByUser] = Field(default_factory=list)
+    reactions: Optional[ReactionSummary] = None
     
 class AuthorResponse(BaseModel):
     id: int
@@ -155,5 +157,6 @@ class ChatListItem(BaseModel):
     name: str
     avatar: Optional[str]
     last_message: Optional[str]
+    unread_count: int = 0
     updated_at: datetime
 
@@ -144,10 +144,16 @@ class DiaryOut(BaseModel):
     videos: List[str] = Field(default_factory=list)
     video_thumbnails: List[Optional[str]] = Field(default_factory=list)
     media_type: Optional[str] = None
+    # "processing" while video thumbnails/renditions are still being generated
+    media_status: str = "ready"
     created_at: datetime
     updated_at: datetime
     comments: List[CommentResponse] = Field(default_factory=list)
     favorited_user_ids: List[int] = Field(default_factory=list)
+    like_count: int = 0
+    comment_count: int = 0
+    liked_by_me: bool = False
+    favorited_by_me: bool = False
     
     class Config:
         from_attributes=True
@@ -193,6 +199,7 @@ class DiaryCommentOut(TimestampMixin):
     reply_to_user_id: Optional[int] = None  
     reply_to_user: Optional[CreatorResponse] = None 
     replies: Optional[List['DiaryCommentOut']] = None
+    reply_count: int = 0
     created_at: datetime
     is_edited: bool = False
     updated_at: Optional[datetime] = None 
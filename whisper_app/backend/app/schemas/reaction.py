@@ -63,4 +63,16 @@ class ReactionDeleteResponse(BaseModel):
 class MessageReactionsResponse(BaseModel):
     message_id: int
     reactions: List[ReactionOut]
-    total_count: int
\ No newline at end of file
+    total_count: int
+
+class ReactionCount(BaseModel):
+    emoji: str
+    count: int
+    latest: Optional[datetime] = None
+    user_reacted: bool = False
+
+class ReactionSummary(BaseModel):
+    message_id: int
+    reactions: List[ReactionCount] = []
+    total_reactions: int = 0
+    user_has_reacted: bool = False
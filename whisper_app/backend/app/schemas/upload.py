@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Literal, Optional, Union
+
+UploadMediaType = Literal["image", "video"]
+
+class UploadTicketCreate(BaseModel):
+    media_type: UploadMediaType
+    is_diary: bool = True
+
+class UploadTicketOut(BaseModel):
+    upload_url: str
+    # Form fields to send with the file to upload_url, unchanged
+    fields: Dict[str, Union[str, int]]
+    public_id: str
+    resource_type: UploadMediaType
+    expires_at: int
+
+class UploadComplete(BaseModel):
+    # Copied from storage's upload response
+    public_id: str = Field(..., max_length=255)
+    version: int
+    signature: str = Field(..., max_length=128)
+    resource_type: UploadMediaType
+
+class UploadCompleteOut(BaseModel):
+    success: bool = True
+    url: str
+    type: UploadMediaType
+    thumbnail: Optional[str] = None
@@ -1,15 +1,16 @@
 # app/services/feed_broadcast_service.py
 import asyncio
-from typing import List, Set
+from typing import Dict, List, Set
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.services.websocket_manager import manager
+from app.services.ws_topics import diary_topic
 from app.crud.friend import get_friend_ids
-from app.crud.group import get_group_members
 from app.core.database import SessionLocal
 from app.models.user import User
 from app.models.diary import Diary
+from app.models.group_member import GroupMember
 
 
 class FeedBroadcastService:
@@ -26,14 +27,15 @@ class FeedBroadcastService:
                 db, author_id, share_type, group_ids
             )
             
-            # Broadcast to each user's feed room
-            for user_id in target_user_ids:
-                user_room = f"feed_{user_id}"
-                await manager.broadcast_to_user(user_room, {
+            # Encode once, then deliver the same frame to every feed room
+            await manager.broadcast_to_rooms(
+                [f"feed_{user_id}" for user_id in target_user_ids],
+                {
                     "type": "new_diary",
                     "data": diary_data,
                     "timestamp": datetime.utcnow().isoformat()
-                })
+                }
+            )
             
             print(f"✅ Broadcast new diary {diary_data['id']} to {len(target_user_ids)} users")
             
@@ -45,15 +47,19 @@ class FeedBroadcastService:
     @staticmethod
     async def _get_target_users(db: Session, author_id: int, share_type: str, group_ids: List[int] = None) -> Set[int]:
         """
-        Get list of user IDs who should receive the diary
+        Get the IDs of connected users who should receive the diary. The
+        audience is intersected with the online feed index, so a public
+        post costs O(online users) and offline users are never touched.
         """
+        online = manager.online_feed_users()
+        if not online:
+            return set()
+
         target_users = set()
         target_users.add(author_id)  # Always include author
         
         if share_type == "public":
-            # Get all users (you might want to limit this in production)
-            all_users = db.query(User.id).all()
-            target_users.update([user.id for user in all_users])
+            target_users.update(online)
             
         elif share_type == "friends":
             # Get friends
@@ -62,11 +68,13 @@ class FeedBroadcastService:
             
         elif share_type == "group" and group_ids:
             # Get group members
-            for group_id in group_ids:
-                member_ids = get_group_members(db, group_id)
-                target_users.update([member.id for member in member_ids])
+            member_ids = db.query(GroupMember.user_id).filter(
+                GroupMember.group_id.in_(group_ids),
+                GroupMember.user_id.in_(online)
+            ).all()
+            target_users.update([m[0] for m in member_ids])
         
-        return target_users
+        return target_users & online
     
     @staticmethod
     async def broadcast_diary_like(diary_id: int, user_id: int):
@@ -85,18 +93,16 @@ class FeedBroadcastService:
             if not user:
                 return
             
-            # Notify diary author
-            author_room = f"feed_{diary.author_id}"
-            await manager.broadcast_to_user(author_room, {
+            event = {
                 "type": "diary_liked",
                 "diary_id": diary_id,
                 "user_id": user_id,
                 "user_username": user.username,
                 "timestamp": datetime.utcnow().isoformat()
-            })
+            }
             
-            # Also broadcast to users who have this diary in their feed
-            # (simplified - in production you'd track who can see the diary)
+            # Diary author and everyone who has the diary on screen, once each
+            await manager.publish_topic(diary_topic(diary_id), event, rooms=[f"feed_{diary.user_id}"])
             
         except Exception as e:
             print(f"❌ Error broadcasting like: {e}")
@@ -115,41 +121,70 @@ class FeedBroadcastService:
             if not diary:
                 return
             
-            # Notify diary author
-            author_room = f"feed_{diary.author_id}"
-            await manager.broadcast_to_user(author_room, {
+            event = {
                 "type": "diary_commented",
                 "diary_id": diary_id,
                 "comment": comment_data,
                 "timestamp": datetime.utcnow().isoformat()
-            })
+            }
             
-            # Notify other commenters on this diary
-            # (You'd need to track who has commented)
+            # Diary author and everyone who has the diary on screen, once each
+            await manager.publish_topic(diary_topic(diary_id), event, rooms=[f"feed_{diary.user_id}"])
             
         except Exception as e:
             print(f"❌ Error broadcasting comment: {e}")
         finally:
             db.close()
     
+    @staticmethod
+    async def broadcast_diary_media_ready(diary_id: int, renditions: Dict[int, List[str]]):
+        """
+        Broadcast that a diary's deferred media (video thumbnails and
+        renditions) is attached, to the diary's audience and its viewers
+        """
+        db = SessionLocal()
+        try:
+            diary = db.query(Diary).filter(Diary.id == diary_id, Diary.is_deleted == False).first()
+            if not diary:
+                return
+            
+            group_ids = [dg.group_id for dg in diary.diary_groups]
+            target_user_ids = await FeedBroadcastService._get_target_users(
+                db, diary.user_id, diary.share_type.value, group_ids
+            )
+            
+            event = {
+                "type": "diary_media_ready",
+                "diary_id": diary_id,
+                "videos": diary.videos or [],
+                "video_thumbnails": diary.video_thumbnails or [],
+                "renditions": renditions,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            
+            await manager.publish_topic(
+                diary_topic(diary_id), event, rooms=[f"feed_{user_id}" for user_id in target_user_ids]
+            )
+            
+        except Exception as e:
+            print(f"❌ Error broadcasting media ready: {e}")
+        finally:
+            db.close()
+    
     @staticmethod
     async def broadcast_diary_deleted(diary_id: int, author_id: int):
         """
         Broadcast diary deletion
         """
         try:
-            # Get all users who might have this diary in their feed
-            # This is simplified - in production you'd track who can see it
-            
-            # Broadcast to author
-            author_room = f"feed_{author_id}"
-            await manager.broadcast_to_user(author_room, {
+            event = {
                 "type": "diary_deleted",
                 "diary_id": diary_id,
                 "timestamp": datetime.utcnow().isoformat()
-            })
+            }
             
-            # You might want to broadcast to others who can see it
+            # Author and everyone who has the diary on screen, once each
+            await manager.publish_topic(diary_topic(diary_id), event, rooms=[f"feed_{author_id}"])
             
         except Exception as e:
             print(f"❌ Error broadcasting deletion: {e}")
@@ -7,10 +7,12 @@ from typing import List, Optional, Tuple
 from fastapi import HTTPException, status
 import mimetypes
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
 # Initialize mimetypes
 mimetypes.init()
 
+from app.core.config import settings
 from app.core.cloudinary import (
     delete_from_cloudinary, 
     extract_public_id_from_url,
@@ -158,8 +160,13 @@ class ImageServiceSync:
             print(f"❌ Video upload failed: {str(e)}")
             raise Exception(f"Video upload failed: {str(e)}")
     
-    def save_single_media(self, data_url: str, is_diary: bool = True) -> Tuple[str, Optional[str]]:
-        """Save single media item with GUARANTEED thumbnail for videos"""
+    def save_single_media(self, data_url: str, is_diary: bool = True,
+                          defer_video_derivatives: bool = False) -> Tuple[str, Optional[str]]:
+        """
+        Save single media item with GUARANTEED thumbnail for videos, unless
+        defer_video_derivatives is set: then an uploaded video comes back
+        without a thumbnail and a media job has to create it.
+        """
         try:
             print(f"🔄 save_single_media called")
             
@@ -203,8 +210,10 @@ class ImageServiceSync:
                 folder = f"{base_folder}/videos"
                 print(f"🎬 Uploading video to {folder}")
                 
-                # This function GUARANTEES a thumbnail
-                upload_result = upload_video_to_cloudinary(media_data, folder)
+                # This function GUARANTEES a thumbnail unless it is deferred
+                upload_result = upload_video_to_cloudinary(
+                    media_data, folder, wait_for_derivatives=not defer_video_derivatives
+                )
                 url = upload_result["secure_url"]
                 thumbnail = upload_result["thumbnail_url"]
                 
@@ -212,7 +221,7 @@ class ImageServiceSync:
                 print(f"📸 Thumbnail: {thumbnail[:50] if thumbnail else 'None'}...")
                 
                 # Double-check thumbnail
-                if not thumbnail:
+                if not thumbnail and not defer_video_derivatives:
                     print(f"⚠️ CRITICAL: Still no thumbnail, trying again...")
                     thumbnail = generate_video_thumbnail(url)
                 
@@ -273,6 +282,43 @@ class ImageServiceSync:
         print(f"🎬 Completed: {len(saved_urls)} videos, {len([t for t in thumbnails if t])} thumbnails")
         return saved_urls, thumbnails
     
+    def save_media_concurrently(self, items: List[str], is_diary: bool = True,
+                                max_parallel: Optional[int] = None,
+                                defer_video_derivatives: bool = False) -> List[Tuple[str, Optional[str]]]:
+        """
+        Save several media items at once, at most `max_parallel` in flight,
+        and return (url, thumbnail) per item in input order. If one item
+        fails, items not yet started are cancelled, everything this call
+        uploaded is removed with cleanup_media and the error is raised.
+        """
+        if not items:
+            return []
+
+        workers = min(len(items), max_parallel or settings.DIARY_MEDIA_PARALLELISM)
+        results: List[Optional[Tuple[str, Optional[str]]]] = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media") as pool:
+            futures = {
+                pool.submit(self.save_single_media, item, is_diary, defer_video_derivatives): idx
+                for idx, item in enumerate(items)
+            }
+            try:
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                # Items that were already URLs are not ours to delete; thumbnails go with their video
+                uploaded = [
+                    future.result()[0] for future, idx in futures.items()
+                    if not future.cancelled() and future.exception() is None
+                    and not items[idx].startswith(('http://', 'https://'))
+                ]
+                print(f"❌ Media batch failed, removing {len(uploaded)} uploaded items")
+                self.cleanup_media(uploaded)
+                raise
+        return results
+
     def delete_media(self, media_url: str) -> bool:
         """Delete media from Cloudinary"""
         try:
@@ -0,0 +1,146 @@
+# app/services/media_ingest.py
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.core.config import settings
+
+IMAGE_TYPES = {"image/png", "image/jpeg"}
+PHOTO_TYPES = IMAGE_TYPES | {"image/gif", "image/webp", "image/heic", "image/avif"}
+AUDIO_TYPES = {
+    "audio/mpeg", "audio/wav", "audio/ogg", "audio/webm", "audio/aac",
+    "audio/mp4", "audio/flac", "audio/amr", "audio/x-caf",
+}
+
+# Declared types that share a container with a sniffed one
+MIME_ALIASES = {
+    "image/jpg": "image/jpeg",
+    "audio/mp3": "audio/mpeg",
+    "audio/x-wav": "audio/wav",
+    "audio/wave": "audio/wav",
+    "video/ogg": "audio/ogg",
+    "application/ogg": "audio/ogg",
+    "video/webm": "audio/webm",
+    "video/x-matroska": "audio/webm",
+    "video/mp4": "audio/mp4",
+    "audio/x-m4a": "audio/mp4",
+    "audio/m4a": "audio/mp4",
+    "video/3gpp": "audio/mp4",
+    "audio/3gpp": "audio/mp4",
+    "video/quicktime": "audio/mp4",
+}
+
+
+def normalize_mime(mime_type: Optional[str]) -> Optional[str]:
+    if not mime_type:
+        return None
+    mime_type = mime_type.split(";")[0].strip().lower()
+    return MIME_ALIASES.get(mime_type, mime_type)
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    """MIME type from the leading bytes of a file, or None when unknown"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "audio/webm"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "image/heic"
+        if brand == b"avif":
+            return "image/avif"
+        return "audio/mp4"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    if head.startswith(b"#!AMR"):
+        return "audio/amr"
+    if head.startswith(b"caff"):
+        return "audio/x-caf"
+    if head.startswith(b"ID3"):
+        return "audio/mpeg"
+    if len(head) >= 2 and head[0] == 0xFF:
+        # ADTS (AAC) has layer bits 00; any other frame sync is MPEG audio
+        if head[1] & 0xF6 == 0xF0:
+            return "audio/aac"
+        if head[1] & 0xE0 == 0xE0:
+            return "audio/mpeg"
+    return None
+
+
+@dataclass
+class IngestedUpload:
+    """
+    A validated upload. `file` is the request's own spooled file (Starlette
+    keeps small parts in memory and larger ones on disk), rewound so it can
+    be streamed to storage without being read into memory.
+    """
+    file: BinaryIO
+    size: int
+    mime_type: str
+    filename: Optional[str]
+
+
+def _too_large(max_size: int, detail: Optional[str]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=detail or f"File too large. Maximum size is {max_size // (1024 * 1024)}MB"
+    )
+
+
+async def ingest_upload(
+    upload: UploadFile,
+    max_size: int,
+    allowed_types: Optional[Iterable[str]] = None,
+    too_large_detail: Optional[str] = None,
+) -> IngestedUpload:
+    """
+    Validate an upload chunk by chunk: the size limit is enforced while
+    reading and the type is sniffed from the first chunk, so no more than
+    one chunk of the file is held in memory. Raises 400 when the file is
+    too large, empty or not one of `allowed_types`.
+    """
+    # Starlette records the part size while parsing; reject before reading
+    if upload.size is not None and upload.size > max_size:
+        raise _too_large(max_size, too_large_detail)
+
+    chunk_size = settings.UPLOAD_READ_CHUNK_SIZE
+    await upload.seek(0)
+    head = await upload.read(chunk_size)
+    if not head:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file")
+
+    sniffed = sniff_mime(head)
+    if allowed_types is not None:
+        allowed = {normalize_mime(t) for t in allowed_types}
+        if sniffed is None or sniffed not in allowed:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported file content: {sniffed or upload.content_type or 'unknown'}"
+            )
+
+    size = len(head)
+    while size <= max_size:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+    if size > max_size:
+        raise _too_large(max_size, too_large_detail)
+
+    await upload.seek(0)
+    # Keep the client's more specific type when it agrees with the content
+    declared = upload.content_type
+    mime_type = declared if declared and normalize_mime(declared) == sniffed else (sniffed or declared or "application/octet-stream")
+    return IngestedUpload(file=upload.file, size=size, mime_type=mime_type, filename=upload.filename)
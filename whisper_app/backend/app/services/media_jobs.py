@@ -0,0 +1,163 @@
+# app/services/media_jobs.py
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.core.cloudinary import extract_public_id_from_url, generate_video_derivatives, generate_video_thumbnail
+from app.core.config import settings
+from app.core.database import async_session_scope
+from app.core.storage import storage
+from app.crud.media_job import (
+    VIDEO_DERIVATIVES,
+    attach_video_thumbnail,
+    claim_job,
+    finish_job,
+    get_renditions,
+    has_open_jobs,
+    retry_job,
+)
+from app.models.media_job import MediaJobStatus
+from app.services.feed_broadcast_service import FeedBroadcastService
+
+logger = logging.getLogger(__name__)
+
+
+class MediaJobQueue:
+    """
+    Local worker pool for the media_jobs table. Each worker claims one due
+    job at a time (rows are shared by every process, see claim_statement),
+    runs it and records the outcome. Failed jobs are retried with backoff
+    up to MEDIA_JOB_MAX_ATTEMPTS times. When the last job of a diary
+    finishes, its audience gets a diary_media_ready event.
+    """
+
+    def __init__(self, workers: int, poll_interval: float, max_attempts: int, stale_after: float) -> None:
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+        self.handlers: Dict[str, Callable[[object], Awaitable[dict]]] = {
+            VIDEO_DERIVATIVES: self._video_derivatives,
+        }
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    async def start(self) -> None:
+        if not self.enabled or self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        """Run newly committed jobs now instead of at the next poll. Safe from any thread."""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _work(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                async with async_session_scope("media_jobs") as db:
+                    job = await claim_job(db, self.stale_after)
+            except Exception:
+                logger.exception("Media job claim failed")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except Exception:
+                # The job stays running and is reclaimed once stale
+                logger.exception("Media job %s (%s) could not be recorded", job.id, job.kind)
+
+    async def _run(self, job) -> None:
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown media job kind: {job.kind}")
+            result = await handler(job)
+        except Exception as e:
+            await self._failed(job, e)
+            return
+
+        async with async_session_scope("media_jobs") as db:
+            await finish_job(db, job.id, MediaJobStatus.done, result=result)
+        self.completed += 1
+        await self._diary_ready(job.diary_id)
+
+    async def _failed(self, job, error: Exception) -> None:
+        logger.warning("Media job %s (%s) attempt %s failed: %s", job.id, job.kind, job.attempts, error)
+        if job.attempts < self.max_attempts:
+            async with async_session_scope("media_jobs") as db:
+                await retry_job(db, job.id, self.poll_interval * 2 ** job.attempts, str(error))
+            self.retried += 1
+            return
+
+        async with async_session_scope("media_jobs") as db:
+            if job.kind == VIDEO_DERIVATIVES:
+                # Fall back to a thumbnail Cloudinary renders on first request
+                await attach_video_thumbnail(
+                    db, job.diary_id, job.payload["index"], job.payload["video_url"],
+                    generate_video_thumbnail(job.payload["video_url"])
+                )
+            await finish_job(db, job.id, MediaJobStatus.failed, error=str(error))
+        self.failed += 1
+        await self._diary_ready(job.diary_id)
+
+    async def _video_derivatives(self, job) -> dict:
+        index = job.payload["index"]
+        video_url = job.payload["video_url"]
+        public_id = extract_public_id_from_url(video_url)
+        if not public_id:
+            raise ValueError(f"Not a Cloudinary video: {video_url}")
+
+        derivatives = await storage.call("video_derivatives", generate_video_derivatives, public_id)
+        thumbnail_url = derivatives["thumbnail_url"] or generate_video_thumbnail(video_url)
+        async with async_session_scope("media_jobs") as db:
+            await attach_video_thumbnail(db, job.diary_id, index, video_url, thumbnail_url)
+        return {"index": index, "thumbnail_url": thumbnail_url, "renditions": derivatives["renditions"]}
+
+    async def _diary_ready(self, diary_id: int) -> None:
+        async with async_session_scope("media_jobs") as db:
+            if await has_open_jobs(db, diary_id):
+                return
+            renditions = await get_renditions(db, diary_id)
+        await FeedBroadcastService.broadcast_diary_media_ready(diary_id, renditions)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+media_job_queue = MediaJobQueue(
+    settings.MEDIA_JOB_WORKERS,
+    settings.MEDIA_JOB_POLL_INTERVAL,
+    settings.MEDIA_JOB_MAX_ATTEMPTS,
+    settings.MEDIA_JOB_STALE_AFTER,
+)
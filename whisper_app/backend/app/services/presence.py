@@ -0,0 +1,142 @@
+# app/services/presence.py
+from __future__ import annotations
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, cast, column, func, update, values
+
+from app.core.config import settings
+from app.models.user import User
+
+
+def _later(a: Optional[datetime], b: Optional[datetime]) -> Optional[datetime]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+class PresenceBuffer:
+    """
+    Coalesces presence writes (online/offline flips and last-activity
+    touches) per user in memory and writes them every
+    PRESENCE_FLUSH_INTERVAL seconds with one UPDATE ... FROM (VALUES ...),
+    instead of a session and a commit per frame or heartbeat.
+    """
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        self.interval = interval if interval is not None else settings.PRESENCE_FLUSH_INTERVAL
+        self.pending: Dict[int, dict] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def touch(self, user_id: int, at: Optional[datetime] = None) -> None:
+        self._merge(user_id, None, at or datetime.now(timezone.utc), None)
+
+    def mark_online(self, user_id: int) -> None:
+        self._merge(user_id, True, datetime.now(timezone.utc), None)
+
+    def mark_offline(self, user_id: int) -> None:
+        now = datetime.now(timezone.utc)
+        self._merge(user_id, False, now, now)
+
+    def _merge(self, user_id: int, is_online: Optional[bool], activity: datetime, last_seen: Optional[datetime]) -> None:
+        entry = self.pending.setdefault(user_id, {"is_online": None, "last_activity": None, "last_seen": None})
+        if is_online is not None:
+            entry["is_online"] = is_online
+        entry["last_activity"] = _later(entry["last_activity"], activity)
+        entry["last_seen"] = _later(entry["last_seen"], last_seen)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            return
+        try:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+        except RuntimeError:
+            # No loop (sync caller outside the server); the next async write schedules it
+            self._flusher = None
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    def overlay(self, user_id: int, status: dict) -> dict:
+        """Apply writes that are still buffered to a status read from the users row."""
+        entry = self.pending.get(user_id)
+        if not entry:
+            return status
+        if entry["is_online"] is not None:
+            status["is_online"] = entry["is_online"]
+        status["last_activity"] = _later(status.get("last_activity"), entry["last_activity"])
+        status["last_seen"] = _later(status.get("last_seen"), entry["last_seen"])
+        return status
+
+    async def flush(self) -> int:
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, {}
+        try:
+            from app.core.database import async_session_scope
+
+            async with async_session_scope("presence") as db:
+                await db.execute(self.flush_statement(batch))
+            self.flushes += 1
+            self.rows_written += len(batch)
+            return len(batch)
+        except Exception as e:
+            print(f"[Presence] Flush of {len(batch)} users failed: {e}")
+            # Keep the data for the next attempt unless newer writes superseded it
+            for user_id, entry in batch.items():
+                newer = self.pending.get(user_id)
+                if newer is None:
+                    self.pending[user_id] = entry
+                else:
+                    if newer["is_online"] is None:
+                        newer["is_online"] = entry["is_online"]
+                    newer["last_activity"] = _later(newer["last_activity"], entry["last_activity"])
+                    newer["last_seen"] = _later(newer["last_seen"], entry["last_seen"])
+            self._schedule()
+            return 0
+
+    @staticmethod
+    def flush_statement(batch: Dict[int, dict]):
+        rows: List[tuple] = [
+            (user_id, entry["is_online"], entry["last_activity"], entry["last_seen"])
+            for user_id, entry in batch.items()
+        ]
+        changes = values(
+            column("user_id", Integer),
+            column("is_online", Boolean),
+            column("last_activity", DateTime(timezone=True)),
+            column("last_seen", DateTime(timezone=True)),
+            name="presence"
+        ).data(rows)
+
+        is_online = cast(changes.c.is_online, Boolean)
+        last_activity = cast(changes.c.last_activity, DateTime(timezone=True))
+        last_seen = cast(changes.c.last_seen, DateTime(timezone=True))
+        return (
+            update(User)
+            .where(User.id == changes.c.user_id)
+            .values(
+                is_online=func.coalesce(is_online, User.is_online),
+                # GREATEST skips NULLs, so a never-set column takes the new value
+                last_activity=func.greatest(User.last_activity, last_activity),
+                last_seen=func.coalesce(last_seen, User.last_seen),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+
+presence_buffer = PresenceBuffer()
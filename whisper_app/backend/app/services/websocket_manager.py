@@ -1,36 +1,30 @@
 from __future__ import annotations
-from typing import Dict, List, Set, Optional
-from fastapi import WebSocket
-from datetime import datetime, timezone
-import asyncio
-
-from typing import Dict, Set, Optional
+from typing import Dict, Iterable, List, Set, Optional, Union
 from datetime import datetime, timezone
 import asyncio
 from fastapi import WebSocket
+from app.services.ws_backplane import Backplane, BackplaneMixin
+from app.services.ws_outbound import OutboundQueue, encode_frame
+from app.services.presence import presence_buffer
+from app.services.ws_topics import TopicRegistry
+
+FEED_ROOM_PREFIX = "feed_"
 
-class WebSocketManager:
-    def __init__(self) -> None:
+class WebSocketManager(BackplaneMixin):
+    namespace = "chat"
+
+    def __init__(self, backplane: Optional[Backplane] = None) -> None:
         self.active_connections: Dict[str, Dict[WebSocket, dict]] = {}
         self.online_users: Dict[str, Set[int]] = {}
         self.user_chats: Dict[int, Set[str]] = {}
         self.last_activity: Dict[int, datetime] = {}
         self.active_calls: Dict[str, dict] = {}
-
-    async def _update_user_online_status_db(self, user_id: int, is_online: bool):
-        try:
-            from app.core.database import SessionLocal
-            from app.crud.chat import update_user_online_status
-            
-            db = SessionLocal()
-            try:
-                update_user_online_status(db, user_id, is_online)
-            finally:
-                db.close()
-        except ImportError:
-            pass
-        except Exception as e:
-            print(f"Error updating user online status in DB: {e}")
+        self.outbound: Dict[WebSocket, OutboundQueue] = {}
+        # Users with a feed_{id} socket on this worker, so audience fan-out
+        # can intersect with who is actually connected
+        self.feed_users: Set[int] = set()
+        self.topics = TopicRegistry()
+        self._init_backplane(backplane)
 
     async def connect(self, chat_id: str, websocket: WebSocket, user_id: int) -> None:
         if chat_id not in self.active_connections:
@@ -39,14 +33,21 @@ class WebSocketManager:
             "user_id": user_id,
             "connected_at": datetime.now(timezone.utc)
         }
+        self.outbound[websocket] = OutboundQueue(
+            websocket,
+            on_evict=lambda ws: self.disconnect(chat_id, ws)
+        )
         if chat_id not in self.online_users:
             self.online_users[chat_id] = set()
         self.online_users[chat_id].add(user_id)
+        if chat_id.startswith(FEED_ROOM_PREFIX):
+            self.feed_users.add(user_id)
         if user_id not in self.user_chats:
             self.user_chats[user_id] = set()
         self.user_chats[user_id].add(chat_id)
         self.last_activity[user_id] = datetime.now(timezone.utc)
-        await self._update_user_online_status_db(user_id, True)
+        self._publish_presence(chat_id)
+        presence_buffer.mark_online(user_id)
         await self.broadcast(chat_id, {
             "type": "user_online",
             "user_id": user_id,
@@ -54,7 +55,7 @@ class WebSocketManager:
         }, exclude={websocket})
         await websocket.send_json({
             "type": "online_users",
-            "user_ids": list(self.online_users[chat_id]),
+            "user_ids": list(self.get_online_users(chat_id)),
             "timestamp": datetime.now(timezone.utc).isoformat()
         })
 
@@ -64,12 +65,19 @@ class WebSocketManager:
                 user_info = self.active_connections[chat_id][websocket]
                 user_id = user_info["user_id"]
             del self.active_connections[chat_id][websocket]
+            outbound = self.outbound.pop(websocket, None)
+            if outbound:
+                outbound.close()
+            self.topics.drop(websocket)
             if not self.active_connections[chat_id]:
                 del self.active_connections[chat_id]
             if chat_id in self.online_users:
                 self.online_users[chat_id].discard(user_id)
                 if not self.online_users[chat_id]:
                     del self.online_users[chat_id]
+            if chat_id.startswith(FEED_ROOM_PREFIX) and chat_id not in self.online_users:
+                self.feed_users.discard(user_id)
+            self._publish_presence(chat_id)
             if user_id in self.user_chats:
                 self.user_chats[user_id].discard(chat_id)
                 if not self.user_chats[user_id]:
@@ -77,9 +85,9 @@ class WebSocketManager:
 
     async def _handle_user_offline(self, user_id: int):
         await asyncio.sleep(3)
-        if user_id in self.user_chats and self.user_chats[user_id]:
+        if self.is_user_online(user_id):
             return
-        await self._update_user_online_status_db(user_id, False)
+        presence_buffer.mark_offline(user_id)
         await self._broadcast_user_offline(user_id)
         self.last_activity.pop(user_id, None)
         self.user_chats.pop(user_id, None)
@@ -96,7 +104,11 @@ class WebSocketManager:
             })
 
     async def broadcast(self, chat_id: str, message: dict, exclude: Set[WebSocket] = None) -> None:
+        frame = encode_frame(message)
+        await self._broadcast_local(chat_id, frame, exclude)
+        await self._publish("broadcast", chat_id=chat_id, frame=frame)
 
+    async def _broadcast_local(self, chat_id: str, frame: str, exclude: Set[WebSocket] = None) -> None:
         if chat_id not in self.active_connections:
             return
 
@@ -106,24 +118,26 @@ class WebSocketManager:
         for websocket in list(self.active_connections[chat_id].keys()):
             if websocket in exclude:
                 continue
-            try:
-                await websocket.send_json(message)
-            except Exception:
+            if not self._enqueue(websocket, frame):
                 dead_connections.add(websocket)
 
         for websocket in dead_connections:
             self.disconnect(chat_id, websocket)
 
     async def send_to_user(self, chat_id: str, user_id: int, message: dict) -> bool:
+        frame = encode_frame(message)
+        sent = await self._send_to_user_local(chat_id, user_id, frame)
+        await self._publish("send_to_user", chat_id=chat_id, user_id=user_id, frame=frame)
+        return sent or user_id in self._remote_online_users(chat_id)
+
+    async def _send_to_user_local(self, chat_id: str, user_id: int, frame: str) -> bool:
         if chat_id not in self.active_connections:
             print(f"[WS] chat_id {chat_id} not found")
             return False
 
         sent = False
-        for websocket, info in self.active_connections[chat_id].items():
-            print(f"[WS] checking user {info['user_id']}")
-            if info["user_id"] == user_id:
-                await websocket.send_json(message)
+        for websocket, info in list(self.active_connections[chat_id].items()):
+            if info["user_id"] == user_id and self._enqueue(websocket, frame):
                 sent = True
 
         if not sent:
@@ -132,31 +146,38 @@ class WebSocketManager:
         return sent
 
     def get_online_users(self, chat_id: str) -> Set[int]:
-        return self.online_users.get(chat_id, set())
+        if chat_id not in self.remote_online:
+            return self.online_users.get(chat_id, set())
+        return self.online_users.get(chat_id, set()) | self._remote_online_users(chat_id)
+
+    def online_feed_users(self) -> Set[int]:
+        """Users with a feed socket on any worker"""
+        users = set(self.feed_users)
+        for chat_id in self.remote_online:
+            if chat_id.startswith(FEED_ROOM_PREFIX):
+                users |= self._remote_online_users(chat_id)
+        return users
+
+    def online_feed_rooms(self, user_ids: Iterable[int]) -> List[str]:
+        """feed_{id} rooms of the given users that currently have a socket"""
+        online = self.online_feed_users()
+        return [f"{FEED_ROOM_PREFIX}{user_id}" for user_id in set(user_ids) if user_id in online]
 
     def is_user_online(self, user_id: int) -> bool:
-        return user_id in self.user_chats and bool(self.user_chats[user_id])
+        if user_id in self.user_chats and bool(self.user_chats[user_id]):
+            return True
+        return bool(self._remote_user_chats(user_id))
 
     def get_user_chats(self, user_id: int) -> Set[str]:
-        return self.user_chats.get(user_id, set())
+        if not self.remote_online:
+            return self.user_chats.get(user_id, set())
+        return self.user_chats.get(user_id, set()) | self._remote_user_chats(user_id)
 
     async def update_user_activity(self, user_id: int):
-        self.last_activity[user_id] = datetime.now(timezone.utc)
-        try:
-            from app.core.database import SessionLocal
-            from app.models.user import User
-            db = SessionLocal()
-            try:
-                user = db.query(User).filter(User.id == user_id).first()
-                if user:
-                    user.last_activity = datetime.now(timezone.utc)
-                    db.commit()
-            except:
-                db.rollback()
-            finally:
-                db.close()
-        except:
-            pass
+        """Record activity in memory; the users row catches up on the next presence flush"""
+        now = datetime.now(timezone.utc)
+        self.last_activity[user_id] = now
+        presence_buffer.touch(user_id, now)
 
     def get_user_last_activity(self, user_id: int) -> Optional[datetime]:
         return self.last_activity.get(user_id)
@@ -167,21 +188,9 @@ class WebSocketManager:
             sockets_to_disconnect = [ws for ws, info in self.active_connections.get(chat_id, {}).items() if info["user_id"] == user_id]
             for websocket in sockets_to_disconnect:
                 self.disconnect(chat_id, websocket, user_id)
-        await self._update_user_online_status_db(user_id, False)
+        presence_buffer.mark_offline(user_id)
         await self._broadcast_user_offline(user_id)
 
-    async def get_user_online_status_from_db(self, user_id: int) -> Optional[dict]:
-        try:
-            from app.core.database import SessionLocal
-            from app.crud.chat import get_user_online_status
-            db = SessionLocal()
-            try:
-                return get_user_online_status(db, user_id)
-            finally:
-                db.close()
-        except:
-            return None
-
     def get_connection_stats(self) -> dict:
         total_connections = sum(len(connections) for connections in self.active_connections.values())
         total_online_users = len(self.user_chats)
@@ -190,6 +199,11 @@ class WebSocketManager:
             "total_connections": total_connections,
             "total_online_users": total_online_users,
             "total_active_chats": total_active_chats,
+            "online_feed_users": len(self.feed_users),
+            "topics": self.topics.stats(),
+            "presence": presence_buffer.stats(),
+            "outbound_backlog": sum(queue.backlog for queue in self.outbound.values()),
+            "outbound_dropped": sum(queue.dropped for queue in self.outbound.values()),
             "online_users_per_chat": {chat_id: len(users) for chat_id, users in self.online_users.items()}
         }
 
@@ -211,27 +225,93 @@ class WebSocketManager:
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
-    async def broadcast_to_user(self, user_room: str, data: dict):
-        if user_room in self.active_connections:
-            for websocket in self.active_connections[user_room].keys():
-                try:
-                    await websocket.send_json(data)
-                except:
-                    pass
+    async def broadcast_to_user(self, user_room: str, data: Union[dict, str]):
+        await self.broadcast_to_rooms([user_room], data)
+
+    async def broadcast_to_rooms(self, user_rooms: Iterable[str], data: Union[dict, str]):
+        """Encode `data` once and deliver the same frame to every room"""
+        frame = encode_frame(data)
+        user_rooms = list(user_rooms)
+        self._broadcast_to_rooms_local(user_rooms, frame)
+        await self._publish("broadcast_to_rooms", rooms=user_rooms, frame=frame)
+
+    def _broadcast_to_rooms_local(self, user_rooms: Iterable[str], frame: str):
+        for user_room in user_rooms:
+            for websocket in list(self.active_connections.get(user_room, {}).keys()):
+                self._enqueue(websocket, frame)
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        return self.topics.subscribe(websocket, topics)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> None:
+        self.topics.unsubscribe(websocket, topics)
+
+    async def publish_topic(self, topic: str, data: Union[dict, str], rooms: Iterable[str] = ()) -> None:
+        """
+        Deliver one encoded frame to every socket subscribed to `topic` on
+        any worker, and to the sockets of `rooms`. A socket in both gets the
+        frame once.
+        """
+        frame = encode_frame(data)
+        rooms = list(rooms)
+        self._publish_topic_local(topic, frame, rooms)
+        await self._publish("topic", topic=topic, frame=frame, rooms=rooms)
+
+    def _publish_topic_local(self, topic: str, frame: str, rooms: Iterable[str] = ()) -> None:
+        targets = set(self.topics.sockets(topic))
+        for user_room in rooms:
+            targets.update(self.active_connections.get(user_room, {}).keys())
+        for websocket in targets:
+            self._enqueue(websocket, frame)
+
+    def _enqueue(self, websocket: WebSocket, frame: str) -> bool:
+        outbound = self.outbound.get(websocket)
+        if outbound is None:
+            return False
+        return outbound.put(frame)
+
+    def start_call(self, chat_id: str, call: dict) -> None:
+        self.active_calls[chat_id] = call
+        self._publish_nowait(
+            "call_set",
+            chat_id=chat_id,
+            call={key: value for key, value in call.items() if key != "timeout_task"}
+        )
+
+    def _drop_call(self, chat_id: str) -> Optional[dict]:
+        call = self.active_calls.pop(chat_id, None)
+        if call:
+            timeout_task = call.get("timeout_task")
+            if timeout_task and not timeout_task.done():
+                timeout_task.cancel()
+        return call
+
+    async def _handle_remote(self, op: str, envelope: dict) -> None:
+        chat_id = envelope.get("chat_id")
+        if op == "broadcast_to_rooms":
+            self._broadcast_to_rooms_local(envelope["rooms"], envelope["frame"])
+        elif op == "topic":
+            self._publish_topic_local(envelope["topic"], envelope["frame"], envelope.get("rooms", ()))
+        elif op == "call_set":
+            self._drop_call(chat_id)
+            self.active_calls[chat_id] = envelope["call"]
+        elif op == "call_end":
+            self._drop_call(chat_id)
 
     async def _end_call(self, chat_id: str, reason: str, ended_by: Optional[int] = None):
         call = self.active_calls.get(chat_id)
         if not call:
             return
         timeout_task = call.get("timeout_task")
-        if timeout_task and not timeout_task.done():
+        if timeout_task and not timeout_task.done() and timeout_task is not asyncio.current_task():
             timeout_task.cancel()
         await self.broadcast(chat_id, {
             "type": "call_ended",
             "reason": reason,
             "ended_by": ended_by
         })
-        del self.active_calls[chat_id]
+        self.active_calls.pop(chat_id, None)
+        await self._publish("call_end", chat_id=chat_id)
 
     async def _auto_cancel_call(self, chat_id: str):
         await asyncio.sleep(30)
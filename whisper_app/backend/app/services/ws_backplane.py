@@ -0,0 +1,324 @@
+# app/services/ws_backplane.py
+from __future__ import annotations
+import asyncio
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+# Delivered locally (never published) when envelopes may have been lost
+RESYNC = {"op": "resync"}
+
+
+class Backplane(ABC):
+    """
+    Pub/sub channel shared by every worker. Managers publish envelopes
+    (plain dicts) and every subscribed worker receives them, including the
+    publisher, which is expected to skip its own envelopes. A backplane
+    that had to reconnect hands RESYNC to its handlers.
+    """
+
+    @abstractmethod
+    async def subscribe(self, handler: Handler) -> None:
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, handler: Handler) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, envelope: dict) -> None:
+        ...
+
+
+class InMemoryBackplane(Backplane):
+    """
+    Process-local backplane. With a single worker it is effectively a no-op;
+    several managers sharing one instance behave like separate workers.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: List[Handler] = []
+
+    async def subscribe(self, handler: Handler) -> None:
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+
+    async def unsubscribe(self, handler: Handler) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    async def publish(self, envelope: dict) -> None:
+        for handler in list(self._handlers):
+            try:
+                await handler(envelope)
+            except Exception as e:
+                print(f"[Backplane] Handler error: {e}")
+
+
+class RedisBackplane(Backplane):
+    """
+    Backplane on top of Redis PUBLISH/SUBSCRIBE. `client` can be any object
+    with the redis.asyncio surface used here (publish, pubsub().subscribe,
+    pubsub().listen), so a local stand-in works for testing.
+
+    When the subscription drops, the listener reconnects with exponential
+    backoff (capped at `max_backoff` seconds), resubscribes and then hands
+    RESYNC to the handlers.
+    """
+
+    def __init__(self, url: Optional[str] = None, channel: str = "whisper:ws", client=None,
+                 backoff: float = 0.5, max_backoff: float = 30.0) -> None:
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("RedisBackplane requires the 'redis' package") from e
+            if not url:
+                raise RuntimeError("RedisBackplane requires REDIS_URL")
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.channel = channel
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+        self._handlers: List[Handler] = []
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def subscribe(self, handler: Handler) -> None:
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+        if self._listener is None:
+            self._pubsub = self.client.pubsub()
+            await self._pubsub.subscribe(self.channel)
+            self._listener = asyncio.create_task(self._listen())
+
+    async def unsubscribe(self, handler: Handler) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+        if not self._handlers and self._listener:
+            self._listener.cancel()
+            self._listener = None
+            try:
+                await self._pubsub.unsubscribe(self.channel)
+            except Exception:
+                pass
+            self._pubsub = None
+
+    async def publish(self, envelope: dict) -> None:
+        await self.client.publish(self.channel, json.dumps(envelope, default=str))
+
+    async def _listen(self) -> None:
+        delay = self.backoff
+        while True:
+            try:
+                async for item in self._pubsub.listen():
+                    delay = self.backoff
+                    if item.get("type") != "message":
+                        continue
+                    data = item.get("data")
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    try:
+                        envelope = json.loads(data)
+                    except (TypeError, json.JSONDecodeError):
+                        continue
+                    await self._dispatch(envelope)
+                print("[Backplane] Subscription ended, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Backplane] Subscription lost ({e}), reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+            await self._resubscribe()
+
+    async def _resubscribe(self) -> None:
+        try:
+            await self._pubsub.close()
+        except Exception:
+            pass
+        try:
+            self._pubsub = self.client.pubsub()
+            await self._pubsub.subscribe(self.channel)
+        except Exception as e:
+            print(f"[Backplane] Resubscribe failed: {e}")
+            return
+        self.reconnects += 1
+        await self._dispatch(dict(RESYNC))
+
+    async def _dispatch(self, envelope: dict) -> None:
+        for handler in list(self._handlers):
+            try:
+                await handler(envelope)
+            except Exception as e:
+                print(f"[Backplane] Handler error: {e}")
+
+
+def create_backplane() -> Backplane:
+    if settings.WS_BACKPLANE == "redis":
+        return RedisBackplane(url=settings.REDIS_URL)
+    return InMemoryBackplane()
+
+
+backplane = create_backplane()
+
+
+class BackplaneMixin:
+    """
+    Shared fan-out for the WebSocket managers. Each worker delivers to its
+    own sockets and forwards broadcast/send_to_user to the other workers.
+    Presence is replicated as one user-id set per (chat, worker), so a user
+    with sockets on two workers stays online until both are gone. Workers
+    send heartbeats; a worker silent for WS_NODE_TTL seconds is treated as
+    gone even if it never sent node_down.
+
+    Payloads cross the backplane as already-encoded text frames, so a
+    receiving worker never re-serializes them.
+
+    Subclasses implement _broadcast_local / _send_to_user_local and may
+    handle extra ops (call state) in _handle_remote.
+    """
+
+    namespace = "ws"
+
+    def _init_backplane(self, bus: Optional[Backplane] = None) -> None:
+        self.node_id = uuid.uuid4().hex
+        self.backplane = bus or backplane
+        self.remote_online: Dict[str, Dict[str, Set[int]]] = {}
+        self.node_seen: Dict[str, float] = {}
+        self._backplane_ready = False
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def start_backplane(self) -> None:
+        if self._backplane_ready:
+            return
+        await self.backplane.subscribe(self._on_backplane_message)
+        self._backplane_ready = True
+        await self._publish("presence_sync")
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop_backplane(self) -> None:
+        if not self._backplane_ready:
+            return
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        await self._publish("node_down")
+        await self.backplane.unsubscribe(self._on_backplane_message)
+        self._backplane_ready = False
+
+    async def _publish(self, op: str, **fields) -> None:
+        if not self._backplane_ready:
+            return
+        try:
+            await self.backplane.publish({
+                "ns": self.namespace,
+                "origin": self.node_id,
+                "op": op,
+                **fields
+            })
+        except Exception as e:
+            print(f"[Backplane] Publish failed ({op}): {e}")
+
+    def _publish_nowait(self, op: str, **fields) -> None:
+        if not self._backplane_ready:
+            return
+        try:
+            asyncio.get_running_loop().create_task(self._publish(op, **fields))
+        except RuntimeError:
+            pass
+
+    def _publish_presence(self, chat_id: str) -> None:
+        self._publish_nowait(
+            "presence",
+            chat_id=chat_id,
+            user_ids=list(self.online_users.get(chat_id, set()))
+        )
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_NODE_HEARTBEAT_INTERVAL)
+            await self._publish("heartbeat")
+            self._expire_nodes()
+
+    def _expire_nodes(self) -> None:
+        deadline = time.monotonic() - settings.WS_NODE_TTL
+        for origin in [origin for origin, seen in self.node_seen.items() if seen < deadline]:
+            print(f"[Backplane] Node {origin} timed out")
+            self._forget_node(origin)
+
+    def _forget_node(self, origin: str) -> None:
+        self.node_seen.pop(origin, None)
+        for chat_id in list(self.remote_online.keys()):
+            self.remote_online[chat_id].pop(origin, None)
+            if not self.remote_online[chat_id]:
+                del self.remote_online[chat_id]
+
+    def _remote_online_users(self, chat_id: str) -> Set[int]:
+        users: Set[int] = set()
+        for node_users in self.remote_online.get(chat_id, {}).values():
+            users |= node_users
+        return users
+
+    def _remote_user_chats(self, user_id: int) -> Set[str]:
+        return {
+            chat_id for chat_id, nodes in self.remote_online.items()
+            if any(user_id in users for users in nodes.values())
+        }
+
+    async def _on_backplane_message(self, envelope: dict) -> None:
+        if envelope == RESYNC:
+            # Updates may have been missed while disconnected: rebuild remote presence
+            self.remote_online.clear()
+            self.node_seen.clear()
+            await self._publish("presence_sync")
+            for local_chat_id in list(self.online_users.keys()):
+                self._publish_presence(local_chat_id)
+            return
+
+        if envelope.get("ns") != self.namespace or envelope.get("origin") == self.node_id:
+            return
+
+        op = envelope.get("op")
+        origin = envelope.get("origin")
+        chat_id = envelope.get("chat_id")
+
+        if op == "node_down":
+            self._forget_node(origin)
+            return
+        known = origin in self.node_seen
+        self.node_seen[origin] = time.monotonic()
+
+        if op == "heartbeat":
+            if not known:
+                # A node we timed out (or never heard from) is back; its presence is gone here
+                await self._publish("presence_sync")
+        elif op == "broadcast":
+            await self._broadcast_local(chat_id, envelope["frame"])
+        elif op == "send_to_user":
+            await self._send_to_user_local(chat_id, envelope["user_id"], envelope["frame"])
+        elif op == "presence":
+            nodes = self.remote_online.setdefault(chat_id, {})
+            user_ids = set(envelope.get("user_ids") or [])
+            if user_ids:
+                nodes[origin] = user_ids
+            else:
+                nodes.pop(origin, None)
+                if not nodes:
+                    del self.remote_online[chat_id]
+        elif op == "presence_sync":
+            for local_chat_id in list(self.online_users.keys()):
+                self._publish_presence(local_chat_id)
+        else:
+            await self._handle_remote(op, envelope)
+
+    async def _handle_remote(self, op: str, envelope: dict) -> None:
+        pass
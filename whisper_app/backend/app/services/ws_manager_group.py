@@ -1,22 +1,37 @@
 from __future__ import annotations
-from typing import Dict, Set
+from typing import Dict, Optional, Set
 from fastapi import WebSocket
 import asyncio
 from datetime import datetime
+from app.core.config import settings
 from app.models.group_message import GroupMessage
 from app.helpers.to_utc_iso import to_local_iso
+from app.services.ws_backplane import Backplane, BackplaneMixin
+from app.services.ws_outbound import OutboundQueue, encode_frame
 
-class WebSocketManager:
-    def __init__(self) -> None:
+class WebSocketManager(BackplaneMixin):
+    namespace = "group"
+
+    def __init__(self, backplane: Optional[Backplane] = None) -> None:
         self.active_connections: Dict[str, Dict[WebSocket, dict]] = {}
         self.online_users: Dict[str, Set[int]] = {}
         self.group_call_accepts: Dict[str, Set[int]] = {}
         self.group_call_sessions: Dict[str, dict] = {}
         self.call_timers: Dict[str, asyncio.Task] = {}
+        self.outbound: Dict[WebSocket, OutboundQueue] = {}
+        # chat_id -> user_id -> newest seen mark not broadcast yet
+        self.pending_seen: Dict[str, Dict[int, dict]] = {}
+        self.seen_flushers: Dict[str, asyncio.Task] = {}
+        self._init_backplane(backplane)
 
     async def connect(self, chat_id: str, websocket: WebSocket, user_id: int) -> None:
         self.active_connections.setdefault(chat_id, {})[websocket] = {"user_id": user_id}
+        self.outbound[websocket] = OutboundQueue(
+            websocket,
+            on_evict=lambda ws: self.disconnect(chat_id, ws, None)
+        )
         self.online_users.setdefault(chat_id, set()).add(user_id)
+        self._publish_presence(chat_id)
         
         await self.broadcast(chat_id, {
             "action": "user_online",
@@ -25,13 +40,16 @@ class WebSocketManager:
         
         await websocket.send_json({
             "action": "online_users",
-            "user_ids": list(self.online_users[chat_id])
+            "user_ids": list(self.get_online_users(chat_id))
         })
 
     def disconnect(self, chat_id: str, websocket: WebSocket, user_id: int) -> None:
         if chat_id in self.active_connections and websocket in self.active_connections[chat_id]:
             info = self.active_connections[chat_id].pop(websocket)
             user_id = user_id or info["user_id"]
+            outbound = self.outbound.pop(websocket, None)
+            if outbound:
+                outbound.close()
             
             if not self.active_connections[chat_id]:
                 del self.active_connections[chat_id]
@@ -40,6 +58,7 @@ class WebSocketManager:
                 self.online_users[chat_id].discard(user_id)
                 if not self.online_users[chat_id]:
                     del self.online_users[chat_id]
+        self._publish_presence(chat_id)
                     
         self.remove_user_accepted(chat_id, user_id)
                     
@@ -54,6 +73,11 @@ class WebSocketManager:
             print(f"[Disconnect Broadcast Error] {e}")
 
     async def broadcast(self, chat_id: str, message: dict, exclude: Set[WebSocket] = None) -> None:
+        frame = encode_frame(message)
+        await self._broadcast_local(chat_id, frame, exclude)
+        await self._publish("broadcast", chat_id=chat_id, frame=frame)
+
+    async def _broadcast_local(self, chat_id: str, frame: str, exclude: Set[WebSocket] = None) -> None:
         if chat_id not in self.active_connections:
             return
         exclude = exclude or set()
@@ -61,9 +85,7 @@ class WebSocketManager:
         for ws in list(self.active_connections[chat_id].keys()):
             if ws in exclude:
                 continue
-            try:
-                await ws.send_json(message)
-            except Exception:
+            if not self._enqueue(ws, frame):
                 dead.add(ws)
 
         for ws in dead:
@@ -71,33 +93,94 @@ class WebSocketManager:
             self.disconnect(chat_id, ws, user_id)
             
     async def send_to_user(self, chat_id: str, user_id: int, message: dict, exclude: Set[WebSocket] = None) -> None:
+        frame = encode_frame(message)
+        await self._send_to_user_local(chat_id, user_id, frame, exclude)
+        await self._publish("send_to_user", chat_id=chat_id, user_id=user_id, frame=frame)
+
+    async def _send_to_user_local(self, chat_id: str, user_id: int, frame: str, exclude: Set[WebSocket] = None) -> None:
         if chat_id not in self.active_connections:
             return
 
         exclude = exclude or set()
 
-        for ws, info in self.active_connections[chat_id].items():
+        for ws, info in list(self.active_connections[chat_id].items()):
             if ws in exclude:
                 continue
-            if info["user_id"] == user_id:
-                try:
-                    await ws.send_json(message)
-                except:
-                    self.disconnect(chat_id, ws, user_id)
+            if info["user_id"] == user_id and not self._enqueue(ws, frame):
+                self.disconnect(chat_id, ws, user_id)
+
+    def queue_seen(self, chat_id: str, user_id: int, message_id: int, seen_at: str) -> None:
+        """
+        Coalesce seen marks: within one debounce window a group gets a single
+        "seen_up_to" frame carrying each member's newest mark.
+        """
+        pending = self.pending_seen.setdefault(chat_id, {})
+        current = pending.get(user_id)
+        if current is None or message_id > current["message_id"]:
+            pending[user_id] = {"user_id": user_id, "message_id": message_id, "seen_at": seen_at}
+        if chat_id not in self.seen_flushers:
+            self.seen_flushers[chat_id] = asyncio.create_task(self._flush_seen(chat_id))
+
+    async def _flush_seen(self, chat_id: str) -> None:
+        try:
+            await asyncio.sleep(settings.GROUP_SEEN_DEBOUNCE_MS / 1000)
+        finally:
+            self.seen_flushers.pop(chat_id, None)
+        marks = list(self.pending_seen.pop(chat_id, {}).values())
+        if marks:
+            await self.broadcast(chat_id, {
+                "action": "seen_up_to",
+                "seen": marks
+            })
+
+    def _enqueue(self, websocket: WebSocket, frame: str) -> bool:
+        outbound = self.outbound.get(websocket)
+        if outbound is None:
+            return False
+        return outbound.put(frame)
             
     def get_online_users(self, chat_id: str) -> Set[int]:
-        return self.online_users.get(chat_id, set())
+        if chat_id not in self.remote_online:
+            return self.online_users.get(chat_id, set())
+        return self.online_users.get(chat_id, set()) | self._remote_online_users(chat_id)
     
-    def mark_user_accepted(self, chat_id: str, user_id: int) -> None:
+    def mark_user_accepted(self, chat_id: str, user_id: int, publish: bool = True) -> None:
         if chat_id not in self.group_call_accepts:
             self.group_call_accepts[chat_id] = set()
         self.group_call_accepts[chat_id].add(user_id)
+        if publish:
+            self._publish_nowait("accept_add", chat_id=chat_id, user_id=user_id)
 
-    def remove_user_accepted(self, chat_id: str, user_id: int) -> None:
+    def remove_user_accepted(self, chat_id: str, user_id: int, publish: bool = True) -> None:
         if chat_id in self.group_call_accepts:
             self.group_call_accepts[chat_id].discard(user_id)
             if not self.group_call_accepts[chat_id]:
                 del self.group_call_accepts[chat_id]
+            if publish:
+                self._publish_nowait("accept_remove", chat_id=chat_id, user_id=user_id)
+
+    def set_call_session(self, chat_id: str, session: dict) -> None:
+        self.group_call_sessions[chat_id] = session
+        self._publish_nowait("call_session_set", chat_id=chat_id, session=session)
+
+    def _drop_call_state(self, chat_id: str) -> None:
+        self.group_call_accepts.pop(chat_id, None)
+        self.group_call_sessions.pop(chat_id, None)
+
+        timer = self.call_timers.pop(chat_id, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+
+    async def _handle_remote(self, op: str, envelope: dict) -> None:
+        chat_id = envelope.get("chat_id")
+        if op == "accept_add":
+            self.mark_user_accepted(chat_id, envelope["user_id"], publish=False)
+        elif op == "accept_remove":
+            self.remove_user_accepted(chat_id, envelope["user_id"], publish=False)
+        elif op == "call_session_set":
+            self.group_call_sessions[chat_id] = envelope["session"]
+        elif op == "call_session_end":
+            self._drop_call_state(chat_id)
 
     def get_total_accepted(self, chat_id: str) -> int:
         return len(self.group_call_accepts.get(chat_id, set()))
@@ -129,11 +212,7 @@ class WebSocketManager:
             "updated_at": to_local_iso(end_time, tz_offset_hours=7),
         })
 
-        self.group_call_accepts.pop(chat_id, None)
-        self.group_call_sessions.pop(chat_id, None)
-
-        timer = self.call_timers.pop(chat_id, None)
-        if timer:
-            timer.cancel()
+        self._drop_call_state(chat_id)
+        await self._publish("call_session_end", chat_id=chat_id)
 
 manager = WebSocketManager()
\ No newline at end of file
@@ -0,0 +1,116 @@
+# app/services/ws_outbound.py
+from __future__ import annotations
+import asyncio
+import json
+from typing import Callable, Optional, Union
+from fastapi import WebSocket
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DROP_NEWEST = "drop_newest"
+POLICY_EVICT = "evict"
+
+
+def encode_frame(message: Union[dict, str]) -> str:
+    """
+    Serialize a payload once into a text frame that can be sent to any
+    number of sockets. Already-encoded frames pass through unchanged.
+    """
+    if isinstance(message, str):
+        return message
+    if orjson is not None:
+        return orjson.dumps(message, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class OutboundQueue:
+    """
+    Per-socket send buffer drained by its own writer task. Broadcasts only
+    enqueue, so one slow client never delays delivery to the others.
+
+    When the buffer is full the slow-consumer policy applies: drop the
+    oldest queued frame, drop the new frame, or evict the socket. A send
+    that exceeds the timeout always evicts, since the client is stuck.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_evict: Optional[Callable[[WebSocket], None]] = None,
+        maxsize: Optional[int] = None,
+        send_timeout: Optional[float] = None,
+        policy: Optional[str] = None,
+    ) -> None:
+        self.websocket = websocket
+        self.on_evict = on_evict
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        self.policy = policy or settings.WS_SLOW_CONSUMER_POLICY
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize or settings.WS_OUTBOUND_QUEUE_SIZE)
+        self.dropped = 0
+        self.closed = False
+        self._writer = asyncio.create_task(self._drain())
+
+    def put(self, frame: str) -> bool:
+        """Enqueue an encoded frame; returns False once the socket has been evicted."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == POLICY_EVICT:
+            self.evict("outbound queue full")
+            return False
+
+        self.dropped += 1
+        if self.policy == POLICY_DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.queue.put_nowait(frame)
+        return True
+
+    @property
+    def backlog(self) -> int:
+        return self.queue.qsize()
+
+    async def _drain(self) -> None:
+        while True:
+            frame = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(frame), timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                self.evict("send timeout")
+                return
+            except Exception:
+                self.evict("send failed")
+                return
+
+    def evict(self, reason: str) -> None:
+        if self.closed:
+            return
+        print(f"[WS] Evicting slow consumer: {reason}")
+        self.close()
+        if self.on_evict:
+            self.on_evict(self.websocket)
+        asyncio.create_task(self._close_socket(reason))
+
+    async def _close_socket(self, reason: str) -> None:
+        try:
+            await self.websocket.close(code=1013, reason=reason)
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        self.closed = True
+        if not self._writer.done() and self._writer is not asyncio.current_task():
+            self._writer.cancel()
@@ -0,0 +1,78 @@
+# app/services/ws_topics.py
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+from fastapi import WebSocket
+
+from app.core.config import settings
+
+
+def diary_topic(diary_id: int) -> str:
+    return f"diary:{diary_id}"
+
+
+class TopicRegistry:
+    """
+    topic -> sockets index for short-lived interest, e.g. "diary:{id}" while
+    a diary is on screen. Each socket holds at most `max_per_socket` topics;
+    subscribing past the cap drops that socket's oldest subscription, so
+    memory stays bounded by sockets x cap however long a client scrolls.
+    """
+
+    def __init__(self, max_per_socket: Optional[int] = None) -> None:
+        self.max_per_socket = max_per_socket or settings.WS_MAX_TOPICS_PER_SOCKET
+        self.subscribers: Dict[str, Set[WebSocket]] = {}
+        self.by_socket: Dict[WebSocket, "OrderedDict[str, None]"] = {}
+        self.evicted = 0
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        """Subscribe to `topics`; returns the topics dropped to stay under the cap."""
+        owned = self.by_socket.setdefault(websocket, OrderedDict())
+        dropped = []
+        for topic in topics:
+            if topic in owned:
+                owned.move_to_end(topic)
+                continue
+            owned[topic] = None
+            self.subscribers.setdefault(topic, set()).add(websocket)
+            while len(owned) > self.max_per_socket:
+                oldest, _ = owned.popitem(last=False)
+                self._remove(websocket, oldest)
+                dropped.append(oldest)
+                self.evicted += 1
+        return dropped
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> None:
+        owned = self.by_socket.get(websocket)
+        if not owned:
+            return
+        for topic in topics:
+            if topic in owned:
+                del owned[topic]
+                self._remove(websocket, topic)
+        if not owned:
+            del self.by_socket[websocket]
+
+    def drop(self, websocket: WebSocket) -> None:
+        """Forget every subscription of a closed socket."""
+        for topic in self.by_socket.pop(websocket, {}):
+            self._remove(websocket, topic)
+
+    def sockets(self, topic: str) -> Set[WebSocket]:
+        return self.subscribers.get(topic, set())
+
+    def _remove(self, websocket: WebSocket, topic: str) -> None:
+        sockets = self.subscribers.get(topic)
+        if sockets is None:
+            return
+        sockets.discard(websocket)
+        if not sockets:
+            del self.subscribers[topic]
+
+    def stats(self) -> dict:
+        return {
+            "topics": len(self.subscribers),
+            "subscribed_sockets": len(self.by_socket),
+            "subscriptions": sum(len(owned) for owned in self.by_socket.values()),
+            "evicted": self.evicted,
+        }
@@ -1,5 +1,7 @@
 from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
 
@@ -13,6 +15,19 @@ def _chat_id(user_a: int, user_b: int) -> str:
     a, b = sorted([user_a, user_b])
     return f"private_{a}_{b}"
 
+def read_up_to_event(reader, receipt: dict) -> dict:
+    """Compact read receipt: everything up to `up_to_id` from the sender is read"""
+    return {
+        "type": "messages_read",
+        "reader_id": reader.id,
+        "reader_username": reader.username,
+        "reader_avatar": reader.avatar_url,
+        "sender_id": receipt["sender_id"],
+        "up_to_id": receipt["up_to_id"],
+        "count": receipt["count"],
+        "read_at": receipt["read_at"].isoformat()
+    }
+
 def extract_public_id_from_url(url: str) -> Optional[str]:
     """Extract Cloudinary public_id from URL"""
     if not url:
@@ -34,15 +49,13 @@ def extract_public_id_from_url(url: str) -> Optional[str]:
 def is_group_member(db: Session, group_id: int, user_id: int) -> bool:
     return db.query(GroupMember).filter_by(group_id=group_id, user_id=user_id).first() is not None
 
-def validate_reply_message(db: Session, reply_to_id: int, sender_id: int, receiver_id: int) -> PrivateMessage:
-    """Validate that a reply message belongs to the same conversation"""
-    if not reply_to_id:
-        return None
-        
-    replied_message = db.query(PrivateMessage).options(
-        joinedload(PrivateMessage.sender)
-    ).filter(PrivateMessage.id == reply_to_id).first()
-    
+async def is_group_member_async(db: AsyncSession, group_id: int, user_id: int) -> bool:
+    result = await db.execute(
+        select(GroupMember.user_id).filter_by(group_id=group_id, user_id=user_id).limit(1)
+    )
+    return result.first() is not None
+
+def _check_reply_conversation(replied_message: Optional[PrivateMessage], sender_id: int, receiver_id: int) -> PrivateMessage:
     if not replied_message:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -61,4 +74,29 @@ def validate_reply_message(db: Session, reply_to_id: int, sender_id: int, receiv
             detail="Cannot reply to a message from a different conversation"
         )
     
-    return replied_message
\ No newline at end of file
+    return replied_message
+
+def validate_reply_message(db: Session, reply_to_id: int, sender_id: int, receiver_id: int) -> PrivateMessage:
+    """Validate that a reply message belongs to the same conversation"""
+    if not reply_to_id:
+        return None
+        
+    replied_message = db.query(PrivateMessage).options(
+        joinedload(PrivateMessage.sender)
+    ).filter(PrivateMessage.id == reply_to_id).first()
+    
+    return _check_reply_conversation(replied_message, sender_id, receiver_id)
+
+async def validate_reply_message_async(db: AsyncSession, reply_to_id: int, sender_id: int, receiver_id: int) -> PrivateMessage:
+    """Async variant of validate_reply_message"""
+    if not reply_to_id:
+        return None
+
+    result = await db.execute(
+        select(PrivateMessage)
+        .options(joinedload(PrivateMessage.sender))
+        .filter(PrivateMessage.id == reply_to_id)
+    )
+    replied_message = result.scalars().first()
+
+    return _check_reply_conversation(replied_message, sender_id, receiver_id)
\ No newline at end of file
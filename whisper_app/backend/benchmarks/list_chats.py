@@ -0,0 +1,134 @@
+"""
+Compare the chat list query against the previous per-conversation loop.
+
+Run from whisper_app/backend against a database with realistic data:
+
+    python -m benchmarks.list_chats --user-id 42 --runs 20
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, event, or_
+
+from app.core.database import SessionLocal, engine
+from app.crud.chat import get_chat_list
+from app.crud.conversation import is_seeded, seed_conversations
+from app.crud.friend import get_friends
+from app.crud.group import get_user_groups
+from app.models.group_message import GroupMessage
+from app.models.private_message import PrivateMessage
+
+
+def to_utc(dt):
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def legacy_list_chats(db, user_id):
+    """The list_chats loop as it was: one last-message query per chat."""
+    chats = []
+
+    for friend in get_friends(db, user_id):
+        last_msg = (
+            db.query(PrivateMessage)
+            .filter(
+                or_(
+                    and_(PrivateMessage.sender_id == user_id, PrivateMessage.receiver_id == friend.id),
+                    and_(PrivateMessage.sender_id == friend.id, PrivateMessage.receiver_id == user_id)
+                )
+            )
+            .order_by(PrivateMessage.created_at.desc())
+            .first()
+        )
+        chats.append({
+            "id": friend.id,
+            "type": "private",
+            "last_message": last_msg.content if last_msg else None,
+            "updated_at": to_utc(last_msg.created_at if last_msg else friend.created_at)
+        })
+
+    for group in get_user_groups(db, user_id):
+        last_msg = (
+            db.query(GroupMessage)
+            .filter(GroupMessage.group_id == group.id)
+            .order_by(GroupMessage.created_at.desc())
+            .first()
+        )
+        chats.append({
+            "id": group.id,
+            "type": "group",
+            "last_message": last_msg.content if last_msg else None,
+            "updated_at": to_utc(last_msg.created_at if last_msg else group.created_at)
+        })
+
+    chats.sort(
+        key=lambda x: x["updated_at"] or datetime.min.replace(tzinfo=timezone.utc),
+        reverse=True
+    )
+    return chats
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+def measure(label, fn, runs):
+    counter = StatementCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    timings = []
+    try:
+        for _ in range(runs):
+            db = SessionLocal()
+            try:
+                started = time.perf_counter()
+                result = fn(db)
+                timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+    print(
+        f"{label:<8} chats={len(result):<5} queries/run={counter.count // runs:<5} "
+        f"median={statistics.median(timings):.1f}ms p95={sorted(timings)[int(len(timings) * 0.95) - 1]:.1f}ms"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    # get_chat_list seeds the conversations table on a user's first call;
+    # do that write up front so no timed run includes it
+    db = SessionLocal()
+    try:
+        if not is_seeded(db, args.user_id):
+            print(f"seeded {seed_conversations(db, args.user_id)} conversations")
+    finally:
+        db.close()
+
+    old = measure("legacy", lambda db: legacy_list_chats(db, args.user_id), args.runs)
+    new = measure("single", lambda db: get_chat_list(db, args.user_id, limit=len(old) or 1), args.runs)
+
+    # Previews are labels in the new list (media labels, truncated text) and raw
+    # content in the old one, so only the set of chats is compared
+    old_keys = {(c["type"], c["id"]) for c in old}
+    new_keys = {(c["type"], c["id"]) for c in new}
+    if old_keys != new_keys:
+        print("WARNING: results differ between implementations")
+
+
+if __name__ == "__main__":
+    main()
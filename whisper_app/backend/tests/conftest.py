@@ -0,0 +1,17 @@
+"""
+Test settings. Required settings get harmless defaults so the app modules
+import without a .env; database-backed tests use TEST_DATABASE_URL and are
+skipped when it is not set.
+"""
+import os
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+os.environ.setdefault("DATABASE_URL", TEST_DATABASE_URL or "postgresql://localhost/whisper_test")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("SMTP_USER", "test@example.com")
+os.environ.setdefault("SMTP_PASS", "test")
+os.environ.setdefault("SMTP_FROM", "test@example.com")
+os.environ.setdefault("CLOUDINARY_CLOUD_NAME", "test-cloud")
+os.environ.setdefault("CLOUDINARY_API_KEY", "test-key")
+os.environ.setdefault("CLOUDINARY_API_SECRET", "test-secret")
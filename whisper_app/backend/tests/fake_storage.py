@@ -0,0 +1,74 @@
+"""
+Minimal stand-in for the Cloudinary upload API, for pointing the SDK at
+with `upload_prefix`. Records every request and can be told to fail the
+next ones with a given status.
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeStorageServer:
+    def __init__(self):
+        self.requests = []
+        self.failures = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                server._record(self.path, self.headers, body)
+                status, payload = server._respond(self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def fail_next(self, status: int, times: int = 1):
+        with self._lock:
+            self.failures.extend([status] * times)
+
+    def _record(self, path, headers, body):
+        with self._lock:
+            self.requests.append({"path": path, "headers": dict(headers), "body": body})
+
+    def _respond(self, path, body):
+        with self._lock:
+            if self.failures:
+                status = self.failures.pop(0)
+                return status, {"error": {"message": f"fake failure {status}"}}
+
+        match = re.search(rb'name="public_id"\r\n\r\n([^\r]*)', body)
+        public_id = match.group(1).decode() if match else "generated"
+        folder = re.search(rb'name="folder"\r\n\r\n([^\r]*)', body)
+        if folder:
+            public_id = f"{folder.group(1).decode()}/{public_id}"
+        if path.endswith("/destroy"):
+            return 200, {"result": "ok"}
+        resource_type = path.rstrip("/").split("/")[-2]
+        return 200, {
+            "public_id": public_id,
+            "version": 1,
+            "format": "mp3",
+            "bytes": len(body),
+            "secure_url": f"https://res.cloudinary.com/test-cloud/{resource_type}/upload/v1/{public_id}.mp3",
+        }
@@ -0,0 +1,96 @@
+"""
+Chat list bookkeeping on a real PostgreSQL database. Set TEST_DATABASE_URL
+to a disposable database to run these.
+"""
+import importlib
+import pkgutil
+import uuid
+
+import pytest
+from sqlalchemy import delete, or_
+
+from tests.conftest import TEST_DATABASE_URL
+
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+import app.models  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.crud.chat import get_chat_list  # noqa: E402
+from app.crud.conversation import add_group_message, add_private_message  # noqa: E402
+from app.models.base import Base  # noqa: E402
+from app.models.friend import Friend, FriendshipStatus  # noqa: E402
+from app.models.group import Group  # noqa: E402
+from app.models.group_member import GroupMember  # noqa: E402
+from app.models.group_message import GroupMessage, MessageType  # noqa: E402
+from app.models.private_message import PrivateMessage  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+for module in pkgutil.iter_modules(app.models.__path__):
+    importlib.import_module(f"app.models.{module.name}")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    users = []
+
+    def make_user():
+        name = uuid.uuid4().hex[:12]
+        user = User(username=name, email=f"{name}@example.com", password_hash="x")
+        session.add(user)
+        session.flush()
+        users.append(user.id)
+        return user
+
+    session.make_user = make_user
+    try:
+        yield session
+        session.rollback()
+        session.execute(delete(PrivateMessage).where(
+            or_(PrivateMessage.sender_id.in_(users), PrivateMessage.receiver_id.in_(users))
+        ))
+        session.execute(delete(Friend).where(or_(Friend.user_id.in_(users), Friend.friend_id.in_(users))))
+        session.execute(delete(User).where(User.id.in_(users)))
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_media_and_system_messages_reach_a_seeded_chat_list(db):
+    alice, bob = db.make_user(), db.make_user()
+    db.add(Friend(user_id=alice.id, friend_id=bob.id, status=FriendshipStatus.accepted))
+    group = Group(name="trip", creator_id=alice.id)
+    db.add(group)
+    db.flush()
+    db.add_all([GroupMember(group_id=group.id, user_id=alice.id), GroupMember(group_id=group.id, user_id=bob.id)])
+    add_group_message(db, GroupMessage(group_id=group.id, sender_id=alice.id, content="hi all"))
+    db.commit()
+
+    # Seeds bob's chat list; from here on it is read from conversations only
+    get_chat_list(db, bob.id)
+
+    add_group_message(db, GroupMessage(
+        group_id=group.id, sender_id=alice.id, message_type=MessageType.image,
+        file_url="https://res.cloudinary.com/test-cloud/image/upload/v1/photo.jpg"
+    ))
+    db.commit()
+    add_private_message(db, PrivateMessage(
+        sender_id=alice.id, receiver_id=bob.id, message_type="system",
+        content=f"{alice.username} started a voice call"
+    ))
+    db.commit()
+
+    chats = {(chat["type"], chat["id"]): chat for chat in get_chat_list(db, bob.id)}
+    group_chat = chats[("group", group.id)]
+    private_chat = chats[("private", alice.id)]
+
+    assert group_chat["last_message"] == "🖼️ Photo"
+    assert group_chat["unread_count"] == 2
+    assert private_chat["last_message"] == f"{alice.username} started a voice call"
+    assert private_chat["updated_at"] >= group_chat["updated_at"]
@@ -0,0 +1,189 @@
+"""
+Media job queue against a real PostgreSQL database (claiming relies on
+FOR UPDATE SKIP LOCKED and array slot updates). Set TEST_DATABASE_URL to a
+disposable database to run these; its media_jobs table is emptied.
+"""
+import asyncio
+import importlib
+import pkgutil
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete
+
+from tests.conftest import TEST_DATABASE_URL
+
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+pytest.importorskip("asyncpg")
+
+import app.models  # noqa: E402
+from app.core.database import AsyncSessionLocal, SessionLocal, async_engine, engine  # noqa: E402
+from app.crud.media_job import attach_video_thumbnail, claim_job, enqueue_video_jobs  # noqa: E402
+from app.models.base import Base  # noqa: E402
+from app.models.diary import Diary, ShareType  # noqa: E402
+from app.models.media_job import MediaJob, MediaJobStatus  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import media_jobs  # noqa: E402
+from app.services.media_jobs import MediaJobQueue  # noqa: E402
+
+VIDEO_URL = "https://res.cloudinary.com/test-cloud/video/upload/v1/whisper_space/diary_media/clip_{}.mp4"
+
+for module in pkgutil.iter_modules(app.models.__path__):
+    importlib.import_module(f"app.models.{module.name}")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def diary():
+    """A public diary with two videos still waiting for their jobs"""
+    db = SessionLocal()
+    try:
+        db.query(MediaJob).delete()
+        name = uuid.uuid4().hex[:12]
+        user = User(username=name, email=f"{name}@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        diary = Diary(
+            user_id=user.id,
+            title="clips",
+            share_type=ShareType.public,
+            videos=[VIDEO_URL.format(0), VIDEO_URL.format(1)],
+            video_thumbnails=[None, None],
+        )
+        db.add(diary)
+        db.flush()
+        assert enqueue_video_jobs(db, diary) == 2
+        db.commit()
+        yield diary.id
+        # ON DELETE CASCADE takes the diary and its jobs
+        db.execute(delete(User).where(User.id == user.id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_diary(diary_id):
+    db = SessionLocal()
+    try:
+        return db.get(Diary, diary_id)
+    finally:
+        db.close()
+
+
+def run(scenario):
+    async def wrapped():
+        try:
+            return await scenario()
+        finally:
+            # asyncpg connections belong to this loop
+            await async_engine.dispose()
+    return asyncio.run(wrapped())
+
+
+async def claim(stale_after=3600):
+    async with AsyncSessionLocal() as db:
+        job = await claim_job(db, stale_after)
+        await db.commit()
+        return job
+
+
+def test_jobs_run_to_diary_media_ready(diary, monkeypatch):
+    ready = []
+
+    def derivatives(public_id):
+        return {"thumbnail_url": f"https://thumbs/{public_id}.jpg", "renditions": [f"https://renditions/{public_id}"]}
+
+    async def media_ready(diary_id, renditions):
+        ready.append((diary_id, renditions))
+
+    monkeypatch.setattr(media_jobs, "generate_video_derivatives", derivatives)
+    monkeypatch.setattr(media_jobs.FeedBroadcastService, "broadcast_diary_media_ready", staticmethod(media_ready))
+    queue = MediaJobQueue(workers=0, poll_interval=0, max_attempts=3, stale_after=3600)
+
+    async def scenario():
+        first = await claim()
+        await queue._run(first)
+        after_first = list(ready)
+        second = await claim()
+        await queue._run(second)
+        return first, second, after_first, await claim()
+
+    first, second, after_first, nothing_left = run(scenario)
+
+    assert {first.payload["index"], second.payload["index"]} == {0, 1}
+    assert after_first == []  # the other video is still open
+    assert nothing_left is None
+    assert ready == [(diary, {
+        0: ["https://renditions/whisper_space/diary_media/clip_0"],
+        1: ["https://renditions/whisper_space/diary_media/clip_1"],
+    })]
+    assert load_diary(diary).video_thumbnails == [
+        "https://thumbs/whisper_space/diary_media/clip_0.jpg",
+        "https://thumbs/whisper_space/diary_media/clip_1.jpg",
+    ]
+    assert queue.completed == 2
+
+
+def test_concurrent_claims_skip_locked_rows(diary):
+    async def scenario():
+        async with AsyncSessionLocal() as a, AsyncSessionLocal() as b, AsyncSessionLocal() as c:
+            # a and b hold their claimed rows locked until they commit
+            job_a = await claim_job(a, 3600)
+            job_b = await claim_job(b, 3600)
+            job_c = await claim_job(c, 3600)
+            await a.rollback()
+            await b.rollback()
+            await c.rollback()
+            return job_a, job_b, job_c
+
+    job_a, job_b, job_c = run(scenario)
+
+    assert job_a.id != job_b.id
+    assert job_c is None
+
+
+def test_stale_running_job_is_reclaimed(diary):
+    async def scenario():
+        job = await claim()
+        other = await claim()
+        fresh = await claim(stale_after=60)
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                MediaJob.__table__.update().where(MediaJob.id == job.id)
+                .values(updated_at=datetime.now(timezone.utc) - timedelta(hours=1))
+            )
+            await db.commit()
+        return job, other, fresh, await claim(stale_after=60)
+
+    job, other, fresh, reclaimed = run(scenario)
+
+    assert other.id != job.id
+    assert fresh is None  # both running, neither stale yet
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+
+def test_thumbnail_slot_is_guarded_by_the_video_url(diary):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            replaced = await attach_video_thumbnail(db, diary, 0, VIDEO_URL.format("old"), "https://thumbs/old.jpg")
+            second = await attach_video_thumbnail(db, diary, 1, VIDEO_URL.format(1), "https://thumbs/1.jpg")
+            await db.commit()
+        return replaced, second
+
+    replaced, second = run(scenario)
+
+    assert replaced is False
+    assert second is True
+    assert load_diary(diary).video_thumbnails == [None, "https://thumbs/1.jpg"]
+    with SessionLocal() as db:
+        assert db.query(MediaJob).filter(
+            MediaJob.diary_id == diary, MediaJob.status == MediaJobStatus.pending
+        ).count() == 2
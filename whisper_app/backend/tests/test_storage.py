@@ -0,0 +1,71 @@
+import asyncio
+import io
+
+import pytest
+
+cloudinary = pytest.importorskip("cloudinary")
+pytest.importorskip("pydantic_settings")
+
+from app.core.cloudinary import create_upload_ticket  # noqa: E402
+from app.core.storage import StorageClient  # noqa: E402
+from tests.fake_storage import FakeStorageServer  # noqa: E402
+
+VOICE = b"ID3" + b"\x00" * 4096
+
+
+@pytest.fixture
+def fake_storage():
+    server = FakeStorageServer().start()
+    previous = cloudinary.config().upload_prefix
+    cloudinary.config(upload_prefix=server.url)
+    yield server
+    cloudinary.config(upload_prefix=previous)
+    server.stop()
+
+
+@pytest.fixture
+def client():
+    return StorageClient(max_workers=2, retries=2, backoff=0)
+
+
+def test_upload_voice_sends_file_to_storage(fake_storage, client):
+    result = asyncio.run(client.upload_voice(io.BytesIO(VOICE), public_id="voice_1", folder="voice_messages"))
+
+    assert result["public_id"].endswith("voice_messages/voice_1")
+    assert result["secure_url"].startswith("https://")
+    [request] = fake_storage.requests
+    assert request["path"].endswith("/video/upload")
+    assert VOICE in request["body"]
+    assert client.stats()["ops"]["upload_voice"]["calls"] == 1
+
+
+def test_transient_failure_is_retried_from_the_start_of_the_file(fake_storage, client):
+    fake_storage.fail_next(500)
+
+    asyncio.run(client.upload_voice(io.BytesIO(VOICE), public_id="voice_2"))
+
+    assert len(fake_storage.requests) == 2
+    assert VOICE in fake_storage.requests[1]["body"]
+    ops = client.stats()["ops"]["upload_voice"]
+    assert ops["retries"] == 1 and ops["errors"] == 0
+
+
+def test_client_error_is_not_retried(fake_storage, client):
+    fake_storage.fail_next(400)
+
+    with pytest.raises(Exception):
+        asyncio.run(client.upload_voice(io.BytesIO(VOICE), public_id="voice_3"))
+
+    assert len(fake_storage.requests) == 1
+    assert client.stats()["ops"]["upload_voice"]["errors"] == 1
+
+
+def test_delete_reports_result(fake_storage, client):
+    assert asyncio.run(client.delete("whisper_space/voice_messages/voice_1", resource_type="video")) is True
+
+
+def test_upload_ticket_targets_the_configured_api_host(fake_storage):
+    ticket = create_upload_ticket("whisper_space/diary_media/clip", resource_type="video")
+
+    assert ticket["upload_url"] == f"{fake_storage.url}/v1_1/test-cloud/video/upload"
+    assert ticket["fields"]["public_id"] == "whisper_space/diary_media/clip"
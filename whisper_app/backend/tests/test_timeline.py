@@ -0,0 +1,135 @@
+"""
+Home timeline pages against the fan-out-on-read feed on a real PostgreSQL
+database. Set TEST_DATABASE_URL to a disposable database to run these.
+"""
+import importlib
+import pkgutil
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, or_
+
+from tests.conftest import TEST_DATABASE_URL
+
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+import app.models  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.crud.diary import get_visible_page  # noqa: E402
+from app.crud.timeline import fan_out_diary, has_timeline  # noqa: E402
+from app.models.base import Base  # noqa: E402
+from app.models.diary import Diary, ShareType  # noqa: E402
+from app.models.diary_group import DiaryGroup  # noqa: E402
+from app.models.friend import Friend, FriendshipStatus  # noqa: E402
+from app.models.group import Group  # noqa: E402
+from app.models.group_member import GroupMember  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+for module in pkgutil.iter_modules(app.models.__path__):
+    importlib.import_module(f"app.models.{module.name}")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(settings, "DIARY_TIMELINE_ENABLED", True)
+    monkeypatch.setattr(settings, "DIARY_TIMELINE_SIZE", 5)
+    monkeypatch.setattr(settings, "DIARY_TIMELINE_FANOUT_LIMIT", 2)
+    session = SessionLocal()
+    users = []
+
+    def make_user():
+        name = uuid.uuid4().hex[:12]
+        user = User(username=name, email=f"{name}@example.com", password_hash="x")
+        session.add(user)
+        session.flush()
+        users.append(user.id)
+        return user
+
+    session.make_user = make_user
+    try:
+        yield session
+        session.rollback()
+        session.execute(delete(Friend).where(or_(Friend.user_id.in_(users), Friend.friend_id.in_(users))))
+        session.execute(delete(User).where(User.id.in_(users)))
+        session.commit()
+    finally:
+        session.close()
+
+
+def befriend(db, user, other):
+    db.add(Friend(user_id=user.id, friend_id=other.id, status=FriendshipStatus.accepted))
+
+
+def feed(db, user_id, limit=3):
+    """Every id of the feed, page by page through the before_id cursor"""
+    ids, before_id = [], None
+    while True:
+        page = get_visible_page(db, user_id, limit=limit, before_id=before_id)
+        ids += [diary.id for diary in page]
+        if len(page) < limit:
+            return ids
+        before_id = page[-1].id
+
+
+def test_timeline_pages_match_fan_out_on_read(db, monkeypatch):
+    reader, friend, mate, stranger, popular, lurker = (db.make_user() for _ in range(6))
+    befriend(db, reader, friend)
+    befriend(db, reader, popular)
+    for fan in (db.make_user() for _ in range(3)):
+        befriend(db, popular, fan)
+    group = Group(name="climbing", creator_id=mate.id)
+    db.add(group)
+    db.flush()
+    db.add_all([GroupMember(group_id=group.id, user_id=reader.id), GroupMember(group_id=group.id, user_id=mate.id)])
+    db.commit()
+
+    posts = [
+        (friend, ShareType.friends),
+        (stranger, ShareType.public),
+        (mate, ShareType.group),
+        (reader, ShareType.personal),
+        (popular, ShareType.friends),  # more readers than the fan-out limit: a pull row
+        (stranger, ShareType.friends),  # not visible to reader
+        (friend, ShareType.public),
+        (stranger, ShareType.public),
+        (mate, ShareType.group),
+        (reader, ShareType.friends),
+        (stranger, ShareType.public),
+        (friend, ShareType.friends),
+        (popular, ShareType.friends),
+        (stranger, ShareType.public),
+    ]
+    start = datetime.utcnow() - timedelta(days=1)
+    ids = []
+    for i, (author, share_type) in enumerate(posts):
+        diary = Diary(user_id=author.id, title=f"post {i}", share_type=share_type,
+                      created_at=start + timedelta(minutes=i))
+        db.add(diary)
+        db.flush()
+        ids.append(diary.id)
+        if share_type == ShareType.group:
+            db.add(DiaryGroup(diary_id=diary.id, group_id=group.id))
+        db.commit()
+        fan_out_diary(db, diary)
+
+    assert has_timeline(db, reader.id)
+    assert not has_timeline(db, lurker.id)  # seeded on first read
+
+    timeline = {user.id: feed(db, user.id) for user in (reader, lurker)}
+    monkeypatch.setattr(settings, "DIARY_TIMELINE_ENABLED", False)
+    fan_out_on_read = {user.id: feed(db, user.id) for user in (reader, lurker)}
+
+    assert timeline == fan_out_on_read
+    # Public diaries of other tests may share the database
+    titles = {diary.id: diary.title for diary in db.query(Diary).filter(Diary.id.in_(ids))}
+    assert [titles[i] for i in timeline[reader.id] if i in titles] == [
+        f"post {i}" for i in (13, 12, 11, 10, 9, 8, 7, 6, 4, 3, 2, 1, 0)
+    ]
@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+from app.services.ws_backplane import RESYNC, BackplaneMixin, InMemoryBackplane, RedisBackplane  # noqa: E402
+
+
+class FakePubSub:
+    def __init__(self, items, fail):
+        self.items = items
+        self.fail = fail
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def unsubscribe(self, channel):
+        self.channels.remove(channel)
+
+    async def close(self):
+        pass
+
+    async def listen(self):
+        for item in self.items:
+            yield item
+        if self.fail:
+            raise ConnectionError("connection reset")
+        await asyncio.Event().wait()
+
+
+class FakeRedis:
+    """Each pubsub() is one connection; the first one drops after its items"""
+
+    def __init__(self, *connections):
+        self.connections = list(connections)
+        self.opened = []
+
+    def pubsub(self):
+        pubsub = self.connections.pop(0)
+        self.opened.append(pubsub)
+        return pubsub
+
+
+def message(envelope):
+    return {"type": "message", "data": json.dumps(envelope)}
+
+
+def test_redis_backplane_resubscribes_after_connection_loss():
+    async def scenario():
+        client = FakeRedis(
+            FakePubSub([{"type": "subscribe"}, message({"op": "first"})], fail=True),
+            FakePubSub([message({"op": "second"})], fail=False),
+        )
+        bus = RedisBackplane(client=client, backoff=0)
+        received = []
+
+        async def handler(envelope):
+            received.append(envelope)
+
+        await bus.subscribe(handler)
+        for _ in range(50):
+            if len(received) == 3:
+                break
+            await asyncio.sleep(0)
+        await bus.unsubscribe(handler)
+        return client, bus, received
+
+    client, bus, received = asyncio.run(scenario())
+
+    assert received == [{"op": "first"}, RESYNC, {"op": "second"}]
+    assert bus.reconnects == 1
+    assert client.opened[1].channels == []  # unsubscribed on shutdown, after resubscribing
+
+
+class Node(BackplaneMixin):
+    def __init__(self, bus):
+        self.online_users = {}
+        self._init_backplane(bus)
+
+    async def _broadcast_local(self, chat_id, frame):
+        pass
+
+    async def _send_to_user_local(self, chat_id, user_id, frame):
+        pass
+
+
+def test_silent_node_is_dropped_from_presence():
+    async def scenario():
+        bus = InMemoryBackplane()
+        a, b = Node(bus), Node(bus)
+        await a.start_backplane()
+        await b.start_backplane()
+        b.online_users["chat_1"] = {7}
+        b._publish_presence("chat_1")
+        await asyncio.sleep(0)
+        seen = a._remote_online_users("chat_1")
+
+        # b stops heartbeating without a node_down (e.g. the worker was killed)
+        a.node_seen[b.node_id] -= 3600
+        a._expire_nodes()
+        after_expiry = a._remote_online_users("chat_1")
+
+        # Its next heartbeat makes every node republish presence
+        await b._publish("heartbeat")
+        await asyncio.sleep(0)
+        after_return = a._remote_online_users("chat_1")
+
+        await a.stop_backplane()
+        await b.stop_backplane()
+        return seen, after_expiry, after_return
+
+    seen, after_expiry, after_return = asyncio.run(scenario())
+
+    assert seen == {7}
+    assert after_expiry == set()
+    assert after_return == {7}